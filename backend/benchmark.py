@@ -0,0 +1,285 @@
+import numpy as np
+import subprocess
+import tempfile
+import platform
+import argparse
+import random
+import json
+import time
+import sys
+import os
+
+# --- Benchmark Harness ---
+# Times the parts of the backend whose speed we care about and prints one JSON document, so two
+# runs (e.g. before and after a change) can be compared key by key:
+#   cold_start   fresh interpreter: library imports and the first model, forest and carrier data loads, separately
+#   warm         per-query latency of a resident predict_api (ranking, cached, multi-leg)
+#   batch        get_batch_recommendations throughput
+#   intracity    route solver latency at 3-8 stops, and get_route_stats
+#   dispatch     dispatch_optimizer.py plan cost after each phase and solve time, per plan size
+#   training     train_model.py / train_intracity_model.py wall time and peak RSS per dataset size
+# Queries and datasets are drawn from fixed seeds, so every run measures the same work.
+# Example: python3 benchmark.py --quick --output bench.json
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SECTIONS = ['cold_start', 'warm', 'batch', 'intracity', 'dispatch', 'training']
+SEED = 1234
+
+
+def summarize(samples):
+    """Latency percentiles of a list of durations in seconds, reported in microseconds."""
+    samples = np.asarray(samples) * 1e6
+    return {
+        'iterations': int(len(samples)),
+        'p50_us': round(float(np.percentile(samples, 50)), 1),
+        'p90_us': round(float(np.percentile(samples, 90)), 1),
+        'p99_us': round(float(np.percentile(samples, 99)), 1),
+        'mean_us': round(float(samples.mean()), 1),
+    }
+
+
+def time_calls(fn, args_list):
+    """Calls fn(*args) for every entry of args_list once and returns the individual durations."""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# --- 1. Cold Start ---
+# Runs in a fresh interpreter so nothing is already imported or loaded. Importing predict_api already
+# opens the model bundle and loads the carrier data, so those two come from the stage timings it
+# records while importing (the child runs with LOGISTICS_METRICS=1); the forest is read on first use.
+COLD_START_SCRIPT = """
+import time, json, sys
+started = time.perf_counter()
+import numpy
+imported = time.perf_counter()
+import predict_api
+ready = time.perf_counter()
+predict_api.MODEL_BUNDLE.forest
+forest_loaded = time.perf_counter()
+stages = {name: stage['total_ms'] / 1e3 for name, stage in predict_api.METRICS.snapshot()['stages'].items()}
+print(json.dumps({
+    'library_imports_s': imported - started,
+    'predict_api_import_s': ready - imported,
+    'model_load_s': stages['model_load'],
+    'data_load_s': stages['data_load'],
+    'module_imports_s': ready - imported - stages['model_load'] - stages['data_load'],
+    'forest_load_s': forest_loaded - ready,
+    'data_source': 'csv' if predict_api.df is not None else 'compiled_table',
+}))
+"""
+
+def bench_cold_start(repeats):
+    """
+    Median over `repeats` fresh processes; process_s includes interpreter start-up. predict_api_import_s
+    is the whole import: model_load_s, data_load_s and module_imports_s (everything else) add up to it.
+    """
+    env = dict(os.environ, LOGISTICS_METRICS='1')
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-W', 'ignore', '-c', COLD_START_SCRIPT], cwd=script_dir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run['process_s'] = time.perf_counter() - started
+        runs.append(run)
+    result = {key: round(float(np.median([run[key] for run in runs])), 4) for key in runs[0] if key.endswith('_s')}
+    result['data_source'] = runs[0]['data_source']
+    result['repeats'] = repeats
+    return result
+
+
+# --- 2. Warm Queries and Batch Throughput ---
+def query_mix(predict_api, count, rng):
+    """`count` (origin, destination, priorities, fragility) queries over the served direct routes."""
+    routes = sorted(direct_routes(predict_api))
+    priorities = ['cost', 'speed', 'safety', 'warehouse']
+    queries = []
+    for _ in range(count):
+        origin, destination = routes[rng.randrange(len(routes))]
+        chosen = rng.sample(priorities, rng.randint(1, 2))
+        queries.append((origin, destination, chosen, rng.choice(['Low', 'High'])))
+    return queries
+
+
+def direct_routes(predict_api):
+    """The (origin, destination) pairs the loaded data has carrier rows for."""
+    route_index = predict_api.ROUTE_INDEX
+    if hasattr(route_index, 'route_origins'):
+        return list(zip(route_index.route_origins.tolist(), route_index.route_destinations.tolist()))
+    return list(route_index.keys())
+
+
+def bench_warm(iterations):
+    import predict_api
+    rng = random.Random(SEED)
+    queries = query_mix(predict_api, iterations, rng)
+    for query in queries[:50]:
+        predict_api.rank_route(*query)
+
+    results = {'rank_route': summarize(time_calls(predict_api.rank_route, queries))}
+    predict_api.RESULT_CACHE.clear()
+    results['get_recommendations_cached'] = summarize(time_calls(predict_api.get_recommendations, queries))
+    results['cache'] = predict_api.RESULT_CACHE.stats()
+
+    # Multi-leg: pairs that only connect through another city
+    served = set(direct_routes(predict_api))
+    cities = sorted({city for route in served for city in route})
+    pairs = [(a, b) for a in cities for b in cities if a != b and (a, b) not in served]
+    if pairs:
+        # The shipped rows all leave one city, so only reverse legs connect the others; build the graph
+        # with them whatever LOGISTICS_REVERSE_LEGS says, or every sample would time an error lookup.
+        predict_api.REVERSE_LEGS = True
+        predict_api.ROUTE_GRAPH_SOURCE = None
+        predict_api.get_route_graph()
+        multi_leg = [(*pairs[rng.randrange(len(pairs))], ['cost'], 'Low') for _ in range(max(1, iterations // 20))]
+        for query in multi_leg:
+            result = predict_api.plan_multi_leg(*query)
+            assert 'error' not in result, f"no itinerary for {query[0]} to {query[1]}: {result['error']}"
+        results['multi_leg'] = summarize(time_calls(predict_api.plan_multi_leg, multi_leg))
+    return results
+
+
+def bench_batch(size):
+    import predict_api
+    rng = random.Random(SEED)
+    requests = [{'origin': o, 'destination': d, 'priorities': p, 'fragility': f} for o, d, p, f in query_mix(predict_api, size, rng)]
+    predict_api.get_batch_recommendations(requests[:100])
+    started = time.perf_counter()
+    predict_api.get_batch_recommendations(requests)
+    elapsed = time.perf_counter() - started
+    return {'requests': size, 'seconds': round(elapsed, 4), 'requests_per_second': round(size / elapsed, 1)}
+
+
+# --- 3. Intra-City Solver ---
+def bench_intracity(iterations, stop_counts=range(3, 9)):
+    from city_model import LOCATIONS, get_route_stats
+    from route_solver import solve_route
+    rng = random.Random(SEED)
+    results = {}
+    for count in stop_counts:
+        cases = [(tuple(sorted(rng.sample(LOCATIONS, count))), rng.choice([True, False]), rng.random() < 0.25) for _ in range(iterations)]
+        results[f'solve_route_{count}_stops'] = summarize(time_calls(solve_route, cases))
+    pairs = [tuple(rng.sample(LOCATIONS, 2)) for _ in range(iterations)]
+    results['get_route_stats'] = summarize(time_calls(get_route_stats, pairs))
+    return results
+
+
+def bench_dispatch(sizes, time_budget):
+    """Solves one random plan per (drops, vehicles) size; costs are comparable between runs, times only roughly."""
+    from dispatch_optimizer import dispatch, random_plan
+    results = []
+    for num_drops, num_vehicles in sizes:
+        result = dispatch(random_plan(num_drops, num_vehicles, seed=SEED), time_budget, seed=SEED)
+        results.append({'total_cost': result['total_cost'], 'unassigned': len(result['unassigned']), **result['solve']})
+    return results
+
+
+# --- 4. Training Wall Time and Peak RSS ---
+def run_measured(command):
+    """Runs a command to completion and returns (wall seconds, peak RSS in MB) for that child alone."""
+    # stderr goes to a file rather than a pipe, which could fill up while nobody reads it
+    with tempfile.TemporaryFile() as stderr:
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=script_dir, stdout=subprocess.DEVNULL, stderr=stderr)
+        # wait4 reports the resource usage of this one child, unlike getrusage(RUSAGE_CHILDREN)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{' '.join(command)} failed: {stderr.read().decode()[-2000:]}")
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_bytes = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return round(wall, 3), round(peak_bytes / 2**20, 1)
+
+
+def bench_training(carrier_sizes, scenario_sizes):
+    """
+    Trains both models on synthetic data of each size into a temporary directory, so the committed
+    artifacts are never overwritten. carrier_sizes are (routes, carriers) pairs for generate_data.py.
+    """
+    python = [sys.executable, '-W', 'ignore']
+    results = {'train_model': [], 'train_intracity_model': []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for routes, carriers in carrier_sizes:
+            data_path = os.path.join(work_dir, f'carriers_{routes}x{carriers}.csv')
+            subprocess.run(python + ['generate_data.py', '--routes', str(routes), '--carriers', str(carriers), '--seed', str(SEED),
+                                     '--output', data_path], cwd=script_dir, check=True, stdout=subprocess.DEVNULL)
+            wall, peak = run_measured(python + ['train_model.py', '--data', data_path, '--output-dir', os.path.join(work_dir, 'route_model')])
+            results['train_model'].append({'routes': routes, 'carriers': carriers, 'rows': routes * carriers, 'wall_s': wall, 'peak_rss_mb': peak})
+        for scenarios in scenario_sizes:
+            wall, peak = run_measured(python + ['train_intracity_model.py', '--scenarios', str(scenarios), '--workers', '1', '--seed', str(SEED),
+                                                '--output-dir', os.path.join(work_dir, 'intracity_model')])
+            results['train_intracity_model'].append({'scenarios': scenarios, 'workers': 1, 'wall_s': wall, 'peak_rss_mb': peak})
+    return results
+
+
+def environment():
+    """What the numbers were measured on, so runs from different machines are not compared blindly."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=script_dir, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation serving, intra-city solving, dispatch and training.")
+    parser.add_argument('--sections', default=','.join(SECTIONS), help=f"Comma-separated sections to run (default: {','.join(SECTIONS)}).")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations and smaller training sizes, for a fast smoke run.")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sections = [section.strip() for section in args.sections.split(',') if section.strip()]
+    unknown = [section for section in sections if section not in SECTIONS]
+    if unknown:
+        raise SystemExit(f"Unknown section(s): {', '.join(unknown)}. Choose from {', '.join(SECTIONS)}.")
+
+    # predict_api reads its files relative to the working directory
+    os.chdir(script_dir)
+    sys.path.insert(0, script_dir)
+    quick = args.quick
+    results = {'environment': environment(), 'quick': quick}
+    if 'cold_start' in sections:
+        results['cold_start'] = bench_cold_start(repeats=1 if quick else 5)
+    if 'warm' in sections:
+        results['warm'] = bench_warm(iterations=2000 if quick else 20000)
+    if 'batch' in sections:
+        results['batch'] = bench_batch(size=10000 if quick else 100000)
+    if 'intracity' in sections:
+        results['intracity'] = bench_intracity(iterations=50 if quick else 500)
+    if 'dispatch' in sections:
+        results['dispatch'] = bench_dispatch(
+            sizes=[(100, 3)] if quick else [(100, 3), (500, 8), (2000, 20)],
+            time_budget=1.0 if quick else 5.0,
+        )
+    if 'training' in sections:
+        results['training'] = bench_training(
+            carrier_sizes=[(5, 20), (50, 20)] if quick else [(5, 20), (100, 50), (1000, 50)],
+            scenario_sizes=[500] if quick else [2000, 20000],
+        )
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
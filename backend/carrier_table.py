@@ -0,0 +1,210 @@
+import numpy as np
+import hashlib
+import shutil
+import json
+import os
+
+# --- Scored Carrier Table Compiled to Memory-Mapped Arrays ---
+# predict_api.py used to parse the carrier CSV, merge, fill and normalize it on every start.
+# Compiling the scored table once into plain .npy files lets the serving path np.load them
+# with mmap_mode='r': nothing is parsed at startup, and every worker process maps the same
+# read-only pages instead of holding its own copy.
+#
+# Layout: rows are grouped by route, routes are sorted by (origin, destination) so a route is
+# found by binary search, and route_offsets[i]:route_offsets[i + 1] are the rows of route i.
+# Within a route, rows keep their CSV order so tied scores rank exactly as before.
+
+FORMAT_VERSION = 1
+TABLE_DIR = 'logistics_carrier_table'
+MANIFEST_FILE = 'manifest.json'
+SCORE_COLUMNS = ['price_score', 'speed_score', 'safety_score', 'warehouse_score', 'review_score']
+RAW_COLUMNS = ['price', 'safety_rating', 'delivery_time_hours', 'warehouse_size_sqft']
+
+
+def file_fingerprint(path, with_hash=True):
+    """Size, modification time and (optionally) SHA-256 of a file, used to tell a stale table from a fresh one."""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def write_carrier_table(df, path=TABLE_DIR, source=None):
+    """
+    Writes a scored carrier DataFrame (as built by predict_api.load_carrier_table) to `path`.
+    `source` is the CSV it was built from; its fingerprint goes into the manifest so loaders can
+    detect that the CSV changed since. The directory is replaced as a whole, never half-written.
+    """
+    origins = df['origin'].to_numpy(dtype=str)
+    destinations = df['destination'].to_numpy(dtype=str)
+
+    # Sort routes by (origin, destination); a stable sort keeps each route's rows in table order.
+    route_names, route_of_row = np.unique(np.stack([origins, destinations], axis=1), axis=0, return_inverse=True)
+    route_of_row = route_of_row.ravel()
+    row_order = np.argsort(route_of_row, kind='stable')
+    route_offsets = np.concatenate([[0], np.cumsum(np.bincount(route_of_row, minlength=len(route_names)))]).astype(np.int64)
+
+    # Company names are stored once; rows only hold their code.
+    company_names, company_codes = np.unique(df['company'].to_numpy(dtype=str), return_inverse=True)
+    scores = df[SCORE_COLUMNS].to_numpy(dtype=np.float64)[row_order]
+
+    # Rows sharing their route's best price score are the only value_pick candidates; computed from
+    # the float64 scores so the float32 rounding below cannot add or drop a candidate.
+    sorted_routes = route_of_row[row_order]
+    best_price_scores = np.maximum.reduceat(scores[:, 0], route_offsets[:-1]) if len(scores) else np.zeros(0)
+    value_positions = np.flatnonzero(scores[:, 0] == best_price_scores[sorted_routes])
+    value_routes = sorted_routes[value_positions]
+    value_offsets = np.concatenate([[0], np.cumsum(np.bincount(value_routes, minlength=len(route_names)))])
+
+    arrays = {
+        'route_origins': route_names[:, 0].astype(str),
+        'route_destinations': route_names[:, 1].astype(str),
+        'route_offsets': route_offsets,
+        'companies': company_names.astype(str),
+        'company_codes': company_codes.ravel()[row_order].astype(np.int32),
+        'scores': np.ascontiguousarray(scores, dtype=np.float32),
+        'raw': np.ascontiguousarray(df[RAW_COLUMNS].to_numpy(dtype=np.float64)[row_order]),
+        'value_offsets': value_offsets.astype(np.int64),
+        # Stored relative to the route's first row, like build_route_index's value_rows
+        'value_rows': (value_positions - route_offsets[value_routes]).astype(np.int64),
+    }
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'rows': int(len(df)),
+        'routes': int(len(route_names)),
+        'score_columns': SCORE_COLUMNS,
+        'raw_columns': RAW_COLUMNS,
+        'arrays': {name: {'dtype': array.dtype.str, 'shape': list(array.shape)} for name, array in arrays.items()},
+        'source': {'path': os.path.basename(source), **file_fingerprint(source)} if source else None,
+    }
+
+    staging = path.rstrip('/\\') + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f'{name}.npy'), array, allow_pickle=False)
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    retired = path.rstrip('/\\') + '.old'
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, retired)
+    os.rename(staging, path)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(path=TABLE_DIR):
+    """Returns the table's manifest, or None when there is no table at `path`."""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def is_table_current(path=TABLE_DIR, source=None):
+    """
+    True when `path` holds a table of this FORMAT_VERSION built from the current contents of `source`.
+    Size and mtime are checked first; the content hash is only read when the mtime moved (e.g. after a
+    fresh checkout), so the common case costs one stat call. When the hash still matches, the new
+    mtime is recorded in the manifest, so the hash is read once per move rather than on every start.
+    """
+    manifest = read_manifest(path)
+    if manifest is None or manifest.get('format_version') != FORMAT_VERSION:
+        return False
+    if source is None or not os.path.exists(source):
+        return True
+    recorded = manifest.get('source') or {}
+    current = file_fingerprint(source, with_hash=False)
+    if recorded.get('size') != current['size']:
+        return False
+    if recorded.get('mtime_ns') == current['mtime_ns']:
+        return True
+    fingerprint = file_fingerprint(source)
+    if recorded.get('sha256') != fingerprint['sha256']:
+        return False
+    manifest['source'] = {**recorded, **fingerprint}
+    write_manifest(path, manifest)
+    return True
+
+
+def write_manifest(path, manifest):
+    """Replaces the manifest of an existing table; a table that cannot be written to is left as it is."""
+    target = os.path.join(path, MANIFEST_FILE)
+    staging = f'{target}.{os.getpid()}.tmp'
+    try:
+        with open(staging, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(staging, target)
+    except OSError:
+        pass
+
+
+class CarrierTable:
+    """
+    Read-only, memory-mapped view of a compiled carrier table that works as the route index:
+    table.get((origin, destination)) returns {'companies', 'scores', 'value_rows'} like
+    predict_api.build_route_index does, building each route's entry on first use.
+    """
+
+    def __init__(self, path=TABLE_DIR):
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No carrier table found in {path}.")
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Carrier table format {manifest.get('format_version')} is not supported (expected {FORMAT_VERSION}).")
+        self.manifest = manifest
+        for name in manifest['arrays']:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r', allow_pickle=False))
+        self._entries = {}
+
+    def __len__(self):
+        return len(self.route_origins)
+
+    def find_route(self, origin, destination):
+        """Binary-searches the sorted route arrays; returns the route number or None."""
+        low = np.searchsorted(self.route_origins, origin, side='left')
+        high = np.searchsorted(self.route_origins, origin, side='right')
+        if low == high:
+            return None
+        position = low + np.searchsorted(self.route_destinations[low:high], destination, side='left')
+        if position < high and self.route_destinations[position] == destination:
+            return int(position)
+        return None
+
+    def get(self, route, default=None):
+        entry = self._entries.get(route)
+        if entry is not None:
+            return entry
+        number = self.find_route(*route)
+        if number is None:
+            return default
+        start, end = self.route_offsets[number], self.route_offsets[number + 1]
+        value_start, value_end = self.value_offsets[number], self.value_offsets[number + 1]
+        entry = {
+            'companies': self.companies[self.company_codes[start:end]].tolist(),
+            # Scored in float64, as the CSV path does; the stored float32 values are upcast exactly.
+            'scores': np.array(self.scores[start:end], dtype=np.float64),
+            'value_rows': np.array(self.value_rows[value_start:value_end]),
+            # Raw columns and table row ids, for carrier_updates.py to rescore the route from
+            'raw': self.raw[start:end],
+            'rows': np.arange(start, end),
+        }
+        self._entries[route] = entry
+        return entry
+
+    def __contains__(self, route):
+        return self.get(route) is not None
+
+    def __getitem__(self, route):
+        entry = self.get(route)
+        if entry is None:
+            raise KeyError(route)
+        return entry
@@ -0,0 +1,198 @@
+import numpy as np
+import math
+from carrier_table import RAW_COLUMNS
+
+# --- Incremental Carrier Updates ---
+# Each score column is a min-max normalization of one raw column over the whole carrier table,
+# so changing one carrier only changes that carrier's own scores -- unless the change moves a
+# global min or max, in which case that column has to be rescored everywhere. Updates therefore
+# rescore the touched routes immediately and leave every other route as loaded until a bound
+# actually moves, when they are rescored lazily on first use.
+#
+# Every update produces a new CarrierSnapshot; nothing a published snapshot hands out is ever
+# modified, so a query that started on the old snapshot finishes on it unchanged.
+
+PRICE, SAFETY, TIME, WAREHOUSE = range(len(RAW_COLUMNS))
+
+
+def score_rows(raw, review_scores, bounds):
+    """
+    Scores raw (price, safety_rating, delivery_time_hours, warehouse_size_sqft) rows against the
+    global (min, max) bounds with the same formulas as predict_api.load_carrier_table, returned in
+    SCORE_COLUMNS order. The review column never changes with updates, so it is passed through.
+    """
+    scores = np.empty((len(raw), 5), dtype=np.float64)
+    (price_min, price_max), (safety_min, safety_max), (time_min, time_max), (warehouse_min, warehouse_max) = bounds
+    scores[:, 0] = 1 - (raw[:, PRICE] - price_min) / (price_max - price_min)
+    scores[:, 1] = 1 - (raw[:, TIME] - time_min) / (time_max - time_min)
+    scores[:, 2] = (raw[:, SAFETY] - safety_min) / (safety_max - safety_min)
+    scores[:, 3] = (raw[:, WAREHOUSE] - warehouse_min) / (warehouse_max - warehouse_min) if warehouse_max != warehouse_min else 0
+    scores[:, 4] = review_scores
+    return scores
+
+
+def rescore_entry(entry, raw, bounds):
+    """Returns a new route entry for `raw` scored against `bounds`; `entry` is left untouched."""
+    scores = score_rows(raw, entry['scores'][:, 4], bounds)
+    return {
+        'companies': entry['companies'],
+        'scores': scores,
+        'value_rows': np.flatnonzero(scores[:, 0] == scores[:, 0].max()),
+        'raw': raw,
+        'rows': entry['rows'],
+    }
+
+
+def finite_number(value, name):
+    """float(value) for one update field; a ValueError naming the field if that is not a finite number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number; got {value!r}.") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number; got {value!r}.")
+    return number
+
+class CarrierSnapshot:
+    """
+    One published version of the route index: the index as loaded, the routes changed by updates,
+    and the current global bounds. Works anywhere the route index does (get, in, []).
+    """
+
+    def __init__(self, base, base_bounds, bounds, updated_routes, version):
+        self.base = base
+        self.base_bounds = base_bounds
+        self.bounds = bounds
+        self.updated_routes = updated_routes
+        self.version = version
+        # Loaded scores are only valid while every bound still equals the one they were computed with.
+        self.rescore_all = bounds != base_bounds
+        self._rescored = {}
+
+    def get(self, route, default=None):
+        entry = self.updated_routes.get(route) or self._rescored.get(route)
+        if entry is not None:
+            return entry
+        entry = self.base.get(route)
+        if entry is None:
+            return default
+        if self.rescore_all:
+            entry = rescore_entry(entry, entry['raw'], self.bounds)
+            self._rescored[route] = entry
+        return entry
+
+    def __contains__(self, route):
+        return self.get(route) is not None
+
+    def __getitem__(self, route):
+        entry = self.get(route)
+        if entry is None:
+            raise KeyError(route)
+        return entry
+
+
+class CarrierUpdater:
+    """
+    Applies carrier row updates to a loaded route index and returns new snapshots.
+    `base_raw` returns the full raw column array (one row per carrier row, in the row ids the
+    route entries' 'rows' refer to); it is only read when bounds have to be found from scratch.
+    """
+
+    def __init__(self, base, base_raw):
+        self.base = base
+        self.base_raw = base_raw
+        self.snapshot = None
+
+    def current(self):
+        """The latest snapshot; the first call computes the loaded bounds."""
+        if self.snapshot is None:
+            raw = np.asarray(self.base_raw())
+            bounds = tuple((float(column.min()), float(column.max())) for column in raw.T)
+            self.snapshot = CarrierSnapshot(self.base, bounds, bounds, {}, 0)
+        return self.snapshot
+
+    def apply(self, updates):
+        """
+        Applies a list of updates like {"origin": "Bhopal", "destination": "Pune", "company": "Gati",
+        "price": 900} (absolute values) or {..., "delta": {"price": -50}} (changes), and returns
+        (snapshot, summary). The whole list is validated first, so either every update is applied
+        or none is. An empty list changes nothing and returns the current snapshot.
+        """
+        if not isinstance(updates, list):
+            raise ValueError("updates must be a list of carrier updates.")
+        snapshot = self.current()
+        if not updates:
+            return snapshot, {'version': snapshot.version, 'updated_routes': 0, 'bounds_moved': []}
+        changed = {}
+        for update in updates:
+            missing = [key for key in ('origin', 'destination', 'company') if key not in update] if isinstance(update, dict) else None
+            if missing is None or missing:
+                raise ValueError(f"Every update needs an origin, destination and company; got {update!r}.")
+            route = (update['origin'], update['destination'])
+            if route not in changed:
+                entry = snapshot.get(route)
+                if entry is None:
+                    raise ValueError(f"No data available for the route {route[0]} to {route[1]}.")
+                changed[route] = (entry, np.array(entry['raw'], dtype=np.float64))
+            entry, raw = changed[route]
+            matches = [row for row, company in enumerate(entry['companies']) if company == update['company']]
+            if not matches:
+                raise ValueError(f"{update['company']} does not serve the route {route[0]} to {route[1]}.")
+            deltas = update.get('delta', {})
+            if not isinstance(deltas, dict):
+                raise ValueError(f"delta must be an object of column changes; got {deltas!r}.")
+            unknown = [key for key in deltas if key not in RAW_COLUMNS]
+            if unknown:
+                raise ValueError(f"Cannot update {', '.join(unknown)}; updatable columns are {', '.join(RAW_COLUMNS)}.")
+            for column, name in enumerate(RAW_COLUMNS):
+                if name in update:
+                    raw[matches, column] = finite_number(update[name], name)
+                if name in deltas:
+                    raw[matches, column] += finite_number(deltas[name], f"delta {name}")
+
+        bounds, moved = self.find_bounds(snapshot, changed)
+        if moved:
+            # Previously updated routes were scored against the old bounds, so they are redone too.
+            updated_routes = {route: rescore_entry(entry, entry['raw'], bounds) for route, entry in snapshot.updated_routes.items()}
+        else:
+            updated_routes = dict(snapshot.updated_routes)
+        for route, (entry, raw) in changed.items():
+            updated_routes[route] = rescore_entry(entry, raw, bounds)
+
+        self.snapshot = CarrierSnapshot(self.base, snapshot.base_bounds, bounds, updated_routes, snapshot.version + 1)
+        return self.snapshot, {
+            'version': self.snapshot.version,
+            'updated_routes': len(changed),
+            'bounds_moved': [RAW_COLUMNS[column] for column in moved],
+        }
+
+    def find_bounds(self, snapshot, changed):
+        """
+        Returns the new (min, max) per raw column and the columns whose bounds moved. A bound is
+        only recomputed from the full column when a row that sat on it moved inwards; new values
+        outside the old bounds simply widen them.
+        """
+        bounds, moved, rescan = [], [], []
+        for column, (low, high) in enumerate(snapshot.bounds):
+            old_values = np.concatenate([np.asarray(entry['raw'])[:, column] for entry, _ in changed.values()])
+            new_values = np.concatenate([raw[:, column] for _, raw in changed.values()])
+            left_low = np.any((old_values == low) & (new_values > low))
+            left_high = np.any((old_values == high) & (new_values < high))
+            if left_low or left_high:
+                rescan.append(column)
+            bounds.append((min(low, float(new_values.min())), max(high, float(new_values.max()))))
+
+        if rescan:
+            # Full column with every updated route's rows replaced by their current values
+            columns = np.array(np.asarray(self.base_raw())[:, rescan], dtype=np.float64)
+            for route, entry in snapshot.updated_routes.items():
+                if route not in changed:
+                    columns[entry['rows']] = np.asarray(entry['raw'])[:, rescan]
+            for entry, raw in changed.values():
+                columns[entry['rows']] = raw[:, rescan]
+            for position, column in enumerate(rescan):
+                bounds[column] = (float(columns[:, position].min()), float(columns[:, position].max()))
+
+        bounds = tuple(bounds)
+        moved = [column for column in range(len(bounds)) if bounds[column] != snapshot.bounds[column]]
+        return bounds, moved
@@ -0,0 +1,156 @@
+import numpy as np
+import hashlib
+import json
+import os
+
+# --- The Virtual City Shared by Intra-City Training and Serving ---
+# The virtual city now has more locations and defined route conditions.
+
+CITY_LOCATIONS = {
+    "MP Nagar": (0, 0), "Arera Colony": (2, 3), "New Market": (-2, 1),
+    "Kolar Road": (4, 8), "ISBT": (5, 1), "Mandideep": (10, -5),
+    "Habib Ganj": (3, 0), "Piplani": (7, 2), "Bairagarh": (-8, 4),
+    "Shahpura": (1, 6), "Ayodhya Bypass": (8, 4), "Lalghati": (-5, 3)
+}
+LOCATIONS = list(CITY_LOCATIONS.keys())
+LOCATION_INDEX = {name: i for i, name in enumerate(LOCATIONS)}
+
+# Define locations with special facilities
+COLD_STORAGE_LOCATIONS = ["Mandideep", "Piplani"]
+
+# Define route conditions: (distance, road_quality, traffic_profile)
+# road_quality: 1.0 = smooth, 0.5 = bumpy
+# traffic_profile: 1.0 = clear, 2.0 = heavy traffic at peak times
+ROUTE_CONDITIONS = {
+    ("MP Nagar", "Arera Colony"): (5, 1.0, 1.8),
+    ("MP Nagar", "New Market"): (3, 0.8, 2.0),
+    ("Arera Colony", "Kolar Road"): (6, 0.9, 1.2),
+    ("New Market", "Bairagarh"): (10, 0.6, 1.5),
+    ("ISBT", "Mandideep"): (15, 0.7, 1.8),
+    ("Habib Ganj", "Piplani"): (5, 1.0, 1.6),
+    ("Shahpura", "Kolar Road"): (3, 1.0, 1.4),
+    ("Ayodhya Bypass", "Piplani"): (4, 0.9, 1.9),
+}
+DEFAULT_ROAD_QUALITY = 0.8
+DEFAULT_TRAFFIC = 1.5
+
+# Time of day: (bucket name, first hour, share of a route's peak congestion). A route's traffic in a
+# bucket is 1 + (traffic_profile - 1) * share, so peak buckets see the full profile and nights are clear.
+TRAFFIC_BUCKETS = [
+    ('night', 0, 0.0),
+    ('morning_peak', 8, 1.0),
+    ('midday', 11, 0.5),
+    ('evening_peak', 17, 1.0),
+    ('late_evening', 21, 0.25),
+]
+# Bucket number of every hour 0-23, and the hours as accepted in requests ("7" or 7)
+HOUR_NAMES = {str(hour) for hour in range(24)}
+HOUR_BUCKETS = [sum(first_hour <= hour for _, first_hour, _ in TRAFFIC_BUCKETS) - 1 for hour in range(24)]
+
+def route_definition(loc1, loc2):
+    """Calculates distance and gets route conditions, with defaults."""
+    key = tuple(sorted((loc1, loc2)))
+    if key in ROUTE_CONDITIONS:
+        return ROUTE_CONDITIONS[key]
+
+    # Default calculation for routes not explicitly defined
+    dist = ((CITY_LOCATIONS[loc1][0] - CITY_LOCATIONS[loc2][0])**2 +
+            (CITY_LOCATIONS[loc1][1] - CITY_LOCATIONS[loc2][1])**2)**0.5
+    return (dist, DEFAULT_ROAD_QUALITY, DEFAULT_TRAFFIC) # Default road quality and traffic
+
+
+# --- Dense All-Pairs Matrices ---
+# Everything above is turned once into (n x n) arrays indexed by LOCATION_INDEX, plus one traffic
+# slice per TRAFFIC_BUCKETS entry, so training and serving look routes up by index instead of
+# sorting names and probing ROUTE_CONDITIONS. The arrays are cached on disk under a hash of the
+# city definition: editing the city above simply produces (and then reuses) a new cache file.
+# traffic is the static profile, which training keeps using so its labels do not change.
+MATRIX_FORMAT_VERSION = 1
+MATRIX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'city_matrices')
+
+
+def city_fingerprint():
+    """SHA-256 of everything the matrices are built from."""
+    definition = {
+        'format_version': MATRIX_FORMAT_VERSION,
+        'locations': CITY_LOCATIONS,
+        'cold_storage': COLD_STORAGE_LOCATIONS,
+        'route_conditions': sorted([*key, *value] for key, value in ROUTE_CONDITIONS.items()),
+        'defaults': [DEFAULT_ROAD_QUALITY, DEFAULT_TRAFFIC],
+        'traffic_buckets': TRAFFIC_BUCKETS,
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+
+def build_city_matrices(locations=LOCATIONS):
+    """Returns the distance, road_quality, traffic, traffic_by_bucket and cold_storage arrays of the city."""
+    n = len(locations)
+    distance = np.zeros((n, n))
+    road_quality = np.zeros((n, n))
+    traffic = np.zeros((n, n))
+    for i, loc1 in enumerate(locations):
+        for j, loc2 in enumerate(locations):
+            distance[i, j], road_quality[i, j], traffic[i, j] = route_definition(loc1, loc2)
+    shares = np.array([share for _, _, share in TRAFFIC_BUCKETS])
+    return {
+        'distance': distance,
+        'road_quality': road_quality,
+        'traffic': traffic,
+        'traffic_by_bucket': 1 + (traffic[None, :, :] - 1) * shares[:, None, None],
+        'cold_storage': np.array([name in COLD_STORAGE_LOCATIONS for name in locations]),
+    }
+
+
+def load_city_matrices(cache_dir=MATRIX_CACHE_DIR):
+    """
+    Returns the city matrices, read from the cache file for the current city definition when there
+    is one and built (and cached) otherwise. A cache that cannot be read or written is rebuilt in memory.
+    """
+    path = os.path.join(cache_dir, f'city_{city_fingerprint()[:16]}.npz')
+    try:
+        with np.load(path, allow_pickle=False) as cached:
+            return {name: cached[name] for name in cached.files}
+    except (OSError, ValueError):
+        pass
+    matrices = build_city_matrices()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under a temporary name and renamed, so a reader never sees half a file
+        staging = f'{path}.{os.getpid()}.tmp'
+        with open(staging, 'wb') as f:
+            np.savez(f, **matrices)
+        os.replace(staging, path)
+    except OSError:
+        pass
+    return matrices
+
+
+CITY_MATRICES = load_city_matrices()
+DISTANCE = CITY_MATRICES['distance']
+ROAD_QUALITY = CITY_MATRICES['road_quality']
+TRAFFIC = CITY_MATRICES['traffic']
+TRAFFIC_BY_BUCKET = CITY_MATRICES['traffic_by_bucket']
+COLD_STORAGE_MASK = CITY_MATRICES['cold_storage']
+# Plain nested lists are much faster than NumPy for scalar lookups.
+ROUTE_STATS_ROWS = [list(zip(*rows)) for rows in zip(DISTANCE.tolist(), ROAD_QUALITY.tolist(), TRAFFIC.tolist())]
+
+
+def hour_bucket(hour):
+    """The TRAFFIC_BUCKETS index for an hour of the day (0-23); None stays None (the static profile)."""
+    if hour is None:
+        return None
+    if str(hour).strip() not in HOUR_NAMES:
+        raise ValueError(f"Hour must be a whole number from 0 to 23, got {hour!r}.")
+    return HOUR_BUCKETS[int(hour)]
+
+
+def get_route_stats(loc1, loc2, hour=None):
+    """
+    Returns (distance, road_quality, traffic) between two locations, with the static traffic
+    profile, or the traffic of that hour's bucket when `hour` is given.
+    """
+    i, j = LOCATION_INDEX[loc1], LOCATION_INDEX[loc2]
+    stats = ROUTE_STATS_ROWS[i][j]
+    if hour is None:
+        return stats
+    return stats[0], stats[1], float(TRAFFIC_BY_BUCKET[hour_bucket(hour), i, j])
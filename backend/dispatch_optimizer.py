@@ -0,0 +1,428 @@
+import random
+import json
+import time
+import sys
+from city_model import LOCATIONS, LOCATION_INDEX, COLD_STORAGE_LOCATIONS, hour_bucket
+from route_solver import cost_rows
+from instrumentation import METRICS
+
+# --- Multi-Vehicle Dispatch for the Virtual City ---
+# plan_route (intracity_predict.py) orders 3-5 stops for one vehicle. This plans a whole day: hundreds
+# of drops over the same city, shared out among several vans, with the same travel costs as
+# route_solver.py (distance x traffic, 1.5x on rough roads). As in solve_route, a van carrying any
+# fragile drop drives its whole route at the fragile cost, return to depot included.
+#
+# Constraints:
+#   - capacity: the demand of a van's drops may not exceed its capacity.
+#   - cold chain: drops that need cold storage only ride in refrigerated vans, and (like solve_route,
+#     which wants a cold storage facility on the route) such a van starts from one: from its depot if
+#     that is a cold storage location, otherwise via whichever one is cheapest on the way to its first stop.
+#
+# A van's drops at one location are delivered in a single visit, so a route is an ordering of the
+# distinct locations it serves. The solver builds a plan by cheapest insertion and then improves it
+# with local search until nothing improves:
+#   - relocate one drop, or a whole visit, to another van
+#   - 2-opt (reverse a run of visits) and or-opt (move a run of 1-3 visits) within a route
+# Every move is evaluated by re-costing the (at most len(LOCATIONS) visits long) routes it touches.
+# Local search alone stops at the first local optimum, so the rest of the time budget goes to
+# ruin and recreate: every visit to a random location and its nearest neighbours is removed from all
+# vans, the drops are re-inserted cheapest-first in random order, local search runs again, and the
+# result is kept only if it is cheaper. This stops after MAX_STALLED_ROUNDS rounds without an
+# improvement or when the budget runs out. The random generator is seeded, so a plan always gets the
+# same answer when the budget is not what stops it.
+
+DEFAULT_TIME_BUDGET = 5.0
+IMPROVEMENT_EPSILON = 1e-9
+OR_OPT_MAX_SEGMENT = 3
+RUIN_LOCATIONS = 3
+MAX_STALLED_ROUNDS = 300
+
+
+class Route:
+    """One van's drops, grouped by location into visits, plus the visit order and its cost."""
+
+    def __init__(self, vehicle):
+        self.vehicle = vehicle
+        self.visits = []
+        self.drops = {}
+        self.load = 0
+        self.cold = 0
+        self.fragile = 0
+        self.cost = 0.0
+        self.cold_storage_stop = None
+
+    def can_take(self, drops):
+        demand = sum(drop['demand'] for drop in drops)
+        if self.load + demand > self.vehicle['capacity']:
+            return False
+        return self.vehicle['refrigerated'] or not any(drop['cold'] for drop in drops)
+
+    def add(self, drops, visits):
+        for drop in drops:
+            self.drops.setdefault(drop['location'], []).append(drop)
+            self.load += drop['demand']
+            self.cold += drop['cold']
+            self.fragile += drop['fragile']
+        self.visits = visits
+
+    def remove(self, drops, visits):
+        for drop in drops:
+            at_location = self.drops[drop['location']]
+            at_location.remove(drop)
+            if not at_location:
+                del self.drops[drop['location']]
+            self.load -= drop['demand']
+            self.cold -= drop['cold']
+            self.fragile -= drop['fragile']
+        self.visits = visits
+
+
+class Dispatcher:
+    """Solves one plan; `rows` are the (base, fragile) cost matrices for the plan's hour."""
+
+    def __init__(self, vehicles, rows, return_to_depot=True):
+        self.vehicles = vehicles
+        self.base_rows, self.fragile_rows = rows
+        self.return_to_depot = return_to_depot
+        self.cold_storage = [LOCATION_INDEX[name] for name in COLD_STORAGE_LOCATIONS]
+        self.routes = [Route(vehicle) for vehicle in vehicles]
+        self.moves = {'drop_relocate': 0, 'visit_relocate': 0, 'two_opt': 0, 'or_opt': 0}
+
+    def route_cost(self, vehicle, visits, fragile, cold):
+        """Returns (cost, cold_storage_stop) of driving `visits` in order with that van; every leg at the fragile cost if `fragile`."""
+        if not visits:
+            return 0.0, None
+        rows = self.fragile_rows if fragile else self.base_rows
+        depot = vehicle['depot']
+        cost = 0.0
+        for here, there in zip(visits, visits[1:]):
+            cost += rows[here][there]
+        if self.return_to_depot:
+            cost += rows[visits[-1]][depot]
+        stop = None
+        if cold and depot not in self.cold_storage:
+            stop = min(self.cold_storage, key=lambda hub: rows[depot][hub] + rows[hub][visits[0]])
+            cost += rows[depot][stop] + rows[stop][visits[0]]
+        else:
+            cost += rows[depot][visits[0]]
+        return cost, stop
+
+    def cost_with(self, route, visits, fragile=None, cold=None):
+        fragile = route.fragile if fragile is None else fragile
+        cold = route.cold if cold is None else cold
+        return self.route_cost(route.vehicle, visits, fragile, cold)[0]
+
+    def best_insertion(self, route, location, fragile, cold):
+        """Cheapest (cost, visits) once `location` is served by `route`, visiting it at the best position."""
+        if location in route.drops:
+            if bool(fragile) == bool(route.fragile) and bool(cold) == bool(route.cold):
+                return route.cost, route.visits
+            return self.cost_with(route, route.visits, fragile, cold), route.visits
+        best = None
+        for position in range(len(route.visits) + 1):
+            visits = route.visits[:position] + [location] + route.visits[position:]
+            cost = self.cost_with(route, visits, fragile, cold)
+            if best is None or cost < best[0]:
+                best = (cost, visits)
+        return best
+
+    def refresh(self, route):
+        route.cost, route.cold_storage_stop = self.route_cost(route.vehicle, route.visits, route.fragile, route.cold)
+
+    # --- 1. Construction: cheapest insertion ---
+    def construct(self, drops, rng=None):
+        """
+        Inserts drops one at a time where they add the least cost; returns the drops nothing can take.
+        Cold drops go first (they have the fewest vans to choose from), then the rest from the biggest,
+        or in random order when an `rng` is given.
+        """
+        unassigned = []
+        for drop in sorted(drops, key=lambda drop: (not drop['cold'], rng.random() if rng else -drop['demand'], drop['order'])):
+            best = None
+            for route in self.routes:
+                if route.load + drop['demand'] > route.vehicle['capacity'] or drop['cold'] and not route.vehicle['refrigerated']:
+                    continue
+                cost, visits = self.best_insertion(route, drop['location'], route.fragile + drop['fragile'], route.cold + drop['cold'])
+                delta = cost - route.cost
+                if best is None or delta < best[0] - IMPROVEMENT_EPSILON:
+                    best = (delta, route, visits)
+            if best is None:
+                unassigned.append(drop)
+                continue
+            _, route, visits = best
+            route.add([drop], visits)
+            self.refresh(route)
+        return unassigned
+
+    # --- 2. Local search ---
+    def relocate(self, source, drops, allow_partial_visit):
+        """Moves `drops` (all at one location) out of `source` into the van where that saves the most."""
+        location = drops[0]['location']
+        leaves_visit = len(drops) == len(source.drops[location])
+        if not leaves_visit and not allow_partial_visit:
+            return False
+        fragile = sum(drop['fragile'] for drop in drops)
+        cold = sum(drop['cold'] for drop in drops)
+        source_visits = [visit for visit in source.visits if visit != location] if leaves_visit else source.visits
+        source_cost = self.cost_with(source, source_visits, source.fragile - fragile, source.cold - cold)
+        best = None
+        for target in self.routes:
+            if target is source or not target.can_take(drops):
+                continue
+            cost, visits = self.best_insertion(target, location, target.fragile + fragile, target.cold + cold)
+            delta = source_cost + cost - source.cost - target.cost
+            if delta < -IMPROVEMENT_EPSILON and (best is None or delta < best[0]):
+                best = (delta, target, visits)
+        if best is None:
+            return False
+        _, target, visits = best
+        source.remove(drops, source_visits)
+        target.add(drops, visits)
+        self.refresh(source)
+        self.refresh(target)
+        return True
+
+    def improve_route(self, route):
+        """2-opt and or-opt on one route's visit order until neither finds an improvement."""
+        improved = True
+        changed = False
+        while improved:
+            improved = False
+            visits = route.visits
+            n = len(visits)
+            for i in range(n - 1):
+                for j in range(i + 2, n + 1):
+                    candidate = visits[:i] + visits[i:j][::-1] + visits[j:]
+                    cost = self.cost_with(route, candidate)
+                    if cost < route.cost - IMPROVEMENT_EPSILON:
+                        route.visits = candidate
+                        self.refresh(route)
+                        self.moves['two_opt'] += 1
+                        improved = changed = True
+                        break
+                if improved:
+                    break
+            if improved:
+                continue
+            for length in range(1, min(OR_OPT_MAX_SEGMENT, n - 1) + 1):
+                for i in range(n - length + 1):
+                    segment = visits[i:i + length]
+                    rest = visits[:i] + visits[i + length:]
+                    for position in range(len(rest) + 1):
+                        if position == i:
+                            continue
+                        candidate = rest[:position] + segment + rest[position:]
+                        cost = self.cost_with(route, candidate)
+                        if cost < route.cost - IMPROVEMENT_EPSILON:
+                            route.visits = candidate
+                            self.refresh(route)
+                            self.moves['or_opt'] += 1
+                            improved = changed = True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+        return changed
+
+    def local_search(self, deadline):
+        """Repeats full passes over every neighbourhood until one changes nothing or time runs out."""
+        passes = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            passes += 1
+            for route in self.routes:
+                if self.improve_route(route):
+                    improved = True
+            for source in self.routes:
+                for location in list(source.visits):
+                    if time.perf_counter() >= deadline:
+                        return passes, False
+                    if location not in source.drops:
+                        continue
+                    if self.relocate(source, list(source.drops[location]), allow_partial_visit=False):
+                        self.moves['visit_relocate'] += 1
+                        improved = True
+                        continue
+                    # A single drop leaving a visit that stays only changes the route when it is the
+                    # last fragile or cold drop on board, so only those are worth trying.
+                    for drop in list(source.drops.get(location, ())):
+                        if not (drop['fragile'] and source.fragile == 1 or drop['cold'] and source.cold == 1):
+                            continue
+                        if self.relocate(source, [drop], allow_partial_visit=True):
+                            self.moves['drop_relocate'] += 1
+                            improved = True
+        return passes, not improved
+
+    def snapshot(self):
+        return [(route.visits, {location: list(drops) for location, drops in route.drops.items()},
+                 route.load, route.cold, route.fragile, route.cost, route.cold_storage_stop) for route in self.routes]
+
+    def restore(self, state):
+        for route, saved in zip(self.routes, state):
+            route.visits, drops, route.load, route.cold, route.fragile, route.cost, route.cold_storage_stop = saved
+            route.drops = {location: list(at_location) for location, at_location in drops.items()}
+
+    def ruin_and_recreate(self, rng, deadline):
+        """Perturbs the plan around a random location until the stall limit or deadline; returns the rounds run."""
+        locations = sorted({location for route in self.routes for location in route.visits})
+        if not locations:
+            return 0
+        rounds = stalled = 0
+        best_cost = self.total_cost()
+        while stalled < MAX_STALLED_ROUNDS and time.perf_counter() < deadline:
+            rounds += 1
+            state = self.snapshot()
+            center = rng.choice(locations)
+            ruined = set(sorted(locations, key=lambda location: self.base_rows[center][location])[:RUIN_LOCATIONS])
+            removed = []
+            for route in self.routes:
+                for location in [visit for visit in route.visits if visit in ruined]:
+                    drops = route.drops[location]
+                    removed.extend(drops)
+                    route.remove(list(drops), [visit for visit in route.visits if visit != location])
+                self.refresh(route)
+            if self.construct(removed, rng):
+                self.restore(state)
+                stalled += 1
+                continue
+            self.local_search(deadline)
+            if self.total_cost() < best_cost - IMPROVEMENT_EPSILON:
+                best_cost = self.total_cost()
+                stalled = 0
+            else:
+                self.restore(state)
+                stalled += 1
+        return rounds
+
+    def total_cost(self):
+        return sum(route.cost for route in self.routes)
+
+
+# --- 3. Plans ---
+def parse_plan(plan):
+    """Validates a plan and returns (vehicles, drops, hour); raises ValueError with a readable message."""
+    vehicles, drops = [], []
+    for number, vehicle in enumerate(plan.get('vehicles') or []):
+        depot = vehicle.get('depot', LOCATIONS[0])
+        if depot not in LOCATION_INDEX:
+            raise ValueError(f"Unknown depot {depot!r} for vehicle {vehicle.get('id', number)}.")
+        capacity = float(vehicle.get('capacity', 0))
+        if capacity <= 0:
+            raise ValueError(f"Vehicle {vehicle.get('id', number)} needs a positive capacity.")
+        vehicles.append({'id': vehicle.get('id', number), 'depot': LOCATION_INDEX[depot], 'capacity': capacity,
+                         'refrigerated': bool(vehicle.get('refrigerated', False))})
+    if not vehicles:
+        raise ValueError("At least one vehicle is required.")
+    for number, drop in enumerate(plan.get('drops') or []):
+        location = drop.get('location')
+        if location not in LOCATION_INDEX:
+            raise ValueError(f"Unknown location {location!r} for drop {drop.get('id', number)}.")
+        demand = float(drop.get('demand', 1))
+        if demand < 0:
+            raise ValueError(f"Drop {drop.get('id', number)} has a negative demand.")
+        drops.append({'id': drop.get('id', number), 'order': number, 'location': LOCATION_INDEX[location], 'demand': demand,
+                      'cold': bool(drop.get('needs_cold_storage', False)), 'fragile': bool(drop.get('is_fragile', False))})
+    hour = plan.get('hour')
+    hour_bucket(hour)
+    return vehicles, drops, hour
+
+
+def dispatch(plan, time_budget=DEFAULT_TIME_BUDGET, seed=0):
+    """
+    Assigns and orders a day's drops. `plan` is
+      {"vehicles": [{"id", "depot", "capacity", "refrigerated"}, ...],
+       "drops": [{"id", "location", "demand", "needs_cold_storage", "is_fragile"}, ...],
+       "hour": optional 0-23, "return_to_depot": optional, default true}
+    Returns the routes, the drops no van could take, the total cost and how the solve went.
+    """
+    started = time.perf_counter()
+    try:
+        vehicles, drops, hour = parse_plan(plan)
+    except (TypeError, ValueError) as exc:
+        return {"error": str(exc)}
+    dispatcher = Dispatcher(vehicles, (cost_rows(False, hour), cost_rows(True, hour)), plan.get('return_to_depot', True))
+
+    with METRICS.stage('dispatch_construct'):
+        unassigned = dispatcher.construct(drops)
+    constructed = time.perf_counter()
+    construction_cost = dispatcher.total_cost()
+    with METRICS.stage('dispatch_search'):
+        passes, converged = dispatcher.local_search(started + time_budget)
+    searched = time.perf_counter()
+    local_search_cost = dispatcher.total_cost()
+    with METRICS.stage('dispatch_ruin_recreate'):
+        rounds = dispatcher.ruin_and_recreate(random.Random(seed), started + time_budget)
+    finished = time.perf_counter()
+
+    routes = []
+    for route in dispatcher.routes:
+        visits = [{'location': LOCATIONS[location], 'drops': [drop['id'] for drop in route.drops[location]]} for location in route.visits]
+        routes.append({
+            'vehicle': route.vehicle['id'],
+            'depot': LOCATIONS[route.vehicle['depot']],
+            'cold_storage_stop': LOCATIONS[route.cold_storage_stop] if route.cold_storage_stop is not None else None,
+            'visits': visits,
+            'load': route.load,
+            'capacity': route.vehicle['capacity'],
+            'cost': round(route.cost, 3),
+        })
+    return {
+        'routes': routes,
+        'unassigned': [drop['id'] for drop in unassigned],
+        'total_cost': round(dispatcher.total_cost(), 3),
+        'solve': {
+            'drops': len(drops),
+            'vehicles': len(vehicles),
+            'construction_cost': round(construction_cost, 3),
+            'construction_s': round(constructed - started, 4),
+            'local_search_cost': round(local_search_cost, 3),
+            'local_search_s': round(searched - constructed, 4),
+            'local_search_passes': passes,
+            'local_search_converged': converged,
+            'ruin_recreate_s': round(finished - searched, 4),
+            'ruin_recreate_rounds': rounds,
+            'solve_s': round(finished - started, 4),
+            'time_budget_s': time_budget,
+            'moves': dispatcher.moves,
+        },
+    }
+
+
+def random_plan(num_drops=500, num_vehicles=8, seed=0, hour=None):
+    """A reproducible plan over the city: a third of the vans refrigerated, some cold and fragile drops, ~80% fleet load."""
+    rng = random.Random(seed)
+    drops = []
+    for number in range(num_drops):
+        product_type = rng.choice(["Documents", "Food", "Electronics"])
+        drops.append({'id': number, 'location': rng.choice(LOCATIONS), 'demand': rng.randint(1, 5),
+                      'needs_cold_storage': product_type == "Food" and rng.random() > 0.5,
+                      'is_fragile': product_type == "Electronics" and rng.random() > 0.5})
+    capacity = -(-sum(drop['demand'] for drop in drops) // (0.8 * num_vehicles))
+    vehicles = [{'id': f'van-{number + 1}', 'depot': rng.choice(LOCATIONS), 'capacity': capacity,
+                 'refrigerated': number % 3 == 0} for number in range(num_vehicles)]
+    return {'vehicles': vehicles, 'drops': drops, 'hour': hour}
+
+
+# --- 4. Script Execution ---
+if __name__ == "__main__":
+    # Example: python3 dispatch_optimizer.py plan.json [time_budget_seconds]
+    #          python3 dispatch_optimizer.py --benchmark [drops] [vehicles] [time_budget_seconds]
+    # --metrics prints the recorded stage timings to stderr at the end.
+    if '--metrics' in sys.argv:
+        sys.argv.remove('--metrics')
+    if len(sys.argv) >= 2 and sys.argv[1] == '--benchmark':
+        counts = [int(value) for value in sys.argv[2:4]]
+        budget = float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_TIME_BUDGET
+        result = dispatch(random_plan(*counts), budget)
+        print(json.dumps({'total_cost': result['total_cost'], 'unassigned': len(result['unassigned']), 'solve': result['solve']}, indent=4))
+    elif len(sys.argv) in (2, 3):
+        with open(sys.argv[1]) as f:
+            plan = json.load(f)
+        print(json.dumps(dispatch(plan, float(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_TIME_BUDGET), indent=4))
+    else:
+        print(json.dumps({"error": "Invalid number of arguments. Expected: plan.json [time_budget_seconds] (or --benchmark [drops] [vehicles] [time_budget_seconds])"}))
+        sys.exit(1)
+    if METRICS.enabled:
+        print(json.dumps(METRICS.snapshot(), indent=4), file=sys.stderr)
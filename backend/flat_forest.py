@@ -0,0 +1,92 @@
+import numpy as np
+
+# --- Flattened Random Forest for Single-Row Prediction ---
+# RandomForestClassifier.predict costs milliseconds per call, almost all of it input validation
+# and per-tree dispatch. Copying every tree into shared node arrays lets one row walk all trees
+# at once with a handful of NumPy operations per depth level.
+
+class FlatForest:
+    """
+    Read-only copy of a fitted RandomForestClassifier that predicts one row at a time.
+    Gives exactly the class model.predict would: per-tree probabilities are normalized and summed
+    in estimator order, as scikit-learn does, before taking the argmax.
+    """
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left < 0
+            # Leaves point back at themselves, so every tree can be walked for the same number of steps.
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            # Only leaf values are ever read (or saved); zeroing the rest keeps reloaded forests identical.
+            values.append(np.where(is_leaf[:, None], value / normalizer, 0.0))
+        self.roots = np.asarray(offsets, dtype=np.intp)
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        self.depth = max(tree.max_depth for tree in trees)
+        self.classes = model.classes_
+
+    # Everything needed to predict, as saved by model_bundle.py. On disk the node indices use the
+    # narrowest integer type that holds them and only leaf rows of `value` are kept.
+    INDEX_ARRAYS = ('roots', 'feature', 'left', 'right')
+
+    def to_arrays(self):
+        arrays = {name: getattr(self, name) for name in ('threshold', 'classes')}
+        for name in self.INDEX_ARRAYS:
+            index = getattr(self, name)
+            arrays[name] = index.astype(np.min_scalar_type(index.max(initial=0)))
+        arrays['leaf_value'] = self.value[self.left == np.arange(len(self.left))]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, depth):
+        """Rebuilds a forest from to_arrays() output without scikit-learn."""
+        forest = cls.__new__(cls)
+        forest.threshold = arrays['threshold']
+        forest.classes = arrays['classes']
+        for name in cls.INDEX_ARRAYS:
+            setattr(forest, name, arrays[name].astype(np.intp))
+        leaf_value = arrays['leaf_value']
+        forest.value = np.zeros((len(forest.left), leaf_value.shape[1]))
+        forest.value[forest.left == np.arange(len(forest.left))] = leaf_value
+        forest.depth = depth
+        return forest
+
+    def predict(self, rows):
+        """Predicts every row of a 2-D feature array; each answer equals predict_one on that row."""
+        x = np.asarray(rows, dtype=np.float32).astype(np.float64)
+        predictions = []
+        # Chunks bound the rows x trees x classes probability block
+        for start in range(0, len(x), 1024):
+            chunk = x[start:start + 1024]
+            row_ids = np.arange(len(chunk))[:, None]
+            nodes = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            for _ in range(self.depth):
+                nodes = np.where(chunk[row_ids, self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+            # Axis 1 (trees) is reduced one tree at a time, in estimator order, as in predict_one.
+            proba = np.add.reduce(self.value[nodes], axis=1)
+            predictions.append(self.classes[np.argmax(proba, axis=1)])
+        return np.concatenate(predictions) if predictions else self.classes[:0]
+
+    def predict_one(self, row):
+        """Predicts the class of a single feature row (a sequence of numbers in training column order)."""
+        # scikit-learn compares float32 inputs against float64 thresholds; do the same.
+        x = np.asarray(row, dtype=np.float32).astype(np.float64)
+        nodes = self.roots
+        for _ in range(self.depth):
+            nodes = np.where(x[self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+        # Reducing along axis 0 adds the trees one at a time, in the same order scikit-learn does.
+        proba = np.add.reduce(self.value[nodes], axis=0)
+        return self.classes[np.argmax(proba)]
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-import random
+import argparse
+import os
 
 # --- Configuration ---
 COMPANIES = [f"Company_{chr(65 + i)}" for i in range(15)] + ["Swift Express", "SafeStore", "Gati", "DTDC", "Delhivery"]
@@ -22,26 +23,196 @@ ROUTE_METRICS = {
     ("Bhopal", "Kolkata"): {"base_price": 1500, "base_time": 28},
 }
 
-data = []
+# The columns predict_api.py and train_model.py read
+COLUMNS = ["origin", "destination", "company", "price", "safety_rating", "delivery_time_hours"]
+OUTPUT_FORMATS = ['csv', 'parquet', 'feather']
+
+
+# --- Routes and Carriers at Any Scale ---
+def build_companies(num_carriers):
+    """The 20 named companies first, then numbered synthetic carriers."""
+    extra = [f"Carrier_{i:06d}" for i in range(max(0, num_carriers - len(COMPANIES)))]
+    return np.array((COMPANIES + extra)[:num_carriers], dtype=object)
+
+
+def build_routes(num_routes, rng):
+    """
+    Returns (origins, destinations, base_prices, base_times) for `num_routes` distinct routes.
+    The five real Bhopal routes come first; further routes are sampled between the real locations
+    and as many numbered synthetic cities as are needed to have enough distinct pairs.
+    """
+    fixed = ROUTES[:num_routes]
+    origins = [origin for origin, _ in fixed]
+    destinations = [destination for _, destination in fixed]
+    base_prices = [ROUTE_METRICS[route]["base_price"] for route in fixed]
+    base_times = [ROUTE_METRICS[route]["base_time"] for route in fixed]
+
+    extra_routes = num_routes - len(fixed)
+    if extra_routes > 0:
+        num_locations = len(LOCATIONS)
+        while num_locations * (num_locations - 1) < num_routes:
+            num_locations += 1
+        locations = np.array(LOCATIONS + [f"City_{i:05d}" for i in range(num_locations - len(LOCATIONS))], dtype=object)
+        # Every ordered pair (a, b) with a != b, encoded as a * L + b, in random order
+        pair_codes = rng.permutation(num_locations * num_locations)
+        pair_origins, pair_destinations = np.divmod(pair_codes, num_locations)
+        taken = set(fixed)
+        keep = [(a, b) for a, b in zip(pair_origins.tolist(), pair_destinations.tolist())
+                if a != b and (locations[a], locations[b]) not in taken][:extra_routes]
+        keep = np.array(keep)
+        origins += locations[keep[:, 0]].tolist()
+        destinations += locations[keep[:, 1]].tolist()
+        # Synthetic routes keep the real routes' ratio of roughly 50-60 rupees per hour of transit
+        times = np.round(rng.uniform(4, 30, extra_routes), 1)
+        base_prices += np.round(times * rng.uniform(45, 60, extra_routes), -1).tolist()
+        base_times += times.tolist()
+
+    return (np.array(origins, dtype=object), np.array(destinations, dtype=object),
+            np.array(base_prices, dtype=np.float64), np.array(base_times, dtype=np.float64))
+
+
+def sample_carriers(rng, num_routes, per_route, num_carriers):
+    """Picks `per_route` distinct carrier indices for each of `num_routes` routes."""
+    if per_route == num_carriers:
+        return np.broadcast_to(np.arange(num_carriers), (num_routes, per_route))
+    if per_route * per_route < num_carriers:
+        # Few carriers out of many: draw with replacement and redraw the rare rows with a repeat
+        picks = rng.integers(0, num_carriers, size=(num_routes, per_route))
+        while True:
+            ordered = np.sort(picks, axis=1)
+            repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            if not repeated.any():
+                return picks
+            picks[repeated] = rng.integers(0, num_carriers, size=(int(repeated.sum()), per_route))
+    return np.array([rng.choice(num_carriers, per_route, replace=False) for _ in range(num_routes)])
+
+
+def generate_chunks(num_routes, num_carriers, num_rows, rng, chunk_rows=100000):
+    """
+    Yields the dataset as DataFrames of about `chunk_rows` rows each, so memory stays flat.
+    The rows are spread over the routes as evenly as they divide: the first num_rows % num_routes
+    routes get one row more than the rest, so every route appears.
+    """
+    if num_routes < 1 or num_carriers < 1 or num_rows < num_routes:
+        raise ValueError(f"Need at least one route and one carrier, and at least one row per route; got {num_routes} routes, {num_carriers} carriers and {num_rows} rows.")
+    base_rows, extra_rows = divmod(num_rows, num_routes)
+    per_route = base_rows + (extra_rows > 0)
+    if per_route > num_carriers:
+        raise ValueError(f"{num_rows} rows over {num_routes} routes needs {per_route} carriers per route, but only {num_carriers} exist.")
+    companies = build_companies(num_carriers)
+    origins, destinations, base_prices, base_times = build_routes(num_routes, rng)
+    routes_per_chunk = max(1, chunk_rows // per_route)
+
+    for first_route in range(0, num_routes, routes_per_chunk):
+        route_ids = np.arange(first_route, min(first_route + routes_per_chunk, num_routes))
+        carriers = sample_carriers(rng, len(route_ids), per_route, num_carriers)
+        rows_per_route = base_rows + (route_ids < extra_rows)
+        route_of_row = np.repeat(route_ids, rows_per_route)
+        # Row-major boolean indexing keeps each route's first rows_per_route carriers, in route order
+        carrier_of_row = carriers[np.arange(per_route) < rows_per_route[:, None]]
+        size = len(route_of_row)
 
-# --- Generate Realistic Data ---
-for origin, destination in ROUTES:
-    metrics = ROUTE_METRICS[(origin, destination)]
-    for company in COMPANIES:
         # Each company has its own characteristics
-        price_multiplier = random.uniform(0.8, 1.5) # Some are cheaper, some pricier
-        time_multiplier = random.uniform(0.7, 1.3)  # Some are faster, some slower
-        
-        price = round(metrics["base_price"] * price_multiplier, -1) # Round to nearest 10
-        delivery_time_hours = round(metrics["base_time"] * time_multiplier, 1)
-        safety_rating = round(random.uniform(3.0, 5.0), 1) # Rating out of 5
+        price_multiplier = rng.uniform(0.8, 1.5, size) # Some are cheaper, some pricier
+        time_multiplier = rng.uniform(0.7, 1.3, size)  # Some are faster, some slower
+        yield pd.DataFrame({
+            "origin": origins[route_of_row],
+            "destination": destinations[route_of_row],
+            "company": companies[carrier_of_row],
+            "price": np.round(base_prices[route_of_row] * price_multiplier, -1), # Round to nearest 10
+            "safety_rating": np.round(rng.uniform(3.0, 5.0, size), 1), # Rating out of 5
+            "delivery_time_hours": np.round(base_times[route_of_row] * time_multiplier, 1),
+        }, columns=COLUMNS)
+
+
+# --- Chunked Writers ---
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
 
-        data.append([origin, destination, company, price, safety_rating, delivery_time_hours])
+    def close(self):
+        pass
+
+
+class ArrowWriter:
+    """Streams chunks into a Parquet file or a Feather (Arrow IPC) file; needs the optional pyarrow package."""
+
+    def __init__(self, path, file_format):
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit(f"Writing {file_format} needs the optional pyarrow package: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([("origin", pa.string()), ("destination", pa.string()), ("company", pa.string()),
+                                 ("price", pa.float64()), ("safety_rating", pa.float64()), ("delivery_time_hours", pa.float64())])
+        if file_format == 'parquet':
+            self.writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, chunk):
+        self.writer.write_table(self.pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, file_format):
+    return CsvWriter(path) if file_format == 'csv' else ArrowWriter(path, file_format)
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic carrier data for training and load tests.")
+    parser.add_argument('--routes', type=positive_int, default=len(ROUTES), help="Number of distinct (origin, destination) routes (default: 5).")
+    parser.add_argument('--carriers', type=positive_int, default=len(COMPANIES), help="Number of distinct carriers (default: 20).")
+    parser.add_argument('--rows', type=positive_int, default=None, help="Total rows, spread evenly over the routes (default: routes x carriers).")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for numpy's Generator; the same seed and --chunk-rows give the same data.")
+    parser.add_argument('--chunk-rows', type=positive_int, default=100000, help="Rows generated and written per chunk (default: 100000).")
+    parser.add_argument('--output', default="logistics_data.csv", help="Output path; other formats swap the extension (default: logistics_data.csv).")
+    parser.add_argument('--format', default='csv', help="Comma-separated output formats: csv, parquet, feather (default: csv).")
+    args = parser.parse_args()
+    if args.rows is not None and args.rows < args.routes:
+        parser.error(f"--rows ({args.rows}) must be at least --routes ({args.routes}), so every route gets a row.")
+    return args
+
+
+# --- Generate Realistic Data ---
+if __name__ == "__main__":
+    args = parse_args()
+    formats = [f.strip() for f in args.format.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown:
+        raise SystemExit(f"Unknown output format(s): {', '.join(unknown)}. Choose from {', '.join(OUTPUT_FORMATS)}.")
+    num_rows = args.rows if args.rows is not None else args.routes * args.carriers
 
-# Create a Pandas DataFrame
-df = pd.DataFrame(data, columns=["origin", "destination", "company", "price", "safety_rating", "delivery_time_hours"])
+    base_path = os.path.splitext(args.output)[0]
+    paths = {f: args.output if f == 'csv' and args.output.endswith('.csv') else f"{base_path}.{f}" for f in formats}
+    writers = [open_writer(paths[f], f) for f in formats]
+    rng = np.random.default_rng(args.seed)
 
-# Save the data to a CSV file
-df.to_csv("logistics_data.csv", index=False)
+    total = 0
+    try:
+        for chunk in generate_chunks(args.routes, args.carriers, num_rows, rng, args.chunk_rows):
+            for writer in writers:
+                writer.write(chunk)
+            total += len(chunk)
+    finally:
+        for writer in writers:
+            writer.close()
 
-print("Successfully generated logistics_data.csv with", len(df), "entries.")
\ No newline at end of file
+    print(f"Successfully generated {', '.join(paths.values())} with", total, "entries.")
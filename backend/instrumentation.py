@@ -0,0 +1,165 @@
+import os
+import io
+import sys
+import time
+import bisect
+import pstats
+import cProfile
+
+# --- Opt-In Timing, Counters and Profiling ---
+# Off by default. Set LOGISTICS_METRICS=1 (or pass --metrics to predict_api.py / intracity_predict.py)
+# to record how long each pipeline stage takes. When off, nothing is recorded and instrumented code
+# pays almost nothing: stage() hands back one shared no-op context manager (fine for load-time and
+# per-batch stages), and laps() returns None, so hot paths only pay an `if laps:` test per stage.
+
+ENABLED = os.environ.get('LOGISTICS_METRICS', '').strip().lower() in ('1', 'true', 'yes', 'on') or '--metrics' in sys.argv
+
+# Histogram bucket upper bounds in microseconds: 1, 2, 4, ... ~67 seconds, then overflow.
+BUCKET_BOUNDS_US = [2.0 ** power for power in range(27)]
+
+
+class Histogram:
+    """Latency histogram with power-of-two buckets; percentiles are reported as bucket upper bounds."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, seconds):
+        micros = seconds * 1e6
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_US, micros)] += 1
+        self.count += 1
+        self.total += micros
+        self.min = min(self.min, micros)
+        self.max = max(self.max, micros)
+
+    def percentile(self, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS_US + [self.max], self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'total_ms': round(self.total / 1e3, 3),
+            'mean_us': round(self.total / self.count, 1),
+            'min_us': round(self.min, 1),
+            'max_us': round(self.max, 1),
+            'p50_us': round(self.percentile(0.50), 1),
+            'p90_us': round(self.percentile(0.90), 1),
+            'p99_us': round(self.percentile(0.99), 1),
+            # Only non-empty buckets, keyed by their upper bound ("inf" for the overflow bucket)
+            'buckets_us': {(f'{bound:g}' if index < len(BUCKET_BOUNDS_US) else 'inf'): bucket_count
+                           for index, (bound, bucket_count) in enumerate(zip(BUCKET_BOUNDS_US + [0], self.buckets)) if bucket_count},
+        }
+
+
+class _NoStage:
+    """What stage() returns while metrics are off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+NO_STAGE = _NoStage()
+
+
+class _Laps:
+    """Times consecutive stages of one call: each lap() records the time since the previous one."""
+    __slots__ = ('metrics', 'last')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.metrics.observe(name, now - self.last)
+        self.last = now
+
+
+class Metrics:
+    """Named counters and per-stage latency histograms for one process."""
+
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def stage(self, name):
+        """Context manager that records how long its block took under `name`."""
+        if not self.enabled:
+            return NO_STAGE
+        return _Stage(self, name)
+
+    def laps(self):
+        """A lap timer starting now, or None while metrics are off (check with `if laps:`)."""
+        return _Laps(self) if self.enabled else None
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+        self.started_at = time.time()
+
+    def snapshot(self):
+        """Everything recorded so far, as a JSON-ready dict."""
+        return {
+            'enabled': self.enabled,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started_at)),
+            'counters': dict(sorted(self.counters.items())),
+            'stages': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+        }
+
+
+METRICS = Metrics()
+
+
+def profile_call(fn, *args, sort='cumulative', limit=30):
+    """
+    Runs fn(*args) once under cProfile and returns (result, report) where report is the pstats
+    table of the `limit` most expensive functions. Works whether or not metrics are enabled.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).strip_dirs().sort_stats(sort).print_stats(limit)
+    return result, report.getvalue()
@@ -0,0 +1,229 @@
+import sys
+import json
+import os
+import time
+from city_model import CITY_LOCATIONS, hour_bucket
+from route_solver import solve_route
+from model_bundle import ModelBundle, INTRACITY_MODEL_BUNDLE
+from instrumentation import METRICS, profile_call
+from worker_pool import WorkerPool
+
+# --- 1. Open the Intra-City Model Bundle Once ---
+# train_intracity_model.py saves the bundle next to itself, so look for it there. The repo ships a small one
+# (python3 train_intracity_model.py --scenarios 5000 --seed 2024); run it without --scenarios for the full model.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_PATH = os.path.join(script_dir, INTRACITY_MODEL_BUNDLE)
+
+# Must match the columns train_intracity_model.py trains on.
+NUM_STOP_COLUMNS = 5
+STOP_COLUMNS = [f'stop_{i+1}' for i in range(NUM_STOP_COLUMNS)]
+FEATURE_COLUMNS = STOP_COLUMNS + ['is_fragile', 'needs_cold_storage', 'product_type']
+
+try:
+    with METRICS.stage('model_load'):
+        BUNDLE = ModelBundle(BUNDLE_PATH)
+except (FileNotFoundError, ValueError) as exc:
+    print(json.dumps({"error": f"Intra-city model bundle not usable ({exc}). Please run train_intracity_model.py first."}))
+    sys.exit(1)
+
+# Plain dict lookups replace LabelEncoder.transform, which needs an array round trip per value.
+# The forest itself (BUNDLE.forest) is only read on the first prediction.
+FEATURE_CODES = {col: BUNDLE.codes(col) for col in FEATURE_COLUMNS}
+FIRST_STOP_LABELS = BUNDLE.encoders['best_first_stop']
+# Route costs closer than this are treated as equal
+COST_TOLERANCE = 1e-9
+
+
+def reload_model():
+    """Re-opens the bundle (forest included) and swaps it in; the old one keeps serving if this fails."""
+    global BUNDLE, FEATURE_CODES, FIRST_STOP_LABELS
+    bundle = ModelBundle(BUNDLE_PATH)
+    bundle.forest
+    BUNDLE, FEATURE_CODES, FIRST_STOP_LABELS = bundle, {col: bundle.codes(col) for col in FEATURE_COLUMNS}, bundle.encoders['best_first_stop']
+    return {'reloaded': True, 'model': bundle.manifest['model']}
+
+
+# --- 2. Prediction ---
+def encode_features(stops, is_fragile, needs_cold_storage, product_type):
+    """Builds the encoded feature row exactly as training does: sorted stops padded with 'None'."""
+    padded_stops = sorted(stops) + ['None'] * (NUM_STOP_COLUMNS - len(stops))
+    # Training encodes every value through str(), so booleans are matched as 'True'/'False'
+    values = padded_stops + [str(bool(is_fragile)), str(bool(needs_cold_storage)), product_type]
+    row = []
+    for col, value in zip(FEATURE_COLUMNS, values):
+        code = FEATURE_CODES[col].get(value)
+        if code is None:
+            raise ValueError(f"Unknown value {value!r} for {col}.")
+        row.append(code)
+    return row
+
+
+def predict_first_stop(stops, is_fragile, needs_cold_storage, product_type):
+    """Returns the model's predicted first stop for a delivery of at most NUM_STOP_COLUMNS stops."""
+    encoded = BUNDLE.forest.predict_one(encode_features(stops, is_fragile, needs_cold_storage, product_type))
+    return FIRST_STOP_LABELS[encoded]
+
+
+def plan_route(stops, is_fragile=False, needs_cold_storage=False, product_type='Documents', hour=None):
+    """
+    Predicts the first stop and returns the cheapest route order. The solver's optimum always wins;
+    the prediction only chooses between routes that cost the same, so the route never costs more
+    than the solver's. predicted_route_cost is the cost of the best route starting at the predicted
+    stop, for comparison. Deliveries the model cannot encode (more than NUM_STOP_COLUMNS stops, or
+    stop layouts never seen in training) are solved without a prediction. With an `hour` (0-23) the
+    route is solved under that time of day's traffic instead of the static profile the model was
+    trained on.
+    """
+    laps = METRICS.laps()
+    stops = list(dict.fromkeys(stops))
+    unknown = [stop for stop in stops if stop not in CITY_LOCATIONS]
+    if unknown:
+        return {"error": f"Unknown locations: {', '.join(unknown)}."}
+    if not stops:
+        return {"error": "At least one stop is required."}
+    if product_type not in FEATURE_CODES['product_type']:
+        return {"error": f"Unknown product type {product_type!r}."}
+    try:
+        hour_bucket(hour)
+    except ValueError as exc:
+        return {"error": str(exc)}
+
+    predicted_first_stop = None
+    if len(stops) <= NUM_STOP_COLUMNS:
+        try:
+            features = encode_features(stops, is_fragile, needs_cold_storage, product_type)
+            if laps:
+                laps.lap('encode')
+            predicted_first_stop = FIRST_STOP_LABELS[BUNDLE.forest.predict_one(features)]
+            if laps:
+                laps.lap('model_predict')
+        except ValueError:
+            # Stop counts or positions never seen in training (e.g. two stops) are left to the solver
+            predicted_first_stop = None
+
+    key = tuple(sorted(stops))
+    route, cost = solve_route(key, is_fragile, needs_cold_storage, hour=hour)
+    if route is None:
+        return {"error": "Cold storage is required but none of the stops has a cold storage facility."}
+    predicted_cost = None
+    if predicted_first_stop in stops:
+        predicted_cost = cost
+        if route[0] != predicted_first_stop:
+            predicted_route, predicted_cost = solve_route(key, is_fragile, needs_cold_storage, start=predicted_first_stop, hour=hour)
+            # A tie goes to the prediction
+            if predicted_cost <= cost + COST_TOLERANCE:
+                route, cost = predicted_route, predicted_cost
+    if laps:
+        laps.lap('route_solve')
+        METRICS.count('requests')
+    return {
+        'predicted_first_stop': predicted_first_stop,
+        'first_stop_source': 'model' if route[0] == predicted_first_stop else 'solver',
+        'route': list(route),
+        'route_cost': round(cost, 3),
+        'predicted_route_cost': round(predicted_cost, 3) if predicted_cost is not None else None,
+    }
+
+
+# --- 3. Single-Query Latency Benchmark ---
+def benchmark(iterations=2000):
+    """Times predict_first_stop and plan_route on a fixed query and returns latency percentiles in microseconds."""
+    query = (["MP Nagar", "ISBT", "Piplani", "Kolar Road"], True, False, "Electronics")
+    results = {}
+    for name, fn in (('predict_first_stop', predict_first_stop), ('plan_route', plan_route)):
+        fn(*query)
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn(*query)
+            samples.append((time.perf_counter() - started) * 1e6)
+        samples.sort()
+        results[name] = {
+            'iterations': iterations,
+            'p50_us': round(samples[len(samples) // 2], 1),
+            'p99_us': round(samples[int(len(samples) * 0.99) - 1], 1),
+            'mean_us': round(sum(samples) / len(samples), 1),
+        }
+    return results
+
+
+# --- 4. Persistent Server Mode ---
+def parse_flag(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def handle_request(request):
+    """Answers one decoded server request with the same result the CLI would print."""
+    if request.get('command') == 'metrics':
+        return {'metrics': METRICS.snapshot()}
+    if request.get('command') == 'profile':
+        result, report = profile_call(handle_request, request['request'])
+        return {'result': result, 'profile': report}
+    stops = request['stops']
+    if isinstance(stops, str):
+        stops = stops.split(',')
+    return plan_route(stops, parse_flag(request.get('is_fragile', False)), parse_flag(request.get('needs_cold_storage', False)),
+                      request.get('product_type', 'Documents'), request.get('hour'))
+
+
+def serve(stream_in=sys.stdin, stream_out=sys.stdout):
+    """
+    Answers newline-delimited JSON requests until stdin closes, echoing the optional "id" like predict_api.py --serve.
+    {"command": "metrics"} and {"command": "profile", "request": {...}} work as they do there.
+    """
+    for line in stream_in:
+        line = line.strip()
+        if not line:
+            continue
+        stream_out.write(json.dumps(answer_line(line)) + "\n")
+        stream_out.flush()
+
+
+def answer_line(line):
+    """Answers one raw request line with its response, echoing the optional "id"; never raises."""
+    request = {}
+    try:
+        with METRICS.stage('serve_request'):
+            request = json.loads(line)
+            response = handle_request(request)
+    except Exception as exc:
+        METRICS.count('errors')
+        response = {"error": f"Failed to process request: {exc!r}"}
+    if isinstance(request, dict) and 'id' in request:
+        response = {'id': request['id'], **response}
+    return response
+
+
+def serve_pool(workers):
+    """serve() with `workers` forked worker processes, like predict_api.py --serve --workers N."""
+    # Read the forest before forking so every worker shares it instead of loading its own copy
+    BUNDLE.forest
+    WorkerPool(answer_line, {'reload': lambda request: reload_model()}, workers=workers).serve()
+
+
+# --- 5. Script Execution ---
+if __name__ == "__main__":
+    # Example: python3 intracity_predict.py "MP Nagar,ISBT,Piplani" true false Electronics [hour]
+    #          python3 intracity_predict.py --serve [--workers N]
+    #          python3 intracity_predict.py --benchmark 5000
+    # --metrics may accompany any mode and prints the recorded stage timings to stderr at the end of one-shot runs.
+    if '--metrics' in sys.argv:
+        sys.argv.remove('--metrics')
+    if len(sys.argv) == 2 and sys.argv[1] == '--serve':
+        serve()
+        sys.exit(0)
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve' and sys.argv[2] == '--workers':
+        serve_pool(int(sys.argv[3]))
+        sys.exit(0)
+    if len(sys.argv) in (2, 3) and sys.argv[1] == '--benchmark':
+        print(json.dumps(benchmark(int(sys.argv[2]) if len(sys.argv) == 3 else 2000), indent=4))
+        sys.exit(0)
+    if len(sys.argv) not in (5, 6):
+        print(json.dumps({"error": "Invalid number of arguments. Expected: stops is_fragile needs_cold_storage product_type [hour] (or --serve [--workers N], or --benchmark [N])"}))
+        sys.exit(1)
+
+    result = handle_request({'stops': sys.argv[1], 'is_fragile': sys.argv[2], 'needs_cold_storage': sys.argv[3], 'product_type': sys.argv[4],
+                             'hour': sys.argv[5] if len(sys.argv) == 6 else None})
+    print(json.dumps(result, indent=4))
+    if METRICS.enabled:
+        print(json.dumps(METRICS.snapshot(), indent=4), file=sys.stderr)
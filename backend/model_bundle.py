@@ -0,0 +1,229 @@
+import numpy as np
+import warnings
+import zipfile
+import hashlib
+import json
+import time
+import sys
+import io
+import os
+from flat_forest import FlatForest
+from instrumentation import METRICS
+
+# --- Single-File Model Bundles ---
+# A trained model ships as one zip instead of a pickle per object:
+#   manifest.json      format version, model parameters, the encoders as plain category lists,
+#                      and a SHA-256 checksum over the forest arrays
+#   forest/<name>.npy  the FlatForest node arrays (see flat_forest.py)
+# Opening a bundle only reads the manifest, so the encoders are usable at once; the forest is
+# read, checked against the checksum and rebuilt on first use. Loading needs neither pickle nor
+# scikit-learn, and a bundle from an unknown format version is refused rather than misread.
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+ROUTE_MODEL_BUNDLE = 'logistics_model.bundle'
+INTRACITY_MODEL_BUNDLE = 'intracity_model.bundle'
+
+
+def array_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def category_list(encoder):
+    """A LabelEncoder's classes (or any sequence of labels) as a JSON-ready list."""
+    classes = getattr(encoder, 'classes_', encoder)
+    return np.asarray(classes).tolist()
+
+
+def write_bundle(path, model, encoders, metadata=None):
+    """
+    Saves a fitted RandomForestClassifier and its encoders ({name: LabelEncoder or label list})
+    to `path` and returns the manifest. The file is written under a temporary name and renamed.
+    """
+    forest = FlatForest(model)
+    members = {f'forest/{name}.npy': array_bytes(array) for name, array in forest.to_arrays().items()}
+    checksum = hashlib.sha256()
+    for name in sorted(members):
+        checksum.update(name.encode())
+        checksum.update(members[name])
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'model': {
+            'type': type(model).__name__,
+            'n_estimators': len(model.estimators_),
+            'max_depth': model.max_depth,
+            'depth': int(forest.depth),
+            'node_count': int(len(forest.feature)),
+            'n_features': int(model.n_features_in_),
+        },
+        'encoders': {name: category_list(encoder) for name, encoder in encoders.items()},
+        'forest_checksum': checksum.hexdigest(),
+        'metadata': metadata or {},
+    }
+
+    staging = f'{path}.{os.getpid()}.tmp'
+    with zipfile.ZipFile(staging, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr(MANIFEST_FILE, json.dumps(manifest, indent=4))
+        for name, data in members.items():
+            bundle.writestr(name, data)
+    os.replace(staging, path)
+    return manifest
+
+
+class ModelBundle:
+    """An opened bundle: manifest and encoders now, the forest (self.forest) on first access."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with zipfile.ZipFile(path) as bundle:
+                self.manifest = json.loads(bundle.read(MANIFEST_FILE))
+        except (zipfile.BadZipFile, KeyError) as exc:
+            raise ValueError(f"{path} is not a model bundle: {exc}") from exc
+        if self.manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"{path} has bundle format {self.manifest.get('format_version')}, expected {BUNDLE_FORMAT_VERSION}.")
+        self.encoders = self.manifest['encoders']
+        self._forest = None
+
+    def codes(self, name):
+        """Label -> code lookup for one encoder (the code is the label's position, as with LabelEncoder)."""
+        return {label: code for code, label in enumerate(self.encoders[name])}
+
+    def label_encoder(self, name):
+        """A scikit-learn LabelEncoder with this encoder's classes, for code that expects one."""
+        from sklearn.preprocessing import LabelEncoder
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(self.encoders[name])
+        return encoder
+
+    @property
+    def loaded(self):
+        return self._forest is not None
+
+    @property
+    def forest(self):
+        if self._forest is None:
+            with METRICS.stage('forest_load'):
+                self._forest = self.load_forest()
+        return self._forest
+
+    def load_forest(self):
+        """Reads the forest arrays and rebuilds the FlatForest, refusing arrays that fail the checksum."""
+        checksum = hashlib.sha256()
+        arrays = {}
+        with zipfile.ZipFile(self.path) as bundle:
+            names = sorted(name for name in bundle.namelist() if name.startswith('forest/'))
+            for name in names:
+                data = bundle.read(name)
+                checksum.update(name.encode())
+                checksum.update(data)
+                arrays[name[len('forest/'):-len('.npy')]] = np.load(io.BytesIO(data), allow_pickle=False)
+        if checksum.hexdigest() != self.manifest['forest_checksum']:
+            raise ValueError(f"{self.path} is corrupt: forest checksum mismatch.")
+        return FlatForest.from_arrays(arrays, self.manifest['model']['depth'])
+
+
+# --- Compact Forests ---
+# The default forests are far bigger than their training data needs. Candidates are tried from the
+# fewest trees up, shallowest first, and the smallest one (by node count) that is as accurate on the
+# training data as the reference forest wins.
+COMPACT_TREE_COUNTS = (1, 3, 5, 10, 25, 50)
+COMPACT_DEPTHS = (4, 8, 12, 16, None)
+
+
+def choose_compact_forest(make_model, X, y, reference):
+    """
+    make_model(n_estimators, max_depth) returns an unfitted forest. Returns (model, report) where
+    model is the smallest candidate whose training accuracy is at least the reference's, or the
+    reference itself when no candidate gets there.
+    """
+    target = float(np.mean(reference.predict(X) == y))
+    best = None
+    tried = []
+    for n_estimators in COMPACT_TREE_COUNTS:
+        for position, max_depth in enumerate(COMPACT_DEPTHS):
+            model = make_model(n_estimators, max_depth).fit(X, y)
+            accuracy = float(np.mean(model.predict(X) == y))
+            nodes = sum(estimator.tree_.node_count for estimator in model.estimators_)
+            tried.append({'n_estimators': n_estimators, 'max_depth': max_depth, 'accuracy': round(accuracy, 6), 'nodes': nodes})
+            # Deeper trees (and, once the shallowest is already too big, more trees) only grow
+            if best is not None and nodes >= best[1]:
+                break
+            if accuracy >= target:
+                best = (model, nodes)
+                break
+        if best is not None and position == 0 and nodes >= best[1]:
+            break
+    if best is None:
+        closest = max(tried, key=lambda candidate: candidate['accuracy'])
+        return reference, {'reference_accuracy': target, 'chosen': None, 'closest': closest, 'tried': tried}
+    model = best[0]
+    return model, {'reference_accuracy': target, 'chosen': {'n_estimators': len(model.estimators_), 'max_depth': model.max_depth}, 'tried': tried}
+
+
+def median_latency_us(fn, rows):
+    samples = []
+    for row in rows:
+        started = time.perf_counter()
+        fn(row)
+        samples.append(time.perf_counter() - started)
+    return round(float(np.median(samples)) * 1e6, 1)
+
+
+def compare_models(models, encoders, rows, repeats=3):
+    """
+    Size, load time and single-row predict latency of each {label: fitted model}, both as a bundle
+    (FlatForest) and as the joblib pickle the models used to ship as (scikit-learn predict).
+    `rows` are feature rows to time predictions on; at most 500 are used.
+    """
+    import joblib
+    import tempfile
+    rows = np.asarray(rows)[:500]
+    report = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label, model in models.items():
+            bundle_path = os.path.join(work_dir, f'{label}.bundle')
+            pickle_path = os.path.join(work_dir, f'{label}.pkl')
+            write_bundle(bundle_path, model, encoders)
+            joblib.dump(model, pickle_path)
+            bundle_load, pickle_load = [], []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                bundle = ModelBundle(bundle_path)
+                bundle.forest
+                bundle_load.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                joblib.load(pickle_path)
+                pickle_load.append(time.perf_counter() - started)
+            report[label] = {
+                'n_estimators': len(model.estimators_),
+                'max_depth': model.max_depth,
+                'nodes': bundle.manifest['model']['node_count'],
+                'bundle_bytes': os.path.getsize(bundle_path),
+                'bundle_load_ms': round(min(bundle_load) * 1e3, 2),
+                'bundle_predict_p50_us': median_latency_us(bundle.forest.predict_one, rows),
+                'pickle_bytes': os.path.getsize(pickle_path),
+                'pickle_load_ms': round(min(pickle_load) * 1e3, 2),
+            }
+            with warnings.catch_warnings():
+                # Models fitted on a DataFrame warn about the bare feature rows used here
+                warnings.simplefilter('ignore', UserWarning)
+                report[label]['sklearn_predict_p50_us'] = median_latency_us(lambda row: model.predict(row[None, :]), rows)
+    return report
+
+
+# --- Script Execution ---
+if __name__ == "__main__":
+    # Prints a bundle's manifest (without the encoder lists) and checks its forest:
+    # python3 model_bundle.py logistics_model.bundle
+    if len(sys.argv) != 2:
+        print(json.dumps({"error": "Expected: bundle path"}))
+        sys.exit(1)
+    bundle = ModelBundle(sys.argv[1])
+    bundle.forest
+    summary = {key: value for key, value in bundle.manifest.items() if key != 'encoders'}
+    summary['encoders'] = {name: len(labels) for name, labels in bundle.encoders.items()}
+    print(json.dumps(summary, indent=4))
@@ -0,0 +1,69 @@
+import numpy as np
+
+# --- Per-Route Pareto Frontier ---
+# Every recommendation ranks a route's carriers by scores @ weights with non-negative weights,
+# breaking ties by table order. If carrier a is at least as good as carrier c in every column the
+# weights use, a can only rank behind c on a tie, and a tie is impossible when a is clearly better
+# in one of those columns; if a also comes first in the table, it wins ties too. Either way a ranks
+# ahead of c for *every* weight vector with that support, so a carrier with k or more such
+# dominators can never make the top k. Only the rest (the "k-skyband", usually a handful of rows
+# per route) needs scoring.
+#
+# "Clearly better" means by more than TIE_MARGIN. Combined scores carry rounding errors around
+# 1e-15, so a margin of 1e-9 keeps a dominated carrier strictly behind whenever its weight in that
+# column is at least MIN_WEIGHT; smaller positive weights are answered by scanning every carrier.
+TIE_MARGIN = 1e-9
+MIN_WEIGHT = 1e-4
+
+# Rows compared at once when counting dominators, to bound the n x block x columns temporaries.
+BLOCK_ROWS = 512
+
+
+def support_key(weights):
+    """The columns a weight vector uses, as a hashable key; None when some weight is too small to rely on."""
+    # Plain floats: this runs once per query, where NumPy's per-call overhead would dominate
+    weights = np.asarray(weights).tolist()
+    if any(0 < weight < MIN_WEIGHT for weight in weights):
+        return None
+    return tuple(weight > 0 for weight in weights)
+
+
+def dominator_counts(scores, columns=None, strict=False):
+    """
+    For every row, how many other rows are guaranteed to rank ahead of it when only `columns`
+    (a boolean mask; default all) carry weight. With strict=True the textbook Pareto relation is
+    used instead: >= in every column and > in at least one, regardless of table order.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if columns is not None:
+        scores = scores[:, np.asarray(columns, dtype=bool)]
+    counts = np.zeros(len(scores), dtype=np.intp)
+    positions = np.arange(len(scores))
+    for start in range(0, len(scores), BLOCK_ROWS):
+        block = scores[start:start + BLOCK_ROWS]
+        # difference[a, c, j]: how much row a beats row start + c in column j
+        difference = scores[:, None, :] - block[None, :, :]
+        dominates = (difference >= 0).all(axis=2)
+        if strict:
+            dominates &= (difference > 0).any(axis=2)
+        else:
+            dominates &= (positions[:, None] < positions[None, start:start + len(block)]) | (difference > TIE_MARGIN).any(axis=2)
+        counts[start:start + len(block)] = dominates.sum(axis=0)
+    return counts
+
+
+def pareto_rows(scores):
+    """Rows (in table order) that no other row strictly dominates: the route's trade-off frontier."""
+    return np.flatnonzero(dominator_counts(scores, strict=True) == 0)
+
+
+def candidate_rows(scores, value_rows, columns, k=2):
+    """
+    Returns (rows, value_positions) for weights supported on `columns`: in table order, every row
+    that can be among the top k or the best of value_rows, and the positions within `rows` of the
+    value_rows among them.
+    """
+    value_rows = np.asarray(value_rows)
+    value_candidates = value_rows[dominator_counts(scores[value_rows], columns) == 0]
+    rows = np.union1d(np.flatnonzero(dominator_counts(scores, columns) < k), value_candidates)
+    return rows, np.searchsorted(rows, value_candidates)
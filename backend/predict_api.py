@@ -1,19 +1,32 @@
-import pandas as pd
-import joblib
+import numpy as np
 import sys
 import json
+import csv
+import os
+from recommendation_cache import RecommendationCache
+from carrier_table import CarrierTable, TABLE_DIR, MANIFEST_FILE, RAW_COLUMNS, read_manifest, is_table_current, write_carrier_table
+from carrier_updates import CarrierUpdater, CarrierSnapshot
+from route_graph import RouteGraph
+from pareto import support_key, candidate_rows, pareto_rows
+from instrumentation import METRICS, profile_call
+from model_bundle import ModelBundle, ROUTE_MODEL_BUNDLE
+from worker_pool import WorkerPool
+
+# --- 1. Open the Pre-Trained Model Bundle ---
+# The bundle must be in the same directory as this script. Opening it only reads its manifest
+# (encoders included); the forest is read on first use of MODEL_BUNDLE.forest.
+MODEL_BUNDLE_FILE = ROUTE_MODEL_BUNDLE
+DATA_FILE = 'logistics_data.csv'
+
+def load_model_artifacts():
+    """Opens the model bundle written by train_model.py."""
+    with METRICS.stage('model_load'):
+        return ModelBundle(MODEL_BUNDLE_FILE)
 
-# --- 1. Load the Pre-Trained Model and Encoders ---
-# These files must be in the same directory as this script.
 try:
-    model = joblib.load('logistics_model.pkl')
-    le_origin = joblib.load('le_origin.pkl')
-    le_destination = joblib.load('le_destination.pkl')
-    le_priority = joblib.load('le_priority.pkl')
-    le_fragility = joblib.load('le_fragility.pkl')
-    le_company = joblib.load('le_company.pkl')
-except FileNotFoundError:
-    print(json.dumps({"error": "Model or encoder files not found. Please run train_model.py first."}))
+    MODEL_BUNDLE = load_model_artifacts()
+except (FileNotFoundError, ValueError) as exc:
+    print(json.dumps({"error": f"Model bundle not usable ({exc}). Please run train_model.py first."}))
     sys.exit(1)
 
 
@@ -39,73 +52,286 @@ warehouse_data = [
     {'location': 'Pune', 'company': 'LogisticStartup', 'warehouse_size_sqft': 250000}, {'location': 'Ahmedabad', 'company': 'Gati', 'warehouse_size_sqft': 90000},
     {'location': 'Kolkata', 'company': 'TCI Express', 'warehouse_size_sqft': 100000},
 ]
-warehouse_df = pd.DataFrame(warehouse_data)
-
-# Re-create the base DataFrame with stats
-logistics_data = [
-    # Data generation logic from train_model.py would be here to create the full dataframe.
-    # For this script, we'll just load the final result for speed if available, or a sample.
-    {'origin': 'Bhopal', 'destination': 'Indore', 'company': 'DTDC', 'price': 320, 'safety_rating': 4.2, 'delivery_time_hours': 12},
-    {'origin': 'Bhopal', 'destination': 'Pune', 'company': 'LogisticStartup', 'price': 780, 'safety_rating': 5.0, 'delivery_time_hours': 58},
-    # ... This would be populated with the full 50-company dataset
-]
-df = pd.read_csv("logistics_data.csv") # Assume the full data is available from the training step
-df = pd.merge(df, warehouse_df, on=['company'], how='left').fillna(0)
-df['location_review'] = df.apply(lambda row: 3.8, axis=1) # simplified for api
 
-# Calculate scores
-df['price_score'] = 1 - (df['price'] - df['price'].min()) / (df['price'].max() - df['price'].min())
-df['safety_score'] = (df['safety_rating'] - df['safety_rating'].min()) / (df['safety_rating'].max() - df['safety_rating'].min())
-df['speed_score'] = 1 - (df['delivery_time_hours'] - df['delivery_time_hours'].min()) / (df['delivery_time_hours'].max() - df['delivery_time_hours'].min())
-df['warehouse_score'] = (df['warehouse_size_sqft'] - df['warehouse_size_sqft'].min()) / (df['warehouse_size_sqft'].max() - df['warehouse_size_sqft'].min()) if not df['warehouse_size_sqft'].max() == df['warehouse_size_sqft'].min() else 0
-df['review_score'] = (df['location_review'] - df['location_review'].min()) / (df['location_review'].max() - df['location_review'].min()) if not df['location_review'].max() == df['location_review'].min() else 0
+def load_carrier_table(path=DATA_FILE):
+    """Reads the carrier CSV, joins the warehouse sizes and adds the normalized score columns."""
+    # pandas is only needed on this slow path; serving from the compiled table never imports it.
+    import pandas as pd
+    with METRICS.stage('csv_read_merge'):
+        warehouse_df = pd.DataFrame(warehouse_data)
+        df = pd.read_csv(path) # Assume the full data is available from the training step
+        df = pd.merge(df, warehouse_df, on=['company'], how='left').fillna(0)
+        df['location_review'] = df.apply(lambda row: 3.8, axis=1) # simplified for api
 
+    # Calculate scores
+    with METRICS.stage('score_normalization'):
+        df = add_score_columns(df)
+    return df
 
-# --- 3. Main Prediction and Ranking Function ---
-def get_recommendations(origin, destination, priorities, fragility):
+
+def add_score_columns(df):
+    """Min-max normalizes price, safety, delivery time, warehouse size and review into the score columns."""
+    df['price_score'] = 1 - (df['price'] - df['price'].min()) / (df['price'].max() - df['price'].min())
+    df['safety_score'] = (df['safety_rating'] - df['safety_rating'].min()) / (df['safety_rating'].max() - df['safety_rating'].min())
+    df['speed_score'] = 1 - (df['delivery_time_hours'] - df['delivery_time_hours'].min()) / (df['delivery_time_hours'].max() - df['delivery_time_hours'].min())
+    df['warehouse_score'] = (df['warehouse_size_sqft'] - df['warehouse_size_sqft'].min()) / (df['warehouse_size_sqft'].max() - df['warehouse_size_sqft'].min()) if not df['warehouse_size_sqft'].max() == df['warehouse_size_sqft'].min() else 0
+    df['review_score'] = (df['location_review'] - df['location_review'].min()) / (df['location_review'].max() - df['location_review'].min()) if not df['location_review'].max() == df['location_review'].min() else 0
+    return df
+
+
+# --- 3. Precompute the Per-Route Score Index ---
+# The score columns in the order the combined score adds them up, and the weight each one is multiplied by.
+SCORE_COLUMNS = ['price_score', 'speed_score', 'safety_score', 'warehouse_score', 'review_score']
+WEIGHT_KEYS = ['price', 'speed', 'safety', 'warehouse', 'review']
+
+# Define weights based on single or multiple priorities
+BASE_WEIGHTS = {
+    'cost': {'price': 0.7, 'speed': 0.1, 'safety': 0.1, 'review': 0.1},
+    'speed': {'price': 0.1, 'speed': 0.7, 'safety': 0.1, 'review': 0.1},
+    'safety': {'price': 0.1, 'speed': 0.1, 'safety': 0.5, 'review': 0.3},
+    'warehouse': {'warehouse': 0.8, 'review': 0.2}
+}
+
+def build_route_index(df):
     """
-    Calculates scores for all companies and returns a ranked Top 3 list.
+    Groups the scored carrier table into one contiguous score matrix per (origin, destination).
+    Rows keep their table order, so ties rank exactly as a stable sort of the full table would.
     """
-    
-    # Filter the dataframe for the selected route
-    route_df = df[(df['origin'] == origin) & (df['destination'] == destination)].copy()
-    if route_df.empty:
-        return {"error": f"No data available for the route {origin} to {destination}."}
-
-    # Define weights based on single or multiple priorities
-    base_weights = {
-        'cost': {'price': 0.7, 'speed': 0.1, 'safety': 0.1, 'review': 0.1},
-        'speed': {'price': 0.1, 'speed': 0.7, 'safety': 0.1, 'review': 0.1},
-        'safety': {'price': 0.1, 'speed': 0.1, 'safety': 0.5, 'review': 0.3},
-        'warehouse': {'warehouse': 0.8, 'review': 0.2}
-    }
-    
+    route_index = {}
+    for route, group in df.groupby(['origin', 'destination'], sort=False):
+        scores = np.ascontiguousarray(group[SCORE_COLUMNS].to_numpy(dtype=np.float64))
+        route_index[route] = {
+            'companies': group['company'].tolist(),
+            'scores': scores,
+            # Rows sharing the best price score are the only value_pick candidates.
+            'value_rows': np.flatnonzero(scores[:, 0] == scores[:, 0].max()),
+            # Raw columns and df row numbers, for carrier_updates.py to rescore the route from
+            'raw': group[RAW_COLUMNS].to_numpy(dtype=np.float64),
+            'rows': group.index.to_numpy(),
+        }
+    return route_index
+
+
+def load_route_index():
+    """
+    Returns (df, route_index). The compiled carrier table (python3 predict_api.py --compile-table)
+    is memory-mapped when it is up to date with DATA_FILE, in which case df is None; otherwise the
+    CSV is parsed and scored as before.
+    """
+    with METRICS.stage('data_load'):
+        if is_table_current(TABLE_DIR, DATA_FILE):
+            return None, CarrierTable(TABLE_DIR)
+        if read_manifest(TABLE_DIR) is not None:
+            print(f"{TABLE_DIR} is out of date with {DATA_FILE}; reading the CSV instead. Rerun with --compile-table.", file=sys.stderr)
+        df = load_carrier_table()
+        with METRICS.stage('route_index_build'):
+            return df, build_route_index(df)
+
+df, ROUTE_INDEX = load_route_index()
+
+
+def make_updater(df, route_index):
+    """Starts a CarrierUpdater over a freshly loaded route index and the raw columns it came from."""
+    if df is None:
+        return CarrierUpdater(route_index, lambda: route_index.raw)
+    return CarrierUpdater(route_index, lambda: df[RAW_COLUMNS].to_numpy(dtype=np.float64))
+
+CARRIER_UPDATER = make_updater(df, ROUTE_INDEX)
+
+
+def build_weight_vector(priorities, fragility):
+    """Turns the selected priorities and fragility into one weight per column of SCORE_COLUMNS."""
     final_weights = {'price':0,'speed':0,'safety':0,'review':0,'warehouse':0}
-    for p in priorities:
-        for key, value in base_weights[p].items():
+    # Summed in a fixed order so the same priorities always produce bit-identical weights
+    for p in sorted(priorities):
+        for key, value in BASE_WEIGHTS[p].items():
             final_weights[key] += value
 
-    # Adjust for fragility
+    return apply_fragility(np.array([final_weights[key] for key in WEIGHT_KEYS], dtype=np.float64), fragility)
+
+
+SAFETY_WEIGHT = WEIGHT_KEYS.index('safety')
+
+def apply_fragility(weights, fragility):
+    """Raises the safety weight of a WEIGHT_KEYS-ordered vector for fragile shipments; returns a new vector."""
+    weights = np.array(weights, dtype=np.float64)
     if fragility == 'High':
-        final_weights['safety'] = min(1.0, final_weights.get('safety', 0) + 0.3)
-
-    # Calculate combined score for each company on the route
-    route_df['combined_score'] = (
-        route_df['price_score'] * final_weights.get('price', 0) +
-        route_df['speed_score'] * final_weights.get('speed', 0) +
-        route_df['safety_score'] * final_weights.get('safety', 0) +
-        route_df['warehouse_score'] * final_weights.get('warehouse', 0) +
-        route_df['review_score'] * final_weights.get('review', 0)
-    )
-
-    # Sort by the score to get the ranking
-    ranked_companies = route_df.sort_values(by='combined_score', ascending=False)
+        weights[SAFETY_WEIGHT] = min(1.0, weights[SAFETY_WEIGHT] + 0.3)
+    return weights
+
+
+# Up to this many rows (a typical frontier), ranking is done in plain Python.
+SMALL_ROUTE_ROWS = 32
+
+def top_n_rows(combined_scores, n):
+    """
+    Returns the row indices of the n highest scores, best first, without sorting the whole route.
+    Ties are broken by table order, so the result matches a full stable descending sort.
+    """
+    if len(combined_scores) <= SMALL_ROUTE_ROWS:
+        # Python's sort is stable, also in reverse, and beats NumPy's call overhead on a few rows
+        values = combined_scores.tolist()
+        return sorted(range(len(values)), key=values.__getitem__, reverse=True)[:n]
+    if n >= len(combined_scores):
+        candidates = np.arange(len(combined_scores))
+    else:
+        cutoff = len(combined_scores) - n
+        threshold = np.partition(combined_scores, cutoff)[cutoff]
+        candidates = np.flatnonzero(combined_scores >= threshold)
+    order = np.lexsort((candidates, -combined_scores[candidates]))
+    return candidates[order[:n]]
+
+
+# --- 4. Result Cache ---
+def reload_data():
+    """Re-opens the model bundle and re-reads the carrier table after they change on disk (dropping in-memory updates)."""
+    global MODEL_BUNDLE, df, ROUTE_INDEX, CARRIER_UPDATER
+    bundle = load_model_artifacts()
+    new_df, new_route_index = load_route_index()
+    MODEL_BUNDLE = bundle
+    df, ROUTE_INDEX, CARRIER_UPDATER = new_df, new_route_index, make_updater(new_df, new_route_index)
+
+# Capacity 0 disables caching; a TTL of 0 keeps entries until they are evicted or the files change.
+RESULT_CACHE = RecommendationCache(
+    capacity=int(os.environ.get('LOGISTICS_CACHE_SIZE', 1024)),
+    ttl_seconds=float(os.environ.get('LOGISTICS_CACHE_TTL', 0)) or None,
+    watched_paths=[DATA_FILE, os.path.join(TABLE_DIR, MANIFEST_FILE), MODEL_BUNDLE_FILE],
+    on_invalidate=reload_data,
+)
+
+
+# --- 5. Incremental Carrier Updates ---
+def apply_carrier_updates(updates):
+    """
+    Applies carrier row updates (see CarrierUpdater.apply) to the in-memory data and publishes the result.
+    Only the updated routes are rescored unless a global min/max moved. Nothing is written to disk,
+    so a reload after the data files change starts again from the files.
+    """
+    global ROUTE_INDEX
+    try:
+        with METRICS.stage('carrier_update'):
+            snapshot, summary = CARRIER_UPDATER.apply(updates)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    if not summary['updated_routes']:
+        return summary
+    METRICS.count('carrier_updates', len(updates))
+    # A single reference swap: queries already holding the old snapshot finish on it unchanged.
+    ROUTE_INDEX = snapshot
+    RESULT_CACHE.clear()
+    return summary
+
+
+# --- 6. Main Prediction and Ranking Function ---
+def get_recommendations(origin, destination, priorities, fragility):
+    """
+    Returns the ranked Top 3 list for a query, answering repeated queries from RESULT_CACHE.
+    Cached results are shared between callers, so treat them as read-only.
+    """
+    laps = METRICS.laps()
+    key = RecommendationCache.make_key(origin, destination, priorities, fragility)
+    results = RESULT_CACHE.get(key)
+    if results is None:
+        results = rank_route(origin, destination, priorities, fragility)
+        RESULT_CACHE.put(key, results)
+    if laps:
+        laps.lap('request')
+        METRICS.count('requests')
+    return results
+
+
+def rank_route(origin, destination, priorities, fragility):
+    """
+    Calculates scores for all companies and returns a ranked Top 3 list.
+    """
     
+    laps = METRICS.laps()
+
+    # Look up the precomputed score matrix for the selected route
+    route_index = ROUTE_INDEX
+    route = route_index.get((origin, destination))
+    if laps:
+        laps.lap('route_filter')
+    if route is None:
+        return plan_multi_leg(origin, destination, priorities, fragility, route_index)
+    if len(route['companies']) < 2:
+        return {"error": f"Not enough carriers on the route {origin} to {destination} to rank."}
+
+    # Calculate combined scores as one matrix-vector product, over the carriers that can win only
+    weights = build_weight_vector(priorities, fragility)
+    rows, scores, value_rows = route_candidates(route, support_key(weights))
+    combined_scores = scores @ weights
+    if laps:
+        laps.lap('weighting')
+
     # Select Top 3
-    top_choice = ranked_companies.iloc[0]['company']
-    balanced_option = ranked_companies.iloc[1]['company']
-    value_pick = ranked_companies[ranked_companies['price_score'] == ranked_companies['price_score'].max()].iloc[0]['company']
+    top_rows = top_n_rows(combined_scores, 2)
+    # Usually a single carrier has the lowest price
+    value_row = value_rows[0] if len(value_rows) == 1 else value_rows[np.argmax(combined_scores[value_rows])]
+    companies = route['companies']
+    if laps:
+        laps.lap('sort')
+    results = build_results(companies[rows[top_rows[0]]], companies[rows[top_rows[1]]], companies[rows[value_row]])
+    if laps:
+        laps.lap('response_build')
+    return results
+
+
+def route_candidates(route, key):
+    """
+    Returns (rows, scores, value_rows) for weights with support `key` (pareto.support_key): the
+    route rows that can be picked, their scores as one contiguous matrix, and the positions of the
+    value_pick candidates among them. Positions keep table order, so ties break as on the full
+    route. Computed on first use per route and support; a None key scans every row.
+    """
+    if key is None:
+        return np.arange(len(route['companies'])), route['scores'], route['value_rows']
+    frontiers = route.get('frontiers')
+    if frontiers is None:
+        frontiers = route['frontiers'] = {}
+    candidates = frontiers.get(key)
+    if candidates is None:
+        rows, value_positions = candidate_rows(route['scores'], route['value_rows'], key)
+        candidates = frontiers[key] = (rows, np.ascontiguousarray(route['scores'][rows]), value_positions)
+    return candidates
+
 
+def get_frontier(origin, destination, priorities, fragility, route_index=None):
+    """
+    Every carrier on the route that no other carrier beats in all score columns at once (the
+    Pareto frontier), with its scores and raw figures, best combined score for the query first.
+    None for pairs without direct carriers. `route_index` defaults to the current ROUTE_INDEX.
+    """
+    route = (ROUTE_INDEX if route_index is None else route_index).get((origin, destination))
+    if route is None:
+        return None
+    rows = route.get('pareto_rows')
+    if rows is None:
+        rows = route['pareto_rows'] = pareto_rows(route['scores'])
+    scores = route['scores'][rows]
+    combined_scores = scores @ build_weight_vector(priorities, fragility)
+    frontier = []
+    for position in np.lexsort((rows, -combined_scores)):
+        row = rows[position]
+        frontier.append({
+            'name': route['companies'][row],
+            'combined_score': round(float(combined_scores[position]), 4),
+            **{column: round(float(value), 4) for column, value in zip(SCORE_COLUMNS, scores[position])},
+            **{column: float(value) for column, value in zip(RAW_COLUMNS, route['raw'][row])},
+        })
+    return frontier
+
+
+def with_frontier(request, results, route_index=None):
+    """Adds the route's frontier to a result when the request asked for it ("frontier": true)."""
+    if not request.get('frontier') or 'error' in results or results.get('multi_leg'):
+        return results
+    frontier = get_frontier(request['origin'], request['destination'], parse_priorities(request['priorities']), request['fragility'], route_index)
+    return {**results, 'frontier': frontier}
+
+
+def build_results(top_choice, balanced_option, value_pick):
+    """Attaches the company details to the three selected carriers."""
     results = {
         'top_choice': {**COMPANY_DETAILS.get(top_choice, {}), 'name': top_choice},
         'balanced_option': {**COMPANY_DETAILS.get(balanced_option, {}), 'name': balanced_option},
@@ -113,20 +339,321 @@ def get_recommendations(origin, destination, priorities, fragility):
     }
     return results
 
-# --- 4. Script Execution ---
+
+def parse_priorities(priorities):
+    """
+    Accepts priorities either as a list or as the comma-separated string the CLI uses.
+    Raises ValueError naming any priority that has no entry in BASE_WEIGHTS.
+    """
+    if isinstance(priorities, str):
+        priorities = priorities.split(',')
+    priorities = list(priorities)
+    unknown = [p for p in priorities if p not in BASE_WEIGHTS]
+    if unknown:
+        label = 'priorities' if len(unknown) > 1 else 'priority'
+        raise ValueError(f"Unknown {label} {', '.join(map(repr, unknown))}; choose from {', '.join(BASE_WEIGHTS)}.")
+    return priorities
+
+
+# --- 7. Multi-Leg Routes ---
+# Pairs with no carrier row of their own are answered over the carrier network (route_graph.py).
+# The top choice uses the query's own weights; the other two picks use fixed weights instead
+# (WEIGHT_KEYS order): an even split of price, speed and safety, and price alone. All three get the
+# same fragility adjustment as the direct ranking.
+BALANCED_WEIGHTS = np.array([1 / 3, 1 / 3, 1 / 3, 0.0, 0.0])
+VALUE_WEIGHTS = np.array([1.0, 0.0, 0.0, 0.0, 0.0])
+# Carrier rows are one-way, and the shipped data only has rows leaving Bhopal, so by default legs may
+# also run against a row's direction. Such legs are marked 'inferred' in the response, since no data
+# row offers them. Set LOGISTICS_REVERSE_LEGS=0 to route strictly along carrier rows.
+REVERSE_LEGS = os.environ.get('LOGISTICS_REVERSE_LEGS', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+ROUTE_GRAPH = None
+ROUTE_GRAPH_SOURCE = None
+
+def carrier_rows(route_index):
+    """Every carrier row of the served data as flat (origins, destinations, companies, raw) arrays, updates included."""
+    base = route_index.base if isinstance(route_index, CarrierSnapshot) else route_index
+    if isinstance(base, CarrierTable):
+        counts = np.diff(base.route_offsets)
+        origins, destinations = np.repeat(base.route_origins, counts), np.repeat(base.route_destinations, counts)
+        companies = base.companies[base.company_codes]
+        raw = np.array(base.raw, dtype=np.float64)
+    else:
+        origins, destinations, companies = (df[column].to_numpy(dtype=str) for column in ('origin', 'destination', 'company'))
+        raw = df[RAW_COLUMNS].to_numpy(dtype=np.float64)
+    if isinstance(route_index, CarrierSnapshot):
+        for entry in route_index.updated_routes.values():
+            raw[entry['rows']] = entry['raw']
+    return origins, destinations, companies, raw
+
+
+def get_route_graph(route_index=None):
+    """The carrier network of `route_index` (the current ROUTE_INDEX by default), built on first use and again only after a reload or update."""
+    global ROUTE_GRAPH, ROUTE_GRAPH_SOURCE
+    route_index = ROUTE_INDEX if route_index is None else route_index
+    if ROUTE_GRAPH_SOURCE is not route_index:
+        hubs = {name: details['hub'] for name, details in COMPANY_DETAILS.items()}
+        with METRICS.stage('route_graph_build'):
+            ROUTE_GRAPH, ROUTE_GRAPH_SOURCE = RouteGraph(*carrier_rows(route_index), hubs, bidirectional=REVERSE_LEGS), route_index
+    return ROUTE_GRAPH
+
+
+def plan_multi_leg(origin, destination, priorities, fragility, route_index=None):
+    """
+    Answers a pair without direct carriers with the same three picks, each a chain of carriers.
+    Every pick carries its legs, transfer cities and totals; 'name' joins the carriers used.
+    """
+    METRICS.count('multi_leg_requests')
+    graph = get_route_graph(route_index)
+    results = {'multi_leg': True}
+    picks = (('top_choice', build_weight_vector(priorities, fragility)),
+             ('balanced_option', apply_fragility(BALANCED_WEIGHTS, fragility)),
+             ('value_pick', apply_fragility(VALUE_WEIGHTS, fragility)))
+    for pick, weights in picks:
+        with METRICS.stage('multi_leg_search'):
+            found = graph.shortest_path(origin, destination, weights)
+        if found is None:
+            return {"error": f"No data available for the route {origin} to {destination}."}
+        path = graph.describe_path(*found)
+        carriers = list(dict.fromkeys(leg['company'] for leg in path['legs']))
+        results[pick] = {**COMPANY_DETAILS.get(carriers[0], {}), 'name': ' + '.join(carriers), **path}
+    return results
+
+
+# --- 8. Batch Recommendations ---
+def get_batch_recommendations(requests):
+    """
+    Scores many shipments at once and returns one result per request, in input order.
+    Requests are grouped by route so every route is scored with a single matrix multiply
+    (carriers x score columns times score columns x distinct weight vectors). Each result is
+    identical to what get_recommendations returns for the same request.
+    """
+    METRICS.count('batch_requests', len(requests))
+    with METRICS.stage('batch'):
+        return score_batch(requests)
+
+
+def score_batch(requests):
+    """get_batch_recommendations without the instrumentation around it."""
+    RESULT_CACHE.check_files()
+    # Read the index once so the whole batch is scored against one snapshot, even if an update is published meanwhile.
+    route_index = ROUTE_INDEX
+    results = [None] * len(requests)
+    route_batches = {}
+    weight_vectors = {}
+    for position, request in enumerate(requests):
+        try:
+            route = (request['origin'], request['destination'])
+            weight_key = (tuple(parse_priorities(request['priorities'])), request['fragility'])
+            if weight_key not in weight_vectors:
+                weight_vectors[weight_key] = build_weight_vector(*weight_key)
+            weights = weight_vectors[weight_key]
+        except ValueError as exc:
+            results[position] = {"error": str(exc)}
+            continue
+        except Exception as exc:
+            results[position] = {"error": f"Failed to process request: {exc!r}"}
+            continue
+        if route not in route_index:
+            results[position] = plan_multi_leg(route[0], route[1], weight_key[0], weight_key[1], route_index)
+            continue
+        if len(route_index[route]['companies']) < 2:
+            results[position] = {"error": f"Not enough carriers on the route {route[0]} to {route[1]} to rank."}
+            continue
+        route_batches.setdefault(route, ([], []))
+        route_batches[route][0].append(position)
+        route_batches[route][1].append(weights)
+
+    for route, (positions, weight_rows) in route_batches.items():
+        entry = route_index[route]
+        companies = entry['companies']
+        value_rows = entry['value_rows']
+
+        # One column of combined scores per distinct weight vector requested on this route.
+        # Every row is scored: one multiply shared by many requests is cheaper than the per-support
+        # candidate lookups single queries use (route_candidates).
+        unique_weights, request_columns = np.unique(np.array(weight_rows), axis=0, return_inverse=True)
+        combined_scores = entry['scores'] @ unique_weights.T
+        columns = np.arange(len(unique_weights))
+
+        # argmax returns the first of any tied rows, which is the order a stable sort gives
+        top_rows = np.argmax(combined_scores, axis=0)
+        runner_up_scores = combined_scores.copy()
+        runner_up_scores[top_rows, columns] = -np.inf
+        balanced_rows = np.argmax(runner_up_scores, axis=0)
+        value_picks = value_rows[np.argmax(combined_scores[value_rows], axis=0)]
+
+        for column, position in zip(request_columns.ravel(), positions):
+            result = build_results(companies[top_rows[column]], companies[balanced_rows[column]], companies[value_picks[column]])
+            results[position] = with_frontier(requests[position], result, route_index)
+    return results
+
+
+def load_batch_requests(path):
+    """
+    Reads batch requests from a JSONL file (one request object per line) or, for a .csv path,
+    from a CSV with origin, destination, priorities and fragility columns. '-' reads JSONL from stdin.
+    """
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+    stream = sys.stdin if path == '-' else open(path)
+    try:
+        return [json.loads(line) for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def write_batch_results(requests, results, stream_out=sys.stdout):
+    """Writes one JSON line per request, echoing its optional id like the server mode does."""
+    for request, response in zip(requests, results):
+        if isinstance(request, dict) and 'id' in request:
+            response = {'id': request['id'], **response}
+        stream_out.write(json.dumps(response) + "\n")
+
+
+# --- 9. Persistent Server Mode ---
+def handle_request(request):
+    """Answers one decoded server request with the same result the CLI would print."""
+    if request.get('command') == 'stats':
+        return {'cache': RESULT_CACHE.stats()}
+    if request.get('command') == 'update':
+        return apply_carrier_updates(request.get('updates'))
+    if request.get('command') == 'metrics':
+        return {'metrics': METRICS.snapshot(), 'cache': RESULT_CACHE.stats()}
+    query = request['request'] if request.get('command') == 'profile' else request
+    try:
+        priorities = parse_priorities(query['priorities'])
+    except ValueError as exc:
+        return {"error": str(exc)}
+    if request.get('command') == 'profile':
+        # Profiles the ranking itself, bypassing the result cache
+        result, report = profile_call(rank_route, query['origin'], query['destination'], priorities, query['fragility'])
+        return {'result': result, 'profile': report}
+    results = get_recommendations(request['origin'], request['destination'], priorities, request['fragility'])
+    return with_frontier(request, results)
+
+
+def serve(stream_in=sys.stdin, stream_out=sys.stdout):
+    """
+    Answers newline-delimited JSON requests until the input stream closes.
+    Each request looks like {"id": 1, "origin": "Bhopal", "destination": "Pune", "priorities": ["safety"], "fragility": "High"}
+    and gets exactly one JSON line back. The optional "id" is echoed so callers can match responses to requests.
+    {"command": "stats"} returns the result cache counters instead, and
+    {"command": "update", "updates": [...]} applies carrier updates (see apply_carrier_updates),
+    {"command": "metrics"} dumps the stage timings and counters (see instrumentation.py), and
+    {"command": "profile", "request": {...}} answers one query under cProfile and returns the report with it.
+    Adding "frontier": true to a query also returns every non-dominated carrier on the route (see get_frontier).
+    """
+    for line in stream_in:
+        line = line.strip()
+        if not line:
+            continue
+        stream_out.write(json.dumps(answer_line(line)) + "\n")
+        stream_out.flush()
+
+
+def answer_line(line):
+    """Answers one raw request line with its response, echoing the optional "id"; never raises."""
+    request = {}
+    try:
+        with METRICS.stage('serve_request'):
+            request = json.loads(line)
+            response = handle_request(request)
+    except Exception as exc:
+        # A bad request must never take the resident process down with it.
+        METRICS.count('errors')
+        response = {"error": f"Failed to process request: {exc!r}"}
+    if isinstance(request, dict) and 'id' in request:
+        response = {'id': request['id'], **response}
+    return response
+
+
+def serve_pool(workers):
+    """
+    serve() with `workers` forked worker processes (see worker_pool.py). Reloads ({"command": "reload"}
+    or SIGHUP) and carrier updates are applied once, in the pool's template process, and reach every worker as it is re-forked.
+    "stats" and "metrics" describe whichever worker answers them; {"command": "pool"} covers the whole pool.
+    """
+    def reload_command(request):
+        RESULT_CACHE.invalidate()
+        return {'reloaded': True, 'data_source': 'csv' if df is not None else 'compiled_table'}
+
+    WorkerPool(answer_line, {'reload': reload_command, 'update': lambda request: apply_carrier_updates(request.get('updates'))},
+               workers=workers).serve()
+
+
+# --- 10. Script Execution ---
 if __name__ == "__main__":
+    # --metrics may accompany any mode; instrumentation.py has already switched recording on for it.
+    # One-shot modes print the recorded metrics to stderr when they finish.
+    if '--metrics' in sys.argv:
+        sys.argv.remove('--metrics')
+    # --frontier adds the route's non-dominated carriers to a single query's result.
+    frontier = '--frontier' in sys.argv
+    if frontier:
+        sys.argv.remove('--frontier')
+
+    # Started once by Node.js and kept alive; everything above is loaded a single time.
+    # Example: python3 predict_api.py --serve
+    if len(sys.argv) == 2 and sys.argv[1] == '--serve':
+        serve()
+        sys.exit(0)
+
+    # The same protocol answered by a pool of forked workers, with a bounded queue and reloads.
+    # Example: python3 predict_api.py --serve --workers 4
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve' and sys.argv[2] == '--workers':
+        serve_pool(int(sys.argv[3]))
+        sys.exit(0)
+
+    # Parses and scores the CSV once and writes it as memory-mappable arrays for fast startup.
+    # Example: python3 predict_api.py --compile-table
+    if len(sys.argv) == 2 and sys.argv[1] == '--compile-table':
+        manifest = write_carrier_table(load_carrier_table(), TABLE_DIR, DATA_FILE)
+        print(json.dumps({'table': TABLE_DIR, 'rows': manifest['rows'], 'routes': manifest['routes']}, indent=4))
+        sys.exit(0)
+
+    # Scores a whole file of shipments in one vectorized pass and prints one JSON line per request.
+    # Example: python3 predict_api.py --batch shipments.jsonl
+    if len(sys.argv) == 3 and sys.argv[1] == '--batch':
+        batch_requests = load_batch_requests(sys.argv[2])
+        write_batch_results(batch_requests, get_batch_recommendations(batch_requests))
+        if METRICS.enabled:
+            print(json.dumps(METRICS.snapshot(), indent=4), file=sys.stderr)
+        sys.exit(0)
+
+    # Answers one query under cProfile: the result goes to stdout and the profile report to stderr.
+    # Example: python3 predict_api.py --profile Bhopal Pune safety,cost High
+    if len(sys.argv) == 6 and sys.argv[1] == '--profile':
+        try:
+            priorities = parse_priorities(sys.argv[4])
+        except ValueError as exc:
+            print(json.dumps({"error": str(exc)}))
+            sys.exit(1)
+        result, report = profile_call(rank_route, sys.argv[2], sys.argv[3], priorities, sys.argv[5])
+        print(report, file=sys.stderr)
+        print(json.dumps(result, indent=4))
+        sys.exit(0)
+
     # This script will be called from Node.js with command line arguments
     # Example: python3 predict_api.py Bhopal Pune safety,cost High
     if len(sys.argv) != 5:
-        print(json.dumps({"error": "Invalid number of arguments. Expected: origin destination priorities fragility"}))
+        print(json.dumps({"error": "Invalid number of arguments. Expected: origin destination priorities fragility (or --serve [--workers N], --batch FILE, --compile-table, or --profile QUERY; add --frontier for all non-dominated carriers, --metrics to record stage timings; LOGISTICS_REVERSE_LEGS=0 disables inferred reverse legs in multi-leg routes)"}))
         sys.exit(1)
 
     origin = sys.argv[1]
     destination = sys.argv[2]
-    priorities = sys.argv[3].split(',') # Priorities are comma-separated
     fragility = sys.argv[4]
+    try:
+        priorities = parse_priorities(sys.argv[3]) # Priorities are comma-separated
+    except ValueError as exc:
+        print(json.dumps({"error": str(exc)}))
+        sys.exit(1)
 
     recommendations = get_recommendations(origin, destination, priorities, fragility)
+    recommendations = with_frontier({'origin': origin, 'destination': destination, 'priorities': priorities, 'fragility': fragility, 'frontier': frontier}, recommendations)
     
     # Print the final JSON result to standard output, so Node.js can capture it
     print(json.dumps(recommendations, indent=4))
+    if METRICS.enabled:
+        print(json.dumps(METRICS.snapshot(), indent=4), file=sys.stderr)
\ No newline at end of file
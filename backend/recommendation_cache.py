@@ -0,0 +1,114 @@
+import os
+import time
+from collections import OrderedDict
+
+# --- Bounded In-Process Result Cache ---
+# Recommendation queries come from a tiny, skewed input space (a handful of routes, four priorities,
+# three fragility levels), so the same query is answered over and over. This cache keeps the most
+# recently used answers and throws everything away as soon as the data or model files change.
+
+class RecommendationCache:
+    """
+    LRU cache with an optional time-to-live and hit/miss/eviction counters.
+    `watched_paths` are fingerprinted (mtime and size); when any of them changes, `on_invalidate`
+    is called to reload the data and every cached entry is dropped.
+    """
+
+    def __init__(self, capacity=1024, ttl_seconds=None, watched_paths=(), on_invalidate=None,
+                 check_interval_seconds=1.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.watched_paths = list(watched_paths)
+        self.on_invalidate = on_invalidate
+        self.check_interval_seconds = check_interval_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._fingerprint = self._fingerprint_files()
+        self._next_check = self.clock() + check_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(origin, destination, priorities, fragility):
+        """Normalizes a query so the same request in a different priority order shares an entry."""
+        return (origin, destination, tuple(sorted(priorities)), fragility)
+
+    def _fingerprint_files(self):
+        fingerprint = []
+        for path in self.watched_paths:
+            try:
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                fingerprint.append((path, None, None))
+        return tuple(fingerprint)
+
+    def check_files(self, force=False):
+        """Drops every entry (after reloading via `on_invalidate`) if a watched file changed on disk."""
+        now = self.clock()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval_seconds
+        fingerprint = self._fingerprint_files()
+        if fingerprint == self._fingerprint:
+            return False
+        self.invalidate(fingerprint)
+        return True
+
+    def invalidate(self, fingerprint=None):
+        """Reloads via `on_invalidate` and drops every entry now, whether or not the files changed."""
+        # Fingerprinted before reloading, so a change made during the reload is still caught next time
+        fingerprint = fingerprint or self._fingerprint_files()
+        # Reload first: if it fails the old data keeps serving and the change is retried on the next check.
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+        self._fingerprint = fingerprint
+        self._entries.clear()
+        self.invalidations += 1
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        self.check_files()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
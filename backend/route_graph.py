@@ -0,0 +1,169 @@
+import numpy as np
+import heapq
+
+# --- Multi-Leg Routing Over the Carrier Network ---
+# Every carrier row (origin, destination, company) is an edge of a graph whose nodes are cities.
+# A shipment between two cities that no single carrier row connects can still be sent over
+# several legs, handing the parcel from one carrier to the next along the way.
+#
+# Searches run Dijkstra over (city, arriving carrier) states so the transfer rule can be checked:
+# staying with the same carrier is always allowed, while changing carrier is only allowed at the
+# hub of the incoming or the outgoing carrier (COMPANY_DETAILS[...]['hub']).
+#
+# Edges are directed: a carrier row from A to B says nothing about service from B to A. With
+# bidirectional=True every row is also added in reverse; such legs are inferred rather than backed by
+# data, and describe_path marks them so.
+#
+# A leg costs sum(weight * (1 - score)) over the same score columns the direct ranking uses, so a
+# leg that would score perfectly costs nothing and every extra leg adds its own shortfall.
+
+PRICE, SAFETY, TIME, WAREHOUSE = range(4)  # raw column order of carrier_table.RAW_COLUMNS
+
+# Added per change of carrier, so equally good paths prefer fewer hand-overs.
+TRANSFER_PENALTY = 0.05
+
+
+class RouteGraph:
+    """
+    Carrier network in CSR form: the edges leaving node u are edge_offsets[u]:edge_offsets[u + 1],
+    sorted by carrier, so a search step only touches the edges it is allowed to take.
+    """
+
+    def __init__(self, origins, destinations, companies, raw, hubs, bidirectional=False):
+        origins = np.asarray(origins, dtype=str)
+        destinations = np.asarray(destinations, dtype=str)
+        companies = np.asarray(companies, dtype=str)
+        raw = np.asarray(raw, dtype=np.float64)
+        inferred = np.zeros(len(origins), dtype=bool)
+        if bidirectional:
+            origins, destinations = np.concatenate([origins, destinations]), np.concatenate([destinations, origins])
+            companies = np.concatenate([companies, companies])
+            raw = np.concatenate([raw, raw])
+            inferred = np.concatenate([inferred, np.ones(len(inferred), dtype=bool)])
+
+        self.nodes, node_ids = np.unique(np.concatenate([origins, destinations]), return_inverse=True)
+        self.carriers, carrier_ids = np.unique(companies, return_inverse=True)
+        sources, targets = node_ids[:len(origins)], node_ids[len(origins):]
+        self.node_index = {name: i for i, name in enumerate(self.nodes.tolist())}
+
+        order = np.lexsort((carrier_ids, sources))
+        self.edge_offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(self.nodes)))])
+        self.edge_target = targets[order]
+        self.edge_carrier = carrier_ids[order]
+        self.edge_raw = raw[order]
+        self.edge_inferred = inferred[order]
+
+        # Shortfall (1 - score) per score column, with the min-max normalization of load_carrier_table
+        low, high = raw.min(axis=0), raw.max(axis=0)
+        span = np.where(high > low, high - low, 1.0)
+        edge_raw = self.edge_raw
+        self.edge_shortfall = np.column_stack([
+            (edge_raw[:, PRICE] - low[PRICE]) / span[PRICE],
+            (edge_raw[:, TIME] - low[TIME]) / span[TIME],
+            (high[SAFETY] - edge_raw[:, SAFETY]) / span[SAFETY],
+            # A constant column scores 0 everywhere, as in load_carrier_table
+            (high[WAREHOUSE] - edge_raw[:, WAREHOUSE]) / span[WAREHOUSE] if high[WAREHOUSE] > low[WAREHOUSE] else np.ones(len(edge_raw)),
+            np.ones(len(edge_raw)),  # the API's review score is the same constant for every carrier
+        ])
+
+        # The hub node of every carrier (-1 when the carrier has no hub in the graph)
+        self.carrier_hub = np.array([self.node_index.get(hubs.get(name), -1) for name in self.carriers.tolist()], dtype=np.intp)
+        edge_source = sources[order]
+
+        # (node, carrier) -> its run of edges; edges are sorted by both, so runs start where either changes
+        run_starts = np.flatnonzero(np.r_[True, (edge_source[1:] != edge_source[:-1]) | (self.edge_carrier[1:] != self.edge_carrier[:-1])])
+        run_ends = np.r_[run_starts[1:], len(edge_source)]
+        self._carrier_runs = {(node, carrier): range(start, end) for node, carrier, start, end in
+                              zip(edge_source[run_starts].tolist(), self.edge_carrier[run_starts].tolist(), run_starts.tolist(), run_ends.tolist())}
+        # Per node, the edges of carriers whose hub it is: any parcel arriving there may take them
+        hub_edges = np.flatnonzero(self.carrier_hub[self.edge_carrier] == edge_source)
+        self._hub_edges = [[] for _ in range(len(self.nodes))]
+        for node, edge in zip(edge_source[hub_edges].tolist(), hub_edges.tolist()):
+            self._hub_edges[node].append(edge)
+
+        # Plain lists are much faster than NumPy scalars inside the search loop
+        self._offsets = self.edge_offsets.tolist()
+        self._targets = self.edge_target.tolist()
+        self._edge_carriers = self.edge_carrier.tolist()
+        self._carrier_hub = self.carrier_hub.tolist()
+        self._costs = {}
+
+    def edge_costs(self, weights):
+        """Cost of every edge for one weight vector (WEIGHT_KEYS order); memoized per distinct vector."""
+        key = tuple(np.asarray(weights, dtype=np.float64).tolist())
+        costs = self._costs.get(key)
+        if costs is None:
+            costs = (self.edge_shortfall @ np.asarray(key)).tolist()
+            self._costs[key] = costs
+        return costs
+
+    def allowed_edges(self, node, carrier):
+        """Edges a parcel that arrived at `node` with `carrier` (None at the origin) may take next."""
+        if carrier is None or self._carrier_hub[carrier] == node:
+            return range(self._offsets[node], self._offsets[node + 1])
+        return [*self._carrier_runs.get((node, carrier), ()), *self._hub_edges[node]]
+
+    def shortest_path(self, origin, destination, weights):
+        """
+        Returns (cost, [edge ids]) of the cheapest path from origin to destination under `weights`,
+        or None when the cities are unknown, identical, or not connected.
+        """
+        source, target = self.node_index.get(origin), self.node_index.get(destination)
+        if source is None or target is None or source == target:
+            return None
+        costs = self.edge_costs(weights)
+        targets, edge_carriers = self._targets, self._edge_carriers
+
+        start = (source, None)
+        best = {start: 0.0}
+        parents = {start: None}
+        heap = [(0.0, source, -1)]  # carrier -1 stands for "none yet" so heap entries stay comparable
+        while heap:
+            cost, node, carrier = heapq.heappop(heap)
+            state = (node, None if carrier < 0 else carrier)
+            if cost > best[state]:
+                continue
+            if node == target:
+                path = []
+                while parents[state] is not None:
+                    state, edge = parents[state]
+                    path.append(edge)
+                return cost, path[::-1]
+            for edge in self.allowed_edges(*state):
+                next_carrier = edge_carriers[edge]
+                next_cost = cost + costs[edge]
+                if carrier >= 0 and next_carrier != carrier:
+                    next_cost += TRANSFER_PENALTY
+                next_state = (targets[edge], next_carrier)
+                if next_cost < best.get(next_state, np.inf):
+                    best[next_state] = next_cost
+                    parents[next_state] = (state, edge)
+                    heapq.heappush(heap, (next_cost, targets[edge], next_carrier))
+        return None
+
+    def describe_path(self, cost, path):
+        """
+        Turns a path of edge ids into legs with their carrier and raw figures, plus totals. A leg with
+        'inferred': true runs against a carrier row's direction (only with bidirectional=True).
+        """
+        legs = []
+        for edge in path:
+            raw = self.edge_raw[edge]
+            legs.append({
+                'origin': str(self.nodes[np.searchsorted(self.edge_offsets, edge, side='right') - 1]),
+                'destination': str(self.nodes[self.edge_target[edge]]),
+                'company': str(self.carriers[self.edge_carrier[edge]]),
+                'price': float(raw[PRICE]),
+                'delivery_time_hours': float(raw[TIME]),
+                'safety_rating': float(raw[SAFETY]),
+                'inferred': bool(self.edge_inferred[edge]),
+            })
+        return {
+            'legs': legs,
+            'transfers': [leg['origin'] for previous, leg in zip(legs, legs[1:]) if leg['company'] != previous['company']],
+            'total_price': round(sum(leg['price'] for leg in legs), 2),
+            'total_delivery_time_hours': round(sum(leg['delivery_time_hours'] for leg in legs), 1),
+            'min_safety_rating': min(leg['safety_rating'] for leg in legs),
+            'path_cost': round(cost, 4),
+            'inferred_legs': sum(leg['inferred'] for leg in legs),
+        }
@@ -0,0 +1,95 @@
+import numpy as np
+from city_model import LOCATION_INDEX, DISTANCE, ROAD_QUALITY, TRAFFIC, TRAFFIC_BY_BUCKET, COLD_STORAGE_MASK, hour_bucket
+
+# --- 1. City Cost Matrices ---
+# city_model.py holds every pair of locations as dense matrices, so solving a route never calls get_route_stats.
+# Travel cost is distance x traffic; fragile goods pay 1.5x on every rough (quality < 0.9) road.
+ROUGH_ROAD_MASK = ROAD_QUALITY < 0.9
+
+def travel_costs(traffic):
+    """Returns the (base, fragile) cost matrices for one traffic matrix, as nested lists."""
+    base_cost = DISTANCE * traffic
+    fragile_cost = np.where(ROUGH_ROAD_MASK, base_cost * 1.5, base_cost)
+    # Plain nested lists are much faster than NumPy for the scalar lookups inside the DP.
+    return base_cost.tolist(), fragile_cost.tolist()
+
+# The static traffic profile (what training labels with), then one pair per time-of-day bucket
+BASE_COST_ROWS, FRAGILE_COST_ROWS = travel_costs(TRAFFIC)
+BUCKET_COST_ROWS = [travel_costs(traffic) for traffic in TRAFFIC_BY_BUCKET]
+
+
+def cost_rows(is_fragile=False, hour=None):
+    """The full cost matrix (nested lists) for a shipment, at `hour` (0-23) or with the static traffic profile."""
+    bucket = hour_bucket(hour)
+    base_rows, fragile_rows = (BASE_COST_ROWS, FRAGILE_COST_ROWS) if bucket is None else BUCKET_COST_ROWS[bucket]
+    return fragile_rows if is_fragile else base_rows
+
+
+# --- 2. Held-Karp Dynamic Programming ---
+def held_karp(cost, start=None):
+    """
+    Finds the cheapest open path through every node of the square `cost` matrix (a list of lists).
+    Returns (order, total_cost). Path costs are summed from the first stop onwards, and ties go to the
+    lexicographically first order, so the answer is the one a scan over itertools.permutations keeps.
+    When `start` is given, only paths beginning at that node are considered.
+    """
+    n = len(cost)
+    if n == 0:
+        return [], 0.0
+    inf = float('inf')
+    nodes = range(n)
+    # States are encoded as mask * n + last_node; each layer holds the paths of one length.
+    best = [inf] * ((1 << n) * n)
+    parent = [-1] * ((1 << n) * n)
+    layer = [(1 << j) * n + j for j in range(n) if start is None or j == start]
+    for state in layer:
+        best[state] = 0.0
+
+    for _ in range(n - 1):
+        # `layer` is in lexicographic order of its paths, so the first parent to reach the best
+        # cost for a state is also the lexicographically first one, and a strict < keeps it.
+        sort_keys = {}
+        for position, state in enumerate(layer):
+            mask, last = divmod(state, n)
+            path_cost = best[state]
+            row = cost[last]
+            for nxt in nodes:
+                if mask >> nxt & 1:
+                    continue
+                target = (mask | 1 << nxt) * n + nxt
+                candidate = path_cost + row[nxt]
+                if candidate < best[target]:
+                    best[target] = candidate
+                    parent[target] = state
+                    sort_keys[target] = position * n + nxt
+        layer = sorted(sort_keys, key=sort_keys.__getitem__)
+
+    final_state = layer[0]
+    for state in layer:
+        if best[state] < best[final_state]:
+            final_state = state
+    order = []
+    state = final_state
+    while state != -1:
+        order.append(state % n)
+        state = parent[state]
+    return order[::-1], best[final_state]
+
+
+# --- 3. Route Solving for a Delivery Scenario ---
+def solve_route(stops, is_fragile=False, needs_cold_storage=False, start=None, hour=None):
+    """
+    Returns (best_route, cost) for visiting `stops`, or (None, inf) when the cold-storage
+    requirement cannot be met because none of the stops has cold storage.
+    Gives the same route as trying every permutation of `stops` in order and keeping the first
+    cheapest one, but in O(n^2 * 2^n) time, which handles 12-15 stops. Traffic is that of `hour`
+    (0-23) when given and the static profile otherwise.
+    """
+    if needs_cold_storage and not any(COLD_STORAGE_MASK[LOCATION_INDEX[stop]] for stop in stops):
+        return None, float('inf')
+    indices = [LOCATION_INDEX[stop] for stop in stops]
+    rows = cost_rows(is_fragile, hour)
+    cost_matrix = [[rows[i][j] for j in indices] for i in indices]
+    start_position = None if start is None else list(stops).index(start)
+    order, total_cost = held_karp(cost_matrix, start=start_position)
+    return tuple(stops[i] for i in order), total_cost
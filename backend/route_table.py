@@ -0,0 +1,92 @@
+import numpy as np
+import sys
+import json
+import os
+
+# --- Route Model Compiled to a Lookup Table ---
+# The route model only sees four label-encoded categoricals (origin, destination, priority,
+# fragility), so its whole input domain is a small grid. Predicting every cell once and storing
+# the company codes turns each later prediction into a single array index.
+
+FEATURES = ['origin_encoded', 'destination_encoded', 'priority_encoded', 'fragility_encoded']
+TABLE_FILE = 'logistics_route_table.npz'
+
+def encode_grid(le_origin, le_destination, le_priority, le_fragility):
+    """Returns the grid shape and every encoded feature row (one per FEATURES column) in C order of that shape."""
+    shape = (len(le_origin.classes_), len(le_destination.classes_), len(le_priority.classes_), len(le_fragility.classes_))
+    return shape, np.indices(shape).reshape(len(shape), -1).T
+
+
+def export_route_table(model, le_origin, le_destination, le_priority, le_fragility, le_company, path=TABLE_FILE):
+    """Predicts every cell of the encoded feature grid and saves the company codes with the category lists."""
+    # pandas is only needed to compile the table; loading and querying it never imports it.
+    import pandas as pd
+    shape, grid = encode_grid(le_origin, le_destination, le_priority, le_fragility)
+    codes = model.predict(pd.DataFrame(grid, columns=FEATURES))
+    dtype = np.uint8 if len(le_company.classes_) <= 256 else np.uint16
+    # Category lists are stored as plain string arrays so loading never needs pickle.
+    np.savez(path, table=codes.astype(dtype).reshape(shape),
+             origins=np.asarray(le_origin.classes_, dtype=str), destinations=np.asarray(le_destination.classes_, dtype=str),
+             priorities=np.asarray(le_priority.classes_, dtype=str), fragilities=np.asarray(le_fragility.classes_, dtype=str),
+             companies=np.asarray(le_company.classes_, dtype=str))
+    return path
+
+
+class RouteTable:
+    """Predicts the top company for a query by indexing the exported table instead of running the forest."""
+
+    def __init__(self, path=TABLE_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            self.table = data['table']
+            self.origin_codes = {name: i for i, name in enumerate(data['origins'].tolist())}
+            self.destination_codes = {name: i for i, name in enumerate(data['destinations'].tolist())}
+            self.priority_codes = {name: i for i, name in enumerate(data['priorities'].tolist())}
+            self.fragility_codes = {name: i for i, name in enumerate(data['fragilities'].tolist())}
+            self.companies = data['companies'].tolist()
+
+    def predict(self, origin, destination, priority, fragility):
+        """Same answer as le_company.inverse_transform(model.predict(...)) for one query."""
+        try:
+            cell = (self.origin_codes[origin], self.destination_codes[destination],
+                    self.priority_codes[priority], self.fragility_codes[fragility])
+        except KeyError as exc:
+            # LabelEncoder.transform raises ValueError for unseen labels as well
+            raise ValueError(f"y contains previously unseen labels: {exc.args[0]!r}") from None
+        return self.companies[self.table[cell]]
+
+
+def verify_route_table(model, le_origin, le_destination, le_priority, le_fragility, path=TABLE_FILE):
+    """Returns how many grid cells of the saved table disagree with model.predict (0 means exact)."""
+    import pandas as pd
+    shape, grid = encode_grid(le_origin, le_destination, le_priority, le_fragility)
+    expected = model.predict(pd.DataFrame(grid, columns=FEATURES)).reshape(shape)
+    with np.load(path, allow_pickle=False) as data:
+        table = data['table']
+    if table.shape != expected.shape:
+        return int(expected.size)
+    return int(np.count_nonzero(table != expected))
+
+
+# --- Script Execution ---
+if __name__ == "__main__":
+    # Compiles the already trained model in this directory: python3 route_table.py
+    from model_bundle import ModelBundle, ROUTE_MODEL_BUNDLE
+    try:
+        bundle = ModelBundle(ROUTE_MODEL_BUNDLE)
+    except (FileNotFoundError, ValueError) as exc:
+        print(json.dumps({"error": f"Model bundle not usable ({exc}). Please run train_model.py first."}))
+        sys.exit(1)
+
+    # The bundle's FlatForest predicts exactly what the scikit-learn forest it was saved from did
+    model = bundle.forest
+    encoders = [bundle.label_encoder(name) for name in ('origin', 'destination', 'priority', 'fragility', 'company')]
+    export_route_table(model, *encoders)
+    mismatches = verify_route_table(model, *encoders[:4])
+    print(json.dumps({
+        'table': TABLE_FILE,
+        'cells': int(RouteTable().table.size),
+        'table_bytes': os.path.getsize(TABLE_FILE),
+        'model_bytes': os.path.getsize(ROUTE_MODEL_BUNDLE),
+        'mismatches': mismatches,
+    }, indent=4))
+    sys.exit(0 if mismatches == 0 else 1)
@@ -97,21 +97,147 @@ app.get('/api/company/:companyName', (req, res) => {
     else res.status(404).json({ message: "Company details not found." });
 });
 
-// B. AI Recommendation Route
+// B. AI Recommendation Routes
+// Each Python predictor runs as a single resident process started with `--serve`, so its model and
+// data are loaded once instead of on every request. Requests are written to its stdin as JSON lines
+// tagged with an id, and each JSON line it prints back is matched to its caller by that id.
+// With PYTHON_WORKERS > 1 that process answers through a pool of forked workers (`--workers N`), so
+// concurrent requests run in parallel and answers may come back in any order. When its bounded
+// queue is full or a request times out it says so, and we pass that on as a 503 or 504.
+// A request that gets no answer within PYTHON_REQUEST_TIMEOUT_MS fails with a 504 as well. A
+// predictor that exits is restarted by the next request, but one that keeps dying soon after
+// starting is restarted with an exponential backoff, and requests meanwhile get a 503.
+const PYTHON_WORKERS = parseInt(process.env.PYTHON_WORKERS || '1', 10);
+const PYTHON_REQUEST_TIMEOUT_MS = parseInt(process.env.PYTHON_REQUEST_TIMEOUT_MS || '35000', 10);
+const RESPAWN_BACKOFF_MS = 500;
+const MAX_RESPAWN_BACKOFF_MS = 30000;
+// A predictor that stays up this long counts as healthy again.
+const HEALTHY_UPTIME_MS = 10000;
+
+function predictorError(message, fields) {
+    return Object.assign(new Error(message), fields);
+}
+
+function createPythonWorker(script) {
+    let child = null;
+    let buffer = '';
+    let nextId = 1;
+    let startedAt = 0;
+    let failures = 0;
+    let retryAt = 0;
+    const pending = new Map();
+
+    // Fails everything in flight and forgets the process; runs once per process, whichever of
+    // 'error' and 'close' comes first.
+    function stop(proc, reason) {
+        if (child !== proc) return;
+        child = null;
+        console.error(`${script} ${reason}.`);
+        failures = Date.now() - startedAt < HEALTHY_UPTIME_MS ? failures + 1 : 0;
+        retryAt = failures ? Date.now() + Math.min(MAX_RESPAWN_BACKOFF_MS, RESPAWN_BACKOFF_MS * 2 ** (failures - 1)) : 0;
+        for (const entry of pending.values()) {
+            clearTimeout(entry.timer);
+            entry.callback(predictorError(`${script} ${reason}.`, { unavailable: true }));
+        }
+        pending.clear();
+    }
+
+    function start() {
+        const args = PYTHON_WORKERS > 1 ? [ script, '--serve', '--workers', String(PYTHON_WORKERS) ] : [ script, '--serve' ];
+        const proc = spawn('python3', args);
+        child = proc;
+        startedAt = Date.now();
+        buffer = '';
+        proc.stdout.on('data', (data) => {
+            buffer += data.toString();
+            let newline;
+            while ((newline = buffer.indexOf('\n')) >= 0) {
+                const line = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (!line) continue;
+                let message;
+                try { message = JSON.parse(line); }
+                catch (e) { console.error(`Invalid line from ${script}: ${line}`); continue; }
+                const entry = pending.get(message.id);
+                if (!entry) continue;
+                pending.delete(message.id);
+                clearTimeout(entry.timer);
+                delete message.id;
+                entry.callback(null, message);
+            }
+        });
+        proc.stderr.on('data', (data) => { console.error(`${script}: ${data.toString()}`); });
+        // A write after the process died (EPIPE) is reported here; 'close' does the cleanup.
+        proc.stdin.on('error', (err) => { console.error(`${script} stdin: ${err.message}`); });
+        // If the process cannot start or dies, fail everything in flight and let a later request start a fresh one.
+        proc.on('error', (err) => stop(proc, `failed: ${err.message}`));
+        proc.on('close', (code) => stop(proc, `exited with code ${code}`));
+    }
+
+    return function request(payload, callback) {
+        if (!child) {
+            if (Date.now() < retryAt) {
+                return callback(predictorError(`${script} is restarting after repeated failures.`, { unavailable: true }));
+            }
+            start();
+        }
+        const id = nextId++;
+        const timer = setTimeout(() => {
+            pending.delete(id);
+            callback(predictorError(`${script} did not answer within ${PYTHON_REQUEST_TIMEOUT_MS} ms.`, { timeout: true }));
+        }, PYTHON_REQUEST_TIMEOUT_MS);
+        pending.set(id, { callback, timer });
+        child.stdin.write(JSON.stringify({ id, ...payload }) + '\n');
+    };
+}
+
+// 503 when the predictor turned the request away because its queue was full, 504 when it timed out.
+function predictorStatus(result) {
+    if (result.overloaded) return 503;
+    if (result.timeout) return 504;
+    return 200;
+}
+
+// The same for requests that failed on our side: 504 when no answer came in time, 503 when the
+// predictor is down or restarting.
+function predictorErrorStatus(err) {
+    if (err.timeout) return 504;
+    if (err.unavailable) return 503;
+    return 500;
+}
+
+const requestRecommendation = createPythonWorker('predict_api.py');
+const requestIntracityRoute = createPythonWorker('intracity_predict.py');
+
 app.post('/api/recommend', (req, res) => {
     const { origin, destination, priorities, fragility } = req.body;
-    // Spawns a separate Python process to run the AI model.
-    const pythonProcess = spawn('python3', [ 'predict_api.py', origin, destination, priorities.join(','), fragility ]);
-    let pythonResponse = '', errorResponse = '';
-    pythonProcess.stdout.on('data', (data) => { pythonResponse += data.toString(); });
-    pythonProcess.stderr.on('data', (data) => { errorResponse += data.toString(); });
-    pythonProcess.on('close', (code) => {
-        if (code !== 0 || errorResponse) {
-            console.error(`Python script error: ${errorResponse}`);
-            return res.status(500).json({ error: "Failed to get AI recommendation." });
+    requestRecommendation({ origin, destination, priorities, fragility }, (err, result) => {
+        if (err) {
+            console.error(`Python script error: ${err.message}`);
+            return res.status(predictorErrorStatus(err)).json({ error: "Failed to get AI recommendation." });
+        }
+        res.status(predictorStatus(result)).json(result);
+    });
+});
+
+// Predicts the first stop of an intra-city delivery and returns the full solved route order.
+// An optional `hour` (0-23) solves the route under that time of day's traffic.
+app.post('/api/intracity/route', (req, res) => {
+    const { stops, is_fragile, needs_cold_storage, product_type } = req.body;
+    let hour = req.body.hour;
+    if (hour === undefined || hour === null || hour === '') {
+        hour = undefined;
+    } else if (!/^\d{1,2}$/.test(String(hour).trim()) || Number(hour) > 23) {
+        return res.status(400).json({ error: "hour must be a whole number from 0 to 23." });
+    } else {
+        hour = Number(hour);
+    }
+    requestIntracityRoute({ stops, is_fragile, needs_cold_storage, product_type, hour }, (err, result) => {
+        if (err) {
+            console.error(`Python script error: ${err.message}`);
+            return res.status(predictorErrorStatus(err)).json({ error: "Failed to plan the intra-city route." });
         }
-        try { res.status(200).json(JSON.parse(pythonResponse)); }
-        catch (e) { res.status(500).json({ error: "Invalid response from AI model." }); }
+        res.status(predictorStatus(result)).json(result);
     });
 });
 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend is a directory of scripts rather than a package, so its modules are imported by name.
+# predict_api.py opens its model and data files relative to the working directory, hence the chdir.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
@@ -0,0 +1,94 @@
+import pytest
+from city_model import COLD_STORAGE_LOCATIONS, LOCATION_INDEX
+from route_solver import cost_rows
+from dispatch_optimizer import dispatch, random_plan
+
+TIME_BUDGET = 0.5
+
+
+def check_plan(plan, result):
+    """Asserts that a dispatch result covers every drop once and respects every constraint, and recomputes its costs."""
+    drops = {drop['id']: drop for drop in plan['drops']}
+    vehicles = {vehicle['id']: vehicle for vehicle in plan['vehicles']}
+    seen = set(result['unassigned'])
+    total = 0.0
+    for route in result['routes']:
+        vehicle = vehicles[route['vehicle']]
+        ids = [drop_id for visit in route['visits'] for drop_id in visit['drops']]
+        assert not seen & set(ids), "a drop is delivered twice"
+        seen |= set(ids)
+        assert all(drops[drop_id]['location'] == visit['location'] for visit in route['visits'] for drop_id in visit['drops'])
+        assert len({visit['location'] for visit in route['visits']}) == len(route['visits']), "a location is visited twice"
+
+        # Capacity
+        load = sum(drops[drop_id].get('demand', 1) for drop_id in ids)
+        assert load <= vehicle['capacity'] + 1e-9
+        assert route['load'] == pytest.approx(load)
+
+        # Cold chain: cold drops ride only in refrigerated vans, which start from cold storage
+        cold = any(drops[drop_id].get('needs_cold_storage') for drop_id in ids)
+        fragile = any(drops[drop_id].get('is_fragile') for drop_id in ids)
+        path = [vehicle['depot']]
+        if cold:
+            assert vehicle.get('refrigerated')
+            if vehicle['depot'] not in COLD_STORAGE_LOCATIONS:
+                assert route['cold_storage_stop'] in COLD_STORAGE_LOCATIONS
+                path.append(route['cold_storage_stop'])
+        path += [visit['location'] for visit in route['visits']]
+        if route['visits'] and plan.get('return_to_depot', True):
+            path.append(vehicle['depot'])
+
+        rows = cost_rows(fragile, plan.get('hour'))
+        cost = sum(rows[LOCATION_INDEX[a]][LOCATION_INDEX[b]] for a, b in zip(path, path[1:])) if route['visits'] else 0.0
+        assert route['cost'] == pytest.approx(cost, abs=1e-2)
+        total += cost
+    assert seen == set(drops), "every drop is either routed or reported unassigned"
+    assert result['total_cost'] == pytest.approx(total, abs=0.05)
+
+
+@pytest.mark.parametrize('num_drops, num_vehicles, hour, seed', [
+    (40, 2, None, 0), (120, 4, 8, 1), (200, 5, 18, 2), (150, 3, None, 3),
+])
+def test_random_plans_respect_constraints(num_drops, num_vehicles, hour, seed):
+    plan = random_plan(num_drops, num_vehicles, seed=seed, hour=hour)
+    result = dispatch(plan, TIME_BUDGET, seed=seed)
+    check_plan(plan, result)
+    solve = result['solve']
+    assert result['total_cost'] <= solve['local_search_cost'] + 1e-6 <= solve['construction_cost'] + 2e-6
+
+
+def test_open_routes_and_unassignable_drops():
+    plan = {
+        'vehicles': [{'id': 'dry', 'depot': 'MP Nagar', 'capacity': 3},
+                     {'id': 'cold', 'depot': 'ISBT', 'capacity': 10, 'refrigerated': True}],
+        'drops': [{'id': 'a', 'location': 'Arera Colony', 'demand': 2},
+                  {'id': 'b', 'location': 'Kolar Road', 'demand': 3, 'needs_cold_storage': True},
+                  {'id': 'c', 'location': 'Shahpura', 'demand': 1, 'is_fragile': True},
+                  {'id': 'd', 'location': 'Lalghati', 'demand': 11}],
+        'return_to_depot': False,
+    }
+    result = dispatch(plan, TIME_BUDGET)
+    check_plan(plan, result)
+    # No van can carry 11 units
+    assert result['unassigned'] == ['d']
+    cold_route = next(route for route in result['routes'] if route['vehicle'] == 'cold')
+    assert 'b' in [drop_id for visit in cold_route['visits'] for drop_id in visit['drops']]
+
+
+def test_cold_drops_without_a_refrigerated_van_stay_unassigned():
+    plan = {'vehicles': [{'id': 'dry', 'depot': 'MP Nagar', 'capacity': 10}],
+            'drops': [{'id': 1, 'location': 'ISBT', 'needs_cold_storage': True}, {'id': 2, 'location': 'ISBT'}]}
+    result = dispatch(plan, TIME_BUDGET)
+    check_plan(plan, result)
+    assert result['unassigned'] == [1]
+
+
+@pytest.mark.parametrize('plan', [
+    {'vehicles': [], 'drops': []},
+    {'vehicles': [{'id': 'v', 'depot': 'Atlantis', 'capacity': 5}], 'drops': []},
+    {'vehicles': [{'id': 'v', 'capacity': 0}], 'drops': []},
+    {'vehicles': [{'id': 'v', 'capacity': 5}], 'drops': [{'location': 'Nowhere'}]},
+    {'vehicles': [{'id': 'v', 'capacity': 5}], 'drops': [], 'hour': 25},
+])
+def test_invalid_plans_are_reported(plan):
+    assert 'error' in dispatch(plan, TIME_BUDGET)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from flat_forest import FlatForest
+
+
+def encoded_dataset(seed, rows=600, columns=8):
+    """Label-encoded categorical features like the training scripts produce, with a learnable target."""
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 12, size=(rows, columns))
+    y = (X[:, 0] * 3 + X[:, 1] + rng.integers(0, 3, size=rows)) % 7
+    return X, y
+
+
+@pytest.mark.parametrize('n_estimators, max_depth', [(1, None), (10, 4), (25, None)])
+def test_matches_sklearn_predict(n_estimators, max_depth):
+    X, y = encoded_dataset(n_estimators)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=0).fit(X, y)
+    forest = FlatForest(model)
+    # Unseen rows too, including values outside the training range
+    rows = np.vstack([X, np.random.default_rng(1).integers(-2, 15, size=(300, X.shape[1]))])
+    expected = model.predict(rows)
+    np.testing.assert_array_equal(forest.predict(rows), expected)
+    assert [forest.predict_one(row) for row in rows] == expected.tolist()
+
+
+def test_round_trips_through_arrays():
+    X, y = encoded_dataset(3)
+    model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    forest = FlatForest(model)
+    rebuilt = FlatForest.from_arrays(forest.to_arrays(), forest.depth)
+    for name in ('roots', 'feature', 'threshold', 'left', 'right', 'value', 'classes'):
+        np.testing.assert_array_equal(getattr(rebuilt, name), getattr(forest, name))
+    np.testing.assert_array_equal(rebuilt.predict(X), model.predict(X))
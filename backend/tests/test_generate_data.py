@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+from generate_data import generate_chunks
+
+
+@pytest.mark.parametrize('num_routes, num_carriers, num_rows, chunk_rows', [
+    (5, 20, 11, 100000), (5, 20, 11, 3), (5, 20, 100, 100000), (7, 3, 20, 4), (1, 1, 1, 1),
+])
+def test_every_route_gets_its_share_of_rows(num_routes, num_carriers, num_rows, chunk_rows):
+    df = pd.concat(generate_chunks(num_routes, num_carriers, num_rows, np.random.default_rng(0), chunk_rows))
+    assert len(df) == num_rows
+    counts = df.groupby(['origin', 'destination']).size()
+    assert len(counts) == num_routes
+    assert counts.max() - counts.min() <= 1
+    assert not df.duplicated(['origin', 'destination', 'company']).any()
+
+
+@pytest.mark.parametrize('num_routes, num_carriers, num_rows', [(0, 5, 5), (5, 0, 5), (5, 20, 4), (5, 2, 11)])
+def test_impossible_shapes_are_rejected(num_routes, num_carriers, num_rows):
+    with pytest.raises(ValueError):
+        list(generate_chunks(num_routes, num_carriers, num_rows, np.random.default_rng(0)))
@@ -0,0 +1,84 @@
+import io
+import json
+import zipfile
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from model_bundle import ModelBundle, write_bundle, MANIFEST_FILE, BUNDLE_FORMAT_VERSION
+
+
+@pytest.fixture
+def trained():
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 5, size=(300, 4))
+    labels = np.array(['Gati', 'DTDC', 'FedEx'])[(X[:, 0] + X[:, 1]) % 3]
+    encoder = LabelEncoder().fit(labels)
+    model = RandomForestClassifier(n_estimators=8, random_state=0).fit(X, encoder.transform(labels))
+    return model, encoder, X
+
+
+def rewrite_member(path, name, change):
+    """Rewrites one member of a bundle in place with change(bytes) -> bytes."""
+    with zipfile.ZipFile(path) as bundle:
+        members = {member: bundle.read(member) for member in bundle.namelist()}
+    members[name] = change(members[name])
+    with zipfile.ZipFile(path, 'w') as bundle:
+        for member, data in members.items():
+            bundle.writestr(member, data)
+
+
+def test_round_trip(tmp_path, trained):
+    model, encoder, X = trained
+    path = tmp_path / 'model.bundle'
+    manifest = write_bundle(str(path), model, {'company': encoder, 'origin': ['Bhopal', 'Pune']}, {'rows': len(X)})
+    bundle = ModelBundle(str(path))
+    assert bundle.manifest == json.loads(json.dumps(manifest))
+    assert bundle.encoders == {'company': encoder.classes_.tolist(), 'origin': ['Bhopal', 'Pune']}
+    assert bundle.codes('company') == {label: code for code, label in enumerate(encoder.classes_)}
+    np.testing.assert_array_equal(bundle.label_encoder('company').classes_, encoder.classes_)
+    assert not bundle.loaded
+    np.testing.assert_array_equal(bundle.forest.predict(X), model.predict(X))
+    assert bundle.loaded
+
+
+def test_rejects_a_forest_that_fails_the_checksum(tmp_path, trained):
+    model, encoder, _ = trained
+    path = tmp_path / 'model.bundle'
+    write_bundle(str(path), model, {'company': encoder})
+
+    def nudge_threshold(data):
+        threshold = np.load(io.BytesIO(data))
+        threshold[0] += 1.0
+        buffer = io.BytesIO()
+        np.save(buffer, threshold)
+        return buffer.getvalue()
+
+    rewrite_member(path, 'forest/threshold.npy', nudge_threshold)
+    bundle = ModelBundle(str(path))  # the manifest alone is still fine
+    with pytest.raises(ValueError, match='checksum'):
+        bundle.forest
+
+
+def test_rejects_other_format_versions(tmp_path, trained):
+    model, encoder, _ = trained
+    path = tmp_path / 'model.bundle'
+    write_bundle(str(path), model, {'company': encoder})
+
+    def bump_version(data):
+        manifest = json.loads(data)
+        manifest['format_version'] = BUNDLE_FORMAT_VERSION + 1
+        return json.dumps(manifest).encode()
+
+    rewrite_member(path, MANIFEST_FILE, bump_version)
+    with pytest.raises(ValueError, match='format'):
+        ModelBundle(str(path))
+
+
+def test_rejects_files_that_are_not_bundles(tmp_path):
+    path = tmp_path / 'model.bundle'
+    path.write_bytes(b'not a zip file')
+    with pytest.raises(ValueError, match='not a model bundle'):
+        ModelBundle(str(path))
+    with pytest.raises(FileNotFoundError):
+        ModelBundle(str(tmp_path / 'missing.bundle'))
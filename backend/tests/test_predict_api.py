@@ -0,0 +1,163 @@
+import itertools
+import random
+import numpy as np
+import pytest
+import predict_api
+from predict_api import RAW_COLUMNS, add_score_columns, build_route_index, load_carrier_table, rank_route
+from carrier_updates import CarrierUpdater
+
+PRIORITY_SETS = [list(combo) for size in (1, 2) for combo in itertools.combinations(['cost', 'speed', 'safety', 'warehouse'], size)]
+
+
+@pytest.fixture(scope='module')
+def carrier_df():
+    return load_carrier_table()
+
+
+# --- Batch vs Single Recommendations ---
+def test_batch_matches_single_queries(carrier_df):
+    rng = random.Random(0)
+    routes = sorted(set(zip(carrier_df['origin'], carrier_df['destination'])))
+    requests = []
+    for _ in range(300):
+        origin, destination = rng.choice(routes)
+        requests.append({'origin': origin, 'destination': destination, 'priorities': rng.choice(PRIORITY_SETS),
+                         'fragility': rng.choice(['Low', 'High'])})
+    # A pair without a direct route and an unknown city go through the same fallbacks
+    requests.append({'origin': 'Pune', 'destination': 'Bhopal', 'priorities': ['cost'], 'fragility': 'Low'})
+    requests.append({'origin': 'Bhopal', 'destination': 'Atlantis', 'priorities': ['speed'], 'fragility': 'High'})
+
+    batch = predict_api.get_batch_recommendations(requests)
+    assert batch == [rank_route(r['origin'], r['destination'], r['priorities'], r['fragility']) for r in requests]
+
+
+def test_batch_reports_bad_requests_in_place():
+    good = {'origin': 'Bhopal', 'destination': 'Pune', 'priorities': ['cost'], 'fragility': 'Low'}
+    results = predict_api.get_batch_recommendations([good, {'origin': 'Bhopal'}, good])
+    assert results[0] == results[2] == rank_route('Bhopal', 'Pune', ['cost'], 'Low')
+    assert 'error' in results[1]
+
+
+def test_unknown_priorities_are_named():
+    request = {'origin': 'Bhopal', 'destination': 'Pune', 'priorities': 'cost,nope', 'fragility': 'Low'}
+    error = {'error': "Unknown priority 'nope'; choose from cost, speed, safety, warehouse."}
+    assert predict_api.handle_request(request) == error
+    assert predict_api.handle_request({'command': 'profile', 'request': request}) == error
+    assert predict_api.get_batch_recommendations([request]) == [error]
+    assert predict_api.parse_priorities('cost,speed') == ['cost', 'speed']
+    with pytest.raises(ValueError, match="'fast', 'cheap'"):
+        predict_api.parse_priorities(['fast', 'cheap'])
+
+
+def test_batch_frontiers_come_from_the_batch_snapshot(carrier_df, monkeypatch):
+    monkeypatch.setattr(predict_api, 'ROUTE_INDEX', predict_api.ROUTE_INDEX)
+    monkeypatch.setattr(predict_api, 'CARRIER_UPDATER', CarrierUpdater(predict_api.ROUTE_INDEX, lambda: carrier_df[RAW_COLUMNS].to_numpy(dtype=np.float64)))
+    route = tuple(carrier_df.loc[0, ['origin', 'destination']])
+    before = predict_api.get_frontier(*route, ['cost'], 'Low')
+
+    class PublishesAnUpdate(dict):
+        """A request that publishes a price cut on its own route while the batch is being answered."""
+        def get(self, key, default=None):
+            if key == 'frontier' and not predict_api.CARRIER_UPDATER.current().version:
+                predict_api.apply_carrier_updates([{'origin': route[0], 'destination': route[1],
+                                                    'company': carrier_df.at[0, 'company'], 'price': 1.0}])
+            return super().get(key, default)
+
+    request = PublishesAnUpdate(origin=route[0], destination=route[1], priorities=['cost'], fragility='Low', frontier=True)
+    [result] = predict_api.get_batch_recommendations([request])
+    assert predict_api.ROUTE_INDEX.version == 1
+    assert result['frontier'] == before != predict_api.get_frontier(*route, ['cost'], 'Low')
+
+
+# --- Multi-Leg Routes ---
+def test_multi_leg_through_bhopal():
+    # Every shipped carrier row leaves Bhopal, so Indore to Pune goes back to Bhopal first
+    results = rank_route('Indore', 'Pune', ['cost'], 'Low')
+    assert results['multi_leg']
+    for pick in ('top_choice', 'balanced_option', 'value_pick'):
+        legs = results[pick]['legs']
+        assert [(leg['origin'], leg['destination'], leg['inferred']) for leg in legs] == [('Indore', 'Bhopal', True), ('Bhopal', 'Pune', False)]
+        assert results[pick]['inferred_legs'] == 1
+        assert results[pick]['total_price'] == pytest.approx(sum(leg['price'] for leg in legs))
+
+
+# --- Incremental Updates vs Full Rescore ---
+def apply_to_frame(df, updates):
+    """The same updates applied to the carrier DataFrame, for a rescore from scratch."""
+    df = df.copy()
+    for update in updates:
+        rows = (df['origin'] == update['origin']) & (df['destination'] == update['destination']) & (df['company'] == update['company'])
+        for name in RAW_COLUMNS:
+            if name in update:
+                df.loc[rows, name] = float(update[name])
+            if name in update.get('delta', {}):
+                df.loc[rows, name] += float(update['delta'][name])
+    return df
+
+
+def random_updates(df, rng, count):
+    updates = []
+    for row in rng.sample(range(len(df)), count):
+        update = {key: df.at[row, key] for key in ('origin', 'destination', 'company')}
+        kind = rng.random()
+        if kind < 0.3:
+            update['price'] = rng.choice([float(df['price'].min()) - 50, float(df['price'].max()) + 50, 800.0])
+        elif kind < 0.6:
+            update['delta'] = {'delivery_time_hours': rng.uniform(-3, 3), 'safety_rating': rng.uniform(-0.2, 0.2)}
+        else:
+            # Moves a row that may sit on a bound inwards, which forces a rescan of that column
+            update['safety_rating'] = float(df['safety_rating'].median())
+        updates.append(update)
+    return updates
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_updates_match_full_rescore(carrier_df, seed, monkeypatch):
+    rng = random.Random(seed)
+    updater = CarrierUpdater(build_route_index(carrier_df), lambda: carrier_df[RAW_COLUMNS].to_numpy(dtype=np.float64))
+    expected_df = carrier_df
+    for _ in range(4):
+        updates = random_updates(expected_df, rng, rng.randint(1, 6))
+        snapshot, summary = updater.apply(updates)
+        expected_df = apply_to_frame(expected_df, updates)
+        expected = build_route_index(add_score_columns(expected_df.copy()))
+        assert summary['version'] == snapshot.version
+
+        for route, entry in expected.items():
+            actual = snapshot[route]
+            assert actual['companies'] == entry['companies']
+            np.testing.assert_allclose(actual['scores'], entry['scores'], rtol=0, atol=1e-12)
+            np.testing.assert_array_equal(actual['value_rows'], entry['value_rows'])
+
+        for priorities in PRIORITY_SETS:
+            for fragility in ('Low', 'High'):
+                for route in expected:
+                    monkeypatch.setattr(predict_api, 'ROUTE_INDEX', snapshot)
+                    incremental = rank_route(*route, priorities, fragility)
+                    monkeypatch.setattr(predict_api, 'ROUTE_INDEX', expected)
+                    assert incremental == rank_route(*route, priorities, fragility)
+
+
+def test_updates_are_validated_before_anything_changes(carrier_df):
+    updater = CarrierUpdater(build_route_index(carrier_df), lambda: carrier_df[RAW_COLUMNS].to_numpy(dtype=np.float64))
+    route = tuple(carrier_df.loc[0, ['origin', 'destination']])
+    good = {'origin': route[0], 'destination': route[1], 'company': carrier_df.at[0, 'company'], 'price': 1.0}
+    for bad in ([good, {'origin': route[0], 'destination': route[1], 'company': 'Nobody'}],
+                [good, {'origin': 'Nowhere', 'destination': route[1], 'company': good['company']}],
+                [{**good, 'delta': {'colour': 1}}],
+                [{'op': 'bogus'}],
+                'not a list'):
+        with pytest.raises(ValueError):
+            updater.apply(bad)
+    # Values that are not finite numbers are rejected with the field they came in
+    for bad, field in (([good, {**good, 'price': float('nan')}], 'price'),
+                       ([good, {**good, 'safety_rating': float('inf')}], 'safety_rating'),
+                       ([good, {**good, 'delta': {'delivery_time_hours': float('-inf')}}], 'delta delivery_time_hours'),
+                       ([good, {**good, 'price': 'cheap'}], 'price'),
+                       ([good, {**good, 'delta': {'price': None}}], 'delta price'),
+                       ([good, {**good, 'delta': [('price', 1)]}], 'delta')):
+        with pytest.raises(ValueError, match=f'^{field} must be'):
+            updater.apply(bad)
+    assert updater.current().version == 0
+    snapshot, summary = updater.apply([])
+    assert summary['updated_routes'] == 0 and snapshot.version == 0
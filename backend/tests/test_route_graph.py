@@ -0,0 +1,31 @@
+import pytest
+from route_graph import RouteGraph
+
+WEIGHTS = [0.5, 0.5, 0.0, 0.0, 0.0]
+
+
+def network(hubs, bidirectional=False):
+    """Two carriers meeting at H: X runs A -> H, Y runs H -> B. Raw columns are price, safety, time, warehouse."""
+    return RouteGraph(['A', 'H'], ['H', 'B'], ['X', 'Y'], [[100, 4.0, 5, 1000], [200, 4.5, 8, 2000]], hubs, bidirectional=bidirectional)
+
+
+@pytest.mark.parametrize('hubs', [{'X': 'H'}, {'Y': 'H'}])
+def test_two_legs_through_a_hub(hubs):
+    graph = network(hubs)
+    path = graph.describe_path(*graph.shortest_path('A', 'B', WEIGHTS))
+    assert [(leg['origin'], leg['destination'], leg['company']) for leg in path['legs']] == [('A', 'H', 'X'), ('H', 'B', 'Y')]
+    assert path['transfers'] == ['H']
+    assert path['total_price'] == 300 and path['total_delivery_time_hours'] == 13 and path['min_safety_rating'] == 4.0
+    assert path['inferred_legs'] == 0
+
+
+def test_no_transfer_away_from_a_hub():
+    assert network({'X': 'A', 'Y': 'B'}).shortest_path('A', 'B', WEIGHTS) is None
+
+
+def test_reverse_legs_only_when_bidirectional():
+    assert network({'X': 'H'}).shortest_path('B', 'A', WEIGHTS) is None
+    graph = network({'X': 'H'}, bidirectional=True)
+    path = graph.describe_path(*graph.shortest_path('B', 'A', WEIGHTS))
+    assert [(leg['origin'], leg['destination'], leg['inferred']) for leg in path['legs']] == [('B', 'H', True), ('H', 'A', True)]
+    assert path['inferred_legs'] == 2
@@ -0,0 +1,51 @@
+import itertools
+import random
+import pytest
+from city_model import LOCATIONS
+from route_solver import held_karp, solve_route, cost_rows, LOCATION_INDEX, COLD_STORAGE_MASK
+
+
+def brute_force(cost, start=None):
+    """The first cheapest open path in itertools.permutations order, as the old solver found it."""
+    best_order, best_cost = None, float('inf')
+    for order in itertools.permutations(range(len(cost))):
+        if start is not None and order[0] != start:
+            continue
+        path_cost = 0.0
+        for a, b in zip(order, order[1:]):
+            path_cost += cost[a][b]
+        if path_cost < best_cost:
+            best_order, best_cost = list(order), path_cost
+    return best_order, best_cost
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_held_karp_matches_brute_force(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 7)
+    # Small integer costs make ties common, so the tie-breaking order is checked too
+    cost = [[0 if i == j else rng.randint(1, 4) for j in range(n)] for i in range(n)]
+    assert held_karp(cost) == brute_force(cost)
+    start = rng.randrange(n)
+    assert held_karp(cost, start=start) == brute_force(cost, start=start)
+
+
+def test_held_karp_empty():
+    assert held_karp([]) == ([], 0.0)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_solve_route_matches_brute_force(seed):
+    rng = random.Random(seed)
+    stops = tuple(sorted(rng.sample(LOCATIONS, rng.randint(3, 7))))
+    is_fragile = rng.random() < 0.5
+    hour = rng.choice([None, 3, 8, 12, 18, 22])
+    rows = cost_rows(is_fragile, hour)
+    cost = [[rows[LOCATION_INDEX[a]][LOCATION_INDEX[b]] for b in stops] for a in stops]
+    order, expected_cost = brute_force(cost)
+    assert solve_route(stops, is_fragile, hour=hour) == (tuple(stops[i] for i in order), expected_cost)
+
+
+def test_solve_route_without_cold_storage_stop():
+    stops = tuple(sorted(stop for stop in LOCATIONS if not COLD_STORAGE_MASK[LOCATION_INDEX[stop]])[:4])
+    assert solve_route(stops, needs_cold_storage=True) == (None, float('inf'))
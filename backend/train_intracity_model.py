@@ -1,132 +1,132 @@
 import pandas as pd
+import numpy as np
 from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
-import joblib
 import random
-import itertools
-import os # NEW: Imported the 'os' module for handling file paths
-
-print("--- Starting LogAi Intra-City Model Training ---")
-print("[Checkpoint 1]: Libraries imported successfully.")
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from city_model import LOCATIONS
+from route_solver import solve_route
+from model_bundle import INTRACITY_MODEL_BUNDLE, write_bundle, choose_compact_forest, compare_models
 
 # --- 1. Expanded City & Route Data ---
-# The virtual city now has more locations and defined route conditions.
-
-CITY_LOCATIONS = {
-    "MP Nagar": (0, 0), "Arera Colony": (2, 3), "New Market": (-2, 1),
-    "Kolar Road": (4, 8), "ISBT": (5, 1), "Mandideep": (10, -5),
-    "Habib Ganj": (3, 0), "Piplani": (7, 2), "Bairagarh": (-8, 4),
-    "Shahpura": (1, 6), "Ayodhya Bypass": (8, 4), "Lalghati": (-5, 3)
-}
-
-# NEW: Define locations with special facilities
-COLD_STORAGE_LOCATIONS = ["Mandideep", "Piplani"]
-
-# Define route conditions: (distance, road_quality, traffic_profile)
-# road_quality: 1.0 = smooth, 0.5 = bumpy
-# traffic_profile: 1.0 = clear, 2.0 = heavy traffic at peak times
-ROUTE_CONDITIONS = {
-    ("MP Nagar", "Arera Colony"): (5, 1.0, 1.8),
-    ("MP Nagar", "New Market"): (3, 0.8, 2.0),
-    ("Arera Colony", "Kolar Road"): (6, 0.9, 1.2),
-    ("New Market", "Bairagarh"): (10, 0.6, 1.5),
-    ("ISBT", "Mandideep"): (15, 0.7, 1.8),
-    ("Habib Ganj", "Piplani"): (5, 1.0, 1.6),
-    ("Shahpura", "Kolar Road"): (3, 1.0, 1.4),
-    ("Ayodhya Bypass", "Piplani"): (4, 0.9, 1.9),
-}
-
-def get_route_stats(loc1, loc2):
-    """Calculates distance and gets route conditions, with defaults."""
-    key = tuple(sorted((loc1, loc2)))
-    if key in ROUTE_CONDITIONS:
-        return ROUTE_CONDITIONS[key]
-    
-    # Default calculation for routes not explicitly defined
-    dist = ((CITY_LOCATIONS[loc1][0] - CITY_LOCATIONS[loc2][0])**2 + 
-            (CITY_LOCATIONS[loc1][1] - CITY_LOCATIONS[loc2][1])**2)**0.5
-    return (dist, 0.8, 1.5) # Default road quality and traffic
+# The virtual city (locations, cold storage and route conditions) lives in city_model.py so the
+# route solver and serving code share it; route_solver.py precomputes its cost matrices.
+
+# Every scenario is padded to this many stop columns, with 'None' for the unused ones.
+NUM_STOP_COLUMNS = 5
+STOP_COLUMNS = [f'stop_{i+1}' for i in range(NUM_STOP_COLUMNS)]
+TRAINING_COLUMNS = STOP_COLUMNS + ['is_fragile', 'needs_cold_storage', 'product_type', 'best_first_stop']
+
+# Scenarios are generated in fixed-size chunks, each with its own seed, so the dataset only
+# depends on --seed and --scenarios and never on how many workers produced it.
+CHUNK_SIZE = 5000
 
 # --- 2. Generate More & Smarter Training Data ---
-# We now generate 20,000 scenarios and include "cold storage" logic.
-
-training_data = []
-LOCATIONS = list(CITY_LOCATIONS.keys())
-
-for _ in range(20000): # Generate 20,000 scenarios
-    num_stops = random.randint(3, 5)
-    stops = tuple(sorted(random.sample(LOCATIONS, num_stops)))
-    
-    product_type = random.choice(["Documents", "Food", "Electronics"])
-    is_fragile = random.choice([True, False])
-    needs_cold_storage = True if product_type == "Food" and random.random() > 0.5 else False
-    
-    best_route = None
-    min_cost = float('inf')
-
-    for p in itertools.permutations(stops):
-        current_cost = 0
-        
-        route_has_cold_storage = any(stop in COLD_STORAGE_LOCATIONS for stop in p)
-        if needs_cold_storage and not route_has_cold_storage:
-            current_cost = float('inf')
-        else:
-            for i in range(len(p) - 1):
-                dist, quality, traffic = get_route_stats(p[i], p[i+1])
-                cost = dist * traffic
-                if is_fragile and quality < 0.9:
-                    cost *= 1.5
-                current_cost += cost
-
-        if current_cost < min_cost:
-            min_cost = current_cost
-            best_route = p
-
-    if best_route:
-        training_data.append(list(stops) + [is_fragile, needs_cold_storage, product_type, best_route[0]])
-
-print(f"[Checkpoint 2]: Generated {len(training_data)} training scenarios.")
-
-# --- 3. Preprocess the Data ---
-num_stops_for_df = 5
-train_df = pd.DataFrame(training_data)
-train_df.columns = [f'stop_{i+1}' for i in range(len(train_df.columns)-4)] + ['is_fragile', 'needs_cold_storage', 'product_type', 'best_first_stop']
-for i in range(num_stops_for_df - (len(train_df.columns)-4)):
-    train_df[f'stop_{len(train_df.columns)-4+i}'] = 'None'
-
-stop_cols = [f'stop_{i+1}' for i in range(5)]
-train_df = train_df[stop_cols + ['is_fragile', 'needs_cold_storage', 'product_type', 'best_first_stop']]
-
-encoders = {}
-for col in train_df.columns:
-    if train_df[col].dtype == 'object' or train_df[col].dtype == 'bool':
-        le = LabelEncoder()
-        train_df[col] = le.fit_transform(train_df[col].astype(str))
-        encoders[col] = le
-
-print("[Checkpoint 3]: Data preprocessing complete.")
-
-# --- 4. Train the AI Model ---
-features = [col for col in train_df.columns if col != 'best_first_stop']
-target = 'best_first_stop'
-
-X_train = train_df[features]
-y_train = train_df[target]
-
-model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
-model.fit(X_train, y_train)
-
-print("[Checkpoint 4]: AI model training complete.")
-
-# --- 5. Save the Model and Encoders ---
-# NEW: Using absolute paths to ensure files save in the same directory as the script.
-script_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(script_dir, 'intracity_model.pkl')
-encoders_path = os.path.join(script_dir, 'intracity_encoders.pkl')
-
-joblib.dump(model, model_path)
-joblib.dump(encoders, encoders_path)
-
-print("[Checkpoint 5]: Model and encoders saved successfully!")
-print(f"\nFiles were saved to: {script_dir}")
-print("--- Training Complete ---")
+# --scenarios of them (20,000 by default), labelled with the solver's first stop, cold storage included.
+def generate_scenarios(count, seed):
+    """Generates one chunk of `count` labelled scenarios from its own seeded RNG."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        num_stops = rng.randint(3, 5)
+        stops = tuple(sorted(rng.sample(LOCATIONS, num_stops)))
+
+        product_type = rng.choice(["Documents", "Food", "Electronics"])
+        is_fragile = rng.choice([True, False])
+        needs_cold_storage = True if product_type == "Food" and rng.random() > 0.5 else False
+
+        # Held-Karp DP over the precomputed cost matrix; returns the same optimum as scanning every permutation
+        best_route, min_cost = solve_route(stops, is_fragile, needs_cold_storage)
+
+        if best_route:
+            padded_stops = list(stops) + ['None'] * (NUM_STOP_COLUMNS - len(stops))
+            rows.append(padded_stops + [is_fragile, needs_cold_storage, product_type, best_route[0]])
+    return pd.DataFrame(rows, columns=TRAINING_COLUMNS)
+
+
+def generate_training_data(num_scenarios, workers=1, seed=None, chunk_size=CHUNK_SIZE):
+    """Splits generation into chunks, runs them on a process pool and concatenates the results in chunk order."""
+    chunk_counts = [min(chunk_size, num_scenarios - start) for start in range(0, num_scenarios, chunk_size)]
+    chunk_seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(chunk_counts))]
+    if workers <= 1 or len(chunk_counts) <= 1:
+        chunks = list(map(generate_scenarios, chunk_counts, chunk_seeds))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(generate_scenarios, chunk_counts, chunk_seeds))
+    if not chunks:
+        return pd.DataFrame(columns=TRAINING_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the LogAi intra-city first-stop model.")
+    parser.add_argument('--scenarios', type=int, default=20000, help="Number of scenarios to generate (default: 20000).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes for scenario generation (default: all CPUs).")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for a reproducible dataset (default: fresh entropy, printed at startup).")
+    parser.add_argument('--output-dir', default=None, help="Directory to save the model bundle in (default: this script's directory).")
+    parser.add_argument('--compact', action='store_true', help="Ship the smallest forest that is as accurate on the training data as the full one, and report size, load time and latency of both.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("--- Starting LogAi Intra-City Model Training ---")
+    print("[Checkpoint 1]: Libraries imported successfully.")
+
+    seed = args.seed if args.seed is not None else int(np.random.SeedSequence().entropy)
+    print(f"Generating {args.scenarios} scenarios with {args.workers} worker(s), seed {seed}.")
+    train_df = generate_training_data(args.scenarios, args.workers, seed)
+
+    print(f"[Checkpoint 2]: Generated {len(train_df)} training scenarios.")
+
+    # --- 3. Preprocess the Data ---
+    encoders = {}
+    for col in train_df.columns:
+        if train_df[col].dtype == 'bool' or not pd.api.types.is_numeric_dtype(train_df[col]):
+            le = LabelEncoder()
+            train_df[col] = le.fit_transform(train_df[col].astype(str))
+            encoders[col] = le
+
+    print("[Checkpoint 3]: Data preprocessing complete.")
+
+    # --- 4. Train the AI Model ---
+    features = [col for col in train_df.columns if col != 'best_first_stop']
+    target = 'best_first_stop'
+
+    X_train = train_df[features]
+    y_train = train_df[target]
+
+    model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
+    model.fit(X_train, y_train)
+
+    print("[Checkpoint 4]: AI model training complete.")
+
+    if args.compact:
+        reference = model
+        model, selection = choose_compact_forest(
+            lambda n_estimators, max_depth: RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                                                   random_state=42, class_weight='balanced'),
+            X_train, y_train, reference)
+        report = {'selection': {key: value for key, value in selection.items() if key != 'tried'},
+                  'before_after': compare_models({'full': reference, 'compact': model} if model is not reference else {'full': reference},
+                                                 encoders, X_train)}
+        print(json.dumps(report, indent=4))
+
+    # --- 5. Save the Model Bundle ---
+    # One file holding the forest and every encoder (best_first_stop included), next to the script by default.
+    script_dir = args.output_dir or os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(script_dir, exist_ok=True)
+    bundle_path = os.path.join(script_dir, INTRACITY_MODEL_BUNDLE)
+    write_bundle(bundle_path, model, encoders,
+                 metadata={'features': features, 'target': target, 'scenarios': len(train_df), 'seed': seed, 'compact': args.compact})
+
+    print("[Checkpoint 5]: Model bundle saved successfully!")
+    print(f"\nBundle was saved to: {bundle_path}")
+    print("--- Training Complete ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import pandas as pd
+import numpy as np
 from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
-import joblib
 import random
+import argparse
+import json
+import os
+from route_table import TABLE_FILE, export_route_table, verify_route_table
+from model_bundle import ROUTE_MODEL_BUNDLE, write_bundle, choose_compact_forest, compare_models
 
 # --- 1. Massively Expanded and Detailed Company Database ---
 # Now contains 50 companies, EACH with complete, pseudo-realistic details.
@@ -100,103 +105,199 @@ warehouse_data = [
 ]
 warehouse_df = pd.DataFrame(warehouse_data)
 
+# The same reviews as a frame, so they can be joined onto the carrier table in one merge
+LOCATION_REVIEWS_DF = pd.DataFrame(
+    [(origin, destination, company, review) for (origin, destination, company), review in LOCATION_REVIEWS.items()],
+    columns=['origin', 'destination', 'company', 'location_review'])
+DEFAULT_LOCATION_REVIEW = 3.8
+
+CARRIER_COLUMNS = ["origin", "destination", "company", "price", "safety_rating", "delivery_time_hours"]
+SCORE_COLUMNS = ['price_score', 'speed_score', 'safety_score', 'warehouse_score', 'review_score']
+WEIGHT_KEYS = ['price', 'speed', 'safety', 'warehouse', 'review']
+PRIORITIES = ['cost', 'speed', 'safety', 'warehouse']
+FRAGILITIES = ['Low', 'Medium', 'High']
+
 # --- 2. Generate and Augment Data ---
-logistics_data = []
-for origin, destination in ROUTES:
-    metrics = ROUTE_METRICS[(origin, destination)]
-    # Use a larger, consistent random sample of 30 companies for each route
-    for company in random.sample(COMPANIES, 30): 
-        price_multiplier = 1 + (hash(company) % 100) / 200.0 - 0.25
-        time_multiplier = 1 + (hash(company) % 50) / 100.0 - 0.15
-        safety_base = 3.5 + (hash(company) % 15) / 10.0
-        price = round(metrics["base_price"] * price_multiplier, -1)
-        delivery_time_hours = round(metrics["base_time"] * time_multiplier, 1)
-        safety_rating = round(min(5.0, safety_base), 1)
-        if company == 'LogisticStartup':
-            price *= 0.85; delivery_time_hours *= 0.95; safety_rating = 5.0
-        logistics_data.append([origin, destination, company, price, safety_rating, delivery_time_hours])
-
-df = pd.DataFrame(logistics_data, columns=["origin", "destination", "company", "price", "safety_rating", "delivery_time_hours"])
-df = pd.merge(df, warehouse_df, on=['company'], how='left').fillna(0)
-df['location_review'] = df.apply(lambda row: LOCATION_REVIEWS.get((row['origin'], row['destination'], row['company']), 3.8), axis=1)
+def generate_carrier_data():
+    """Builds the built-in carrier table: 30 sampled companies on each route in ROUTES."""
+    logistics_data = []
+    for origin, destination in ROUTES:
+        metrics = ROUTE_METRICS[(origin, destination)]
+        # Use a larger, consistent random sample of 30 companies for each route
+        for company in random.sample(COMPANIES, 30): 
+            price_multiplier = 1 + (hash(company) % 100) / 200.0 - 0.25
+            time_multiplier = 1 + (hash(company) % 50) / 100.0 - 0.15
+            safety_base = 3.5 + (hash(company) % 15) / 10.0
+            price = round(metrics["base_price"] * price_multiplier, -1)
+            delivery_time_hours = round(metrics["base_time"] * time_multiplier, 1)
+            safety_rating = round(min(5.0, safety_base), 1)
+            if company == 'LogisticStartup':
+                price *= 0.85; delivery_time_hours *= 0.95; safety_rating = 5.0
+            logistics_data.append([origin, destination, company, price, safety_rating, delivery_time_hours])
+    return pd.DataFrame(logistics_data, columns=CARRIER_COLUMNS)
+
 
 # --- 3. Advanced Feature Engineering and Scoring ---
-df['price_score'] = 1 - (df['price'] - df['price'].min()) / (df['price'].max() - df['price'].min())
-df['safety_score'] = (df['safety_rating'] - df['safety_rating'].min()) / (df['safety_rating'].max() - df['safety_rating'].min())
-df['speed_score'] = 1 - (df['delivery_time_hours'] - df['delivery_time_hours'].min()) / (df['delivery_time_hours'].max() - df['delivery_time_hours'].min())
-df['warehouse_score'] = (df['warehouse_size_sqft'] - df['warehouse_size_sqft'].min()) / (df['warehouse_size_sqft'].max() - df['warehouse_size_sqft'].min()) if not df['warehouse_size_sqft'].max() == df['warehouse_size_sqft'].min() else 0
-df['review_score'] = (df['location_review'] - df['location_review'].min()) / (df['location_review'].max() - df['location_review'].min())
+def score_carriers(df):
+    """Joins warehouse sizes and location reviews onto the carrier rows and adds the normalized score columns."""
+    df = pd.merge(df, warehouse_df, on=['company'], how='left').fillna(0)
+    df = pd.merge(df, LOCATION_REVIEWS_DF, on=['origin', 'destination', 'company'], how='left')
+    df['location_review'] = df['location_review'].fillna(DEFAULT_LOCATION_REVIEW)
+
+    df['price_score'] = 1 - (df['price'] - df['price'].min()) / (df['price'].max() - df['price'].min())
+    df['safety_score'] = (df['safety_rating'] - df['safety_rating'].min()) / (df['safety_rating'].max() - df['safety_rating'].min())
+    df['speed_score'] = 1 - (df['delivery_time_hours'] - df['delivery_time_hours'].min()) / (df['delivery_time_hours'].max() - df['delivery_time_hours'].min())
+    df['warehouse_score'] = (df['warehouse_size_sqft'] - df['warehouse_size_sqft'].min()) / (df['warehouse_size_sqft'].max() - df['warehouse_size_sqft'].min()) if not df['warehouse_size_sqft'].max() == df['warehouse_size_sqft'].min() else 0
+    df['review_score'] = (df['location_review'] - df['location_review'].min()) / (df['location_review'].max() - df['location_review'].min())
+    return df
+
 
 # --- 4. Define Recommendation Logic and Create Training Data ---
-training_data = []
-for (origin, destination), group in df.groupby(['origin', 'destination']):
+def build_weight_scenarios():
+    """Returns one weight row (in WEIGHT_KEYS order) per (priority, fragility) scenario, priority-major."""
     weights = {
         'cost': {'price': 0.7, 'speed': 0.1, 'safety': 0.1, 'review': 0.1},
         'speed': {'price': 0.1, 'speed': 0.7, 'safety': 0.1, 'review': 0.1},
         'safety': {'price': 0.1, 'speed': 0.1, 'safety': 0.5, 'review': 0.3},
         'warehouse': {'warehouse': 0.8, 'review': 0.2}
     }
-    for priority in ['cost', 'speed', 'safety', 'warehouse']:
-        for fragility in ['Low', 'Medium', 'High']:
+    scenarios, weight_rows = [], []
+    for priority in PRIORITIES:
+        for fragility in FRAGILITIES:
             current_weights = weights[priority].copy()
             if fragility == 'High':
                 current_weights['safety'] = min(1.0, current_weights.get('safety', 0) + 0.4) # Increased weight for high fragility
                 current_weights['review'] = min(1.0, current_weights.get('review', 0) + 0.2)
-            group['combined_score'] = (
-                group['price_score'] * current_weights.get('price', 0) +
-                group['speed_score'] * current_weights.get('speed', 0) +
-                group['safety_score'] * current_weights.get('safety', 0) +
-                group['warehouse_score'] * current_weights.get('warehouse', 0) +
-                group['review_score'] * current_weights.get('review', 0)
-            )
-            top_choice_company = group.loc[group['combined_score'].idxmax()]['company']
-            training_data.append([origin, destination, priority, fragility, top_choice_company])
-
-train_df = pd.DataFrame(training_data, columns=['origin', 'destination', 'priority', 'fragility', 'top_choice_company'])
-
-# --- 5. Preprocessing ---
-le_origin = LabelEncoder().fit(train_df['origin'])
-le_destination = LabelEncoder().fit(train_df['destination'])
-le_priority = LabelEncoder().fit(train_df['priority'])
-le_fragility = LabelEncoder().fit(train_df['fragility'])
-le_company = LabelEncoder().fit(train_df['top_choice_company'])
-train_df['origin_encoded'] = le_origin.transform(train_df['origin'])
-train_df['destination_encoded'] = le_destination.transform(train_df['destination'])
-train_df['priority_encoded'] = le_priority.transform(train_df['priority'])
-train_df['fragility_encoded'] = le_fragility.transform(train_df['fragility'])
-train_df['company_encoded'] = le_company.transform(train_df['top_choice_company'])
-
-# --- 6. Train the Model ---
-features = ['origin_encoded', 'destination_encoded', 'priority_encoded', 'fragility_encoded']
-target = 'company_encoded'
-X_train = train_df[features]
-y_train = train_df[target]
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
-
-# --- 7. Save the Model and Encoders ---
-joblib.dump(model, 'logistics_model.pkl')
-joblib.dump(le_origin, 'le_origin.pkl')
-joblib.dump(le_destination, 'le_destination.pkl')
-joblib.dump(le_priority, 'le_priority.pkl')
-joblib.dump(le_fragility, 'le_fragility.pkl')
-joblib.dump(le_company, 'le_company.pkl')
-print("Definitive model with 50 companies and advanced logic trained and saved successfully!")
-
-# --- 8. Example Prediction ---
-print("\n--- Example Predictions ---")
-def predict_best_company(origin, destination, priority, fragility):
-    test_input_data = [[origin, destination, priority, fragility]]
-    test_df = pd.DataFrame(test_input_data, columns=['origin', 'destination', 'priority', 'fragility'])
-    test_df['origin_encoded'] = le_origin.transform(test_df['origin'])
-    test_df['destination_encoded'] = le_destination.transform(test_df['destination'])
-    test_df['priority_encoded'] = le_priority.transform(test_df['priority'])
-    test_df['fragility_encoded'] = le_fragility.transform(test_df['fragility'])
-    prediction_encoded = model.predict(test_df[features])
-    prediction = le_company.inverse_transform(prediction_encoded)
-    print(f"Query: Origin='{origin}', Destination='{destination}', Priority='{priority}', Fragility='{fragility}'")
-    print(f"==> Model Recommends: {prediction[0]}")
-
-predict_best_company('Bhopal', 'Pune', 'safety', 'High')
-predict_best_company('Bhopal', 'Indore', 'cost', 'Low')
-predict_best_company('Bhopal', 'Delhi', 'safety', 'High') # Should favor Blue Dart or FedEx due to reviews
+            scenarios.append((priority, fragility))
+            weight_rows.append([current_weights.get(key, 0) for key in WEIGHT_KEYS])
+    return scenarios, np.array(weight_rows, dtype=np.float64)
+
+
+def generate_training_labels(df):
+    """
+    Picks the top company for every route under every weight scenario in one pass.
+    Carriers are laid out route after route in one flat (rows x scores) array and scored against all
+    scenarios at once; the winners are found per route with segment reductions, so memory follows
+    the number of carrier rows rather than routes x the largest route. Columns are accumulated in
+    the same order as the old per-group pandas sum, so every label matches it exactly.
+    """
+    route_keys = df[['origin', 'destination']]
+    route_ids = route_keys.groupby(['origin', 'destination'], sort=True).ngroup().to_numpy()
+    routes = route_keys.drop_duplicates().sort_values(['origin', 'destination']).to_numpy()
+    num_routes = len(routes)
+
+    # Rows grouped by route, keeping their table order within it
+    order = np.argsort(route_ids, kind='stable')
+    route_starts = np.concatenate([[0], np.cumsum(np.bincount(route_ids, minlength=num_routes))[:-1]])
+    scores = df[SCORE_COLUMNS].to_numpy(dtype=np.float64)[order]
+    companies = df['company'].to_numpy(dtype=object)[order]
+
+    scenarios, weight_matrix = build_weight_scenarios()
+    # combined[row, scenario]
+    combined = np.zeros((len(scores), len(scenarios)))
+    for column in range(len(SCORE_COLUMNS)):
+        combined += scores[:, column, None] * weight_matrix[:, column]
+    # NaN scores can never win, just as idxmax skips NaN
+    combined[np.isnan(combined)] = -np.inf
+
+    if num_routes:
+        best_scores = np.maximum.reduceat(combined, route_starts, axis=0)
+        # First row holding its route's maximum, like idxmax
+        rows = np.arange(len(combined))[:, None]
+        best_rows = np.minimum.reduceat(np.where(combined == best_scores[route_ids[order]], rows, len(combined)), route_starts, axis=0)
+    else:
+        best_rows = np.zeros((0, len(scenarios)), dtype=np.intp)
+
+    route_index = np.repeat(np.arange(num_routes), len(scenarios))
+    top_companies = companies[best_rows.ravel()]
+    scenario_frame = pd.DataFrame(scenarios * num_routes, columns=['priority', 'fragility'])
+    return pd.DataFrame({
+        'origin': routes[route_index, 0],
+        'destination': routes[route_index, 1],
+        'priority': scenario_frame['priority'],
+        'fragility': scenario_frame['fragility'],
+        'top_choice_company': top_companies,
+    })
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the inter-city carrier recommendation model.")
+    parser.add_argument('--data', help="Carrier CSV (e.g. from generate_data.py) to train on instead of the built-in sample.")
+    parser.add_argument('--output-dir', default='.', help="Directory to save the model bundle and route table in (default: current directory).")
+    parser.add_argument('--compact', action='store_true', help="Ship the smallest forest that is as accurate on the training grid as the full one, and report size, load time and latency of both.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    df = pd.read_csv(args.data)[CARRIER_COLUMNS] if args.data else generate_carrier_data()
+    df = score_carriers(df)
+    train_df = generate_training_labels(df)
+
+    # --- 5. Preprocessing ---
+    le_origin = LabelEncoder().fit(train_df['origin'])
+    le_destination = LabelEncoder().fit(train_df['destination'])
+    le_priority = LabelEncoder().fit(train_df['priority'])
+    le_fragility = LabelEncoder().fit(train_df['fragility'])
+    le_company = LabelEncoder().fit(train_df['top_choice_company'])
+    train_df['origin_encoded'] = le_origin.transform(train_df['origin'])
+    train_df['destination_encoded'] = le_destination.transform(train_df['destination'])
+    train_df['priority_encoded'] = le_priority.transform(train_df['priority'])
+    train_df['fragility_encoded'] = le_fragility.transform(train_df['fragility'])
+    train_df['company_encoded'] = le_company.transform(train_df['top_choice_company'])
+    encoders = {'origin': le_origin, 'destination': le_destination, 'priority': le_priority,
+                'fragility': le_fragility, 'company': le_company}
+
+    # --- 6. Train the Model ---
+    features = ['origin_encoded', 'destination_encoded', 'priority_encoded', 'fragility_encoded']
+    target = 'company_encoded'
+    X_train = train_df[features]
+    y_train = train_df[target]
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X_train, y_train)
+    if args.compact:
+        reference = model
+        model, selection = choose_compact_forest(
+            lambda n_estimators, max_depth: RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42),
+            X_train, y_train, reference)
+        report = {'selection': {key: value for key, value in selection.items() if key != 'tried'},
+                  'before_after': compare_models({'full': reference, 'compact': model} if model is not reference else {'full': reference},
+                                                 encoders, X_train)}
+        print(json.dumps(report, indent=4))
+
+    # --- 7. Save the Model and Encoders ---
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_bundle(os.path.join(args.output_dir, ROUTE_MODEL_BUNDLE), model, encoders,
+                 metadata={'features': features, 'target': 'company', 'compact': args.compact})
+    print("Definitive model with 50 companies and advanced logic trained and saved successfully!")
+
+    # Compile the model into a lookup table over every encoded input and check it cell by cell
+    table_path = os.path.join(args.output_dir, TABLE_FILE)
+    export_route_table(model, le_origin, le_destination, le_priority, le_fragility, le_company, table_path)
+    if verify_route_table(model, le_origin, le_destination, le_priority, le_fragility, table_path) != 0:
+        raise RuntimeError("Route lookup table does not match model.predict.")
+    print("Route lookup table exported and verified against the model.")
+
+    # --- 8. Example Prediction ---
+    print("\n--- Example Predictions ---")
+    def predict_best_company(origin, destination, priority, fragility):
+        test_input_data = [[origin, destination, priority, fragility]]
+        test_df = pd.DataFrame(test_input_data, columns=['origin', 'destination', 'priority', 'fragility'])
+        test_df['origin_encoded'] = le_origin.transform(test_df['origin'])
+        test_df['destination_encoded'] = le_destination.transform(test_df['destination'])
+        test_df['priority_encoded'] = le_priority.transform(test_df['priority'])
+        test_df['fragility_encoded'] = le_fragility.transform(test_df['fragility'])
+        prediction_encoded = model.predict(test_df[features])
+        prediction = le_company.inverse_transform(prediction_encoded)
+        print(f"Query: Origin='{origin}', Destination='{destination}', Priority='{priority}', Fragility='{fragility}'")
+        print(f"==> Model Recommends: {prediction[0]}")
+
+    # The built-in sample always has these routes; a custom --data file may not
+    known_destinations = set(le_destination.classes_)
+    for query in [('Bhopal', 'Pune', 'safety', 'High'), ('Bhopal', 'Indore', 'cost', 'Low'), ('Bhopal', 'Delhi', 'safety', 'High')]:
+        if query[0] in le_origin.classes_ and query[1] in known_destinations:
+            predict_best_company(*query)
+
+
+if __name__ == "__main__":
+    main()
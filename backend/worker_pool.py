@@ -0,0 +1,411 @@
+from multiprocessing.reduction import send_handle, recv_handle
+from multiprocessing.connection import Connection
+from multiprocessing import Pipe
+import threading
+import signal
+import queue
+import json
+import time
+import sys
+import os
+
+# --- Pre-Forked Worker Pool for --serve ---
+# One resident process answers one request at a time, so a burst queues up behind the slowest
+# query. With --serve --workers N the serving process loads the model and carrier table as usual and
+# then, while it is still single-threaded, forks a template process from itself. The template forks
+# the N workers, which share those pages copy-on-write (the compiled carrier table is memory-mapped,
+# so it is shared outright). Forking only ever happens in the single-threaded template, never in the
+# threaded parent, so no child can inherit a lock held by a thread it does not have. The parent only
+# reads request lines, queues them and writes each worker's answer back as soon as it is ready, so
+# answers arrive in completion order, matched to requests by their "id" exactly as in the
+# single-process server.
+#
+# - Admission is bounded. A request arriving while LOGISTICS_QUEUE_SIZE requests already wait is
+#   answered at once with {"error": ..., "overloaded": true}; one that waited longer than
+#   LOGISTICS_QUEUE_TIMEOUT seconds, or ran longer than LOGISTICS_REQUEST_TIMEOUT seconds, gets
+#   {"error": ..., "timeout": true}. A worker that runs over is killed and replaced.
+# - {"command": "reload"} (or SIGHUP) reloads the artifacts in the template; other commands that change
+#   shared state (such as carrier updates) also run there. A command waits until every request read
+#   before it has been answered and admits nothing new while it runs, so each query is answered
+#   against the state it was sent under. Afterwards every worker is replaced by a fresh fork, one at a
+#   time and only between requests.
+# - {"command": "pool"} reports the queue and, per worker, its pid, generation, uptime and counters.
+QUEUE_SIZE = int(os.environ.get('LOGISTICS_QUEUE_SIZE', 64))
+QUEUE_TIMEOUT = float(os.environ.get('LOGISTICS_QUEUE_TIMEOUT', 5))
+REQUEST_TIMEOUT = float(os.environ.get('LOGISTICS_REQUEST_TIMEOUT', 30))
+
+# How often an idle worker slot checks whether its worker is out of date.
+IDLE_CHECK_SECONDS = 0.2
+
+
+def worker_main(conn, answer):
+    """Body of a worker process: answers raw request lines from `conn` until it gets None."""
+    # Reloads and Ctrl-C are the parent's business, and stdout belongs to the parent's protocol.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            line = conn.recv()
+        except EOFError:
+            break
+        if line is None:
+            break
+        response = answer(line)
+        conn.send((json.dumps(response), 'error' in response))
+
+
+def template_main(conn, answer, commands):
+    """
+    Body of the template process: runs state-changing commands and forks workers from its own,
+    up-to-date state, on request from the parent over `conn`, until it gets None.
+    A worker is handed to the parent as (pid, its end of the worker's pipe).
+    """
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The workers are this process's children; the parent watches them through their pipes, so
+    # they are reaped automatically instead of waited for.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        kind, request = message
+        if kind == 'command':
+            try:
+                response = commands[request['command']](request)
+            except Exception as exc:
+                response = {"error": f"Failed to process request: {exc!r}"}
+            conn.send(response)
+            continue
+        parent_conn, child_conn = Pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                conn.close()
+                parent_conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                worker_main(child_conn, answer)
+            finally:
+                os._exit(0)
+        child_conn.close()
+        conn.send(pid)
+        send_handle(conn, parent_conn.fileno(), os.getppid())
+        # Only the parent may hold this end, or the worker would never see EOF when the parent goes
+        parent_conn.close()
+
+
+class WorkerSlot:
+    """The parent's handle on one worker process, with its health counters."""
+
+    def __init__(self, number):
+        self.number = number
+        self.pid = None
+        self.conn = None
+        self.generation = None
+        self.started = None
+        self.busy_since = None
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.last_latency = None
+
+    def alive(self):
+        if self.pid is None:
+            return False
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'worker': self.number,
+            'pid': self.pid,
+            'alive': self.alive(),
+            'generation': self.generation,
+            'uptime_s': round(now - self.started, 1) if self.started else None,
+            'busy_for_s': round(now - self.busy_since, 3) if self.busy_since else None,
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+            'mean_latency_us': round(self.busy_seconds / self.requests * 1e6, 1) if self.requests else None,
+            'last_latency_us': round(self.last_latency * 1e6, 1) if self.last_latency is not None else None,
+        }
+
+
+class WorkerPool:
+    """
+    Serves newline-delimited JSON requests with `workers` forked processes.
+    answer(line) turns one raw request line into its response dict (echoing the "id") and must never
+    raise; it runs in the workers. commands maps command names to functions of the decoded request
+    that run in the template process and return a response dict; unless it has an "error", every
+    worker is then replaced so the change reaches all of them.
+    """
+
+    def __init__(self, answer, commands=None, workers=2, queue_size=QUEUE_SIZE,
+                 queue_timeout=QUEUE_TIMEOUT, request_timeout=REQUEST_TIMEOUT):
+        self.answer = answer
+        self.commands = dict(commands or {})
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.admission = queue.Queue(maxsize=max(1, queue_size))
+        self.slots = [WorkerSlot(number) for number in range(max(1, workers))]
+        # Held while talking to the template, which does one thing at a time
+        self.state_lock = threading.RLock()
+        self.template_pid = self.template = None
+        self.output_lock = threading.Lock()
+        self.counter_lock = threading.Lock()
+        self.reload_requested = threading.Event()
+        # Held while admitting a request and while a command runs, so neither overtakes the other
+        self.admission_lock = threading.Lock()
+        # Requests admitted but not yet answered; commands wait for this to reach zero
+        self.pending = 0
+        self.all_answered = threading.Condition()
+        self.generation = 0
+        self.stream_out = sys.stdout
+        self.counters = {'admitted': 0, 'overloaded': 0, 'queue_timeouts': 0, 'request_timeouts': 0,
+                         'worker_crashes': 0, 'reloads': 0, 'failed_reloads': 0}
+
+    def count(self, name):
+        with self.counter_lock:
+            self.counters[name] += 1
+
+    def answered(self):
+        with self.all_answered:
+            self.pending -= 1
+            if self.pending == 0:
+                self.all_answered.notify_all()
+
+    # --- Template and worker processes ---
+    def start_template(self):
+        """Forks the template process; called before any thread starts."""
+        # A bare os.fork: the child never touches the parent's stdin/stdout and leaves through
+        # os._exit, so it flushes and closes nothing of theirs.
+        parent_conn, child_conn = Pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                parent_conn.close()
+                template_main(child_conn, self.answer, self.commands)
+            finally:
+                os._exit(0)
+        child_conn.close()
+        self.template_pid, self.template = pid, parent_conn
+
+    def stop_template(self):
+        try:
+            self.template.send(None)
+        except OSError:
+            pass
+        self.template.close()
+        os.waitpid(self.template_pid, 0)
+
+    def spawn(self, slot):
+        """Replaces the slot's worker (if any) with a fresh fork of the template's current state."""
+        with self.state_lock:
+            self.retire(slot)
+            try:
+                self.template.send(('spawn', None))
+                pid = self.template.recv()
+                conn = Connection(recv_handle(self.template))
+            except (EOFError, OSError) as exc:
+                print(json.dumps({'worker_pool': f"Could not start worker {slot.number}: {exc!r}"}), file=sys.stderr)
+                return
+            if slot.started is not None:
+                slot.restarts += 1
+            slot.pid, slot.conn, slot.generation, slot.started = pid, conn, self.generation, time.monotonic()
+
+    def retire(self, slot, kill=False):
+        """Stops the slot's worker: politely between requests, or at once with kill=True."""
+        if slot.pid is None:
+            return
+        if not kill:
+            try:
+                slot.conn.send(None)
+                # The worker closes its end as it exits; one that does not is killed
+                kill = not slot.conn.poll(self.request_timeout)
+            except OSError:
+                pass
+        if kill:
+            # The template reaps it, so the pid stays valid until the kill lands
+            try:
+                os.kill(slot.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        slot.conn.close()
+        slot.pid = slot.conn = None
+
+    def run_slot(self, slot):
+        """Feeds queued requests to one worker until the shutdown sentinel arrives."""
+        self.spawn(slot)
+        while True:
+            try:
+                item = self.admission.get(timeout=IDLE_CHECK_SECONDS)
+            except queue.Empty:
+                if slot.generation != self.generation:
+                    self.spawn(slot)
+                continue
+            if item is None:
+                break
+            if slot.generation != self.generation:
+                self.spawn(slot)
+            try:
+                self.dispatch(slot, *item)
+            finally:
+                self.answered()
+        with self.state_lock:
+            self.retire(slot)
+
+    def dispatch(self, slot, line, request, admitted_at):
+        started = time.monotonic()
+        if started - admitted_at > self.queue_timeout:
+            self.count('queue_timeouts')
+            self.write({"error": f"Request waited more than {self.queue_timeout:g} s in the queue.", "timeout": True}, request)
+            return
+        if slot.pid is None:
+            self.spawn(slot)
+            if slot.pid is None:
+                self.write({"error": "No worker is available to process the request."}, request)
+                return
+        if slot.conn.poll():
+            # Nothing is outstanding, so this is EOF: the worker died while idle. The request has not
+            # started yet, so it goes to a replacement instead of failing.
+            self.count('worker_crashes')
+            self.spawn(slot)
+        slot.busy_since = started
+        try:
+            slot.conn.send(line)
+            if not slot.conn.poll(self.request_timeout):
+                slot.timeouts += 1
+                self.count('request_timeouts')
+                with self.state_lock:
+                    self.retire(slot, kill=True)
+                    self.spawn(slot)
+                # Answered once the replacement is up, so a caller never sees the slot without a worker
+                self.write({"error": f"Request took longer than {self.request_timeout:g} s.", "timeout": True}, request)
+                return
+            text, failed = slot.conn.recv()
+        except (EOFError, OSError):
+            slot.errors += 1
+            self.count('worker_crashes')
+            self.write({"error": "Worker exited while processing the request."}, request)
+            self.spawn(slot)
+            return
+        finally:
+            slot.busy_since = None
+        slot.last_latency = time.monotonic() - started
+        slot.busy_seconds += slot.last_latency
+        slot.requests += 1
+        slot.errors += failed
+        self.write_line(text)
+
+    # --- Parent side ---
+    def write_line(self, text):
+        with self.output_lock:
+            self.stream_out.write(text + "\n")
+            self.stream_out.flush()
+
+    def write(self, response, request):
+        if isinstance(request, dict) and 'id' in request:
+            response = {'id': request['id'], **response}
+        self.write_line(json.dumps(response))
+
+    def run_command(self, request):
+        """
+        Runs a parent-side command once every request admitted before it has been answered and, when
+        it succeeds, rolls every worker over to the new state.
+        """
+        with self.admission_lock:
+            with self.all_answered:
+                self.all_answered.wait_for(lambda: self.pending == 0)
+            with self.state_lock:
+                try:
+                    self.template.send(('command', request))
+                    response = self.template.recv()
+                except (EOFError, OSError) as exc:
+                    response = {"error": f"Failed to process request: template process unavailable ({exc!r})"}
+                if 'error' not in response:
+                    self.generation += 1
+        if request['command'] == 'reload':
+            self.count('reloads' if 'error' not in response else 'failed_reloads')
+        return response
+
+    def watch_reload_signal(self):
+        """Turns SIGHUP into a reload; the work happens on this thread, not in the signal handler."""
+        while True:
+            self.reload_requested.wait()
+            self.reload_requested.clear()
+            response = self.run_command({'command': 'reload'})
+            print(json.dumps({'sighup_reload': response}), file=sys.stderr)
+
+    def stats(self):
+        with self.counter_lock:
+            counters = dict(self.counters)
+        return {
+            'workers': len(self.slots),
+            'template_pid': self.template_pid,
+            'generation': self.generation,
+            'queue': {'depth': self.admission.qsize(), 'capacity': self.admission.maxsize,
+                      'timeout_s': self.queue_timeout},
+            'request_timeout_s': self.request_timeout,
+            **counters,
+            'per_worker': [slot.stats() for slot in self.slots],
+        }
+
+    def admit(self, line, request):
+        with self.admission_lock:
+            with self.all_answered:
+                self.pending += 1
+            try:
+                self.admission.put_nowait((line, request, time.monotonic()))
+            except queue.Full:
+                self.answered()
+                self.count('overloaded')
+                self.write({"error": f"Server overloaded: {self.admission.maxsize} requests already queued.", "overloaded": True}, request)
+                return
+        self.count('admitted')
+
+    def serve(self, stream_in=sys.stdin, stream_out=sys.stdout):
+        """Answers requests until stdin closes, then finishes everything already admitted and stops the workers."""
+        self.stream_out = stream_out
+        self.start_template()
+        threads = [threading.Thread(target=self.run_slot, args=(slot,), daemon=True) for slot in self.slots]
+        for thread in threads:
+            thread.start()
+        if 'reload' in self.commands and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_requested.set())
+            threading.Thread(target=self.watch_reload_signal, daemon=True).start()
+
+        for line in stream_in:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                # Forwarded anyway, so the worker answers it exactly as the single-process server would
+                request = None
+            command = request.get('command') if isinstance(request, dict) else None
+            if command == 'pool':
+                self.write({'pool': self.stats()}, request)
+            elif command in self.commands:
+                self.write(self.run_command(request), request)
+            else:
+                self.admit(line, request)
+
+        # One sentinel per worker, queued behind everything already admitted
+        for _ in threads:
+            self.admission.put(None)
+        for thread in threads:
+            thread.join()
+        self.stop_template()